@@ -0,0 +1,64 @@
+"""Benchmark of the constraint builder.
+
+Compares the sparse polynomial builder of ``ConstraintTreeTransformer``
+with the previous builder, which computed every operator with
+``lpi.Expression`` objects (``x ^ n`` as n - 1 products), on high-degree
+and long-sum constraints.
+
+Usage::
+
+    python benchmarks/constraints.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test"))
+
+from genericparser.Constraint_parser import ConstraintTreeTransformer, Parser_Constraint  # noqa: E402
+from legacy import LpiTreeTransformer  # noqa: E402
+
+
+def cases():
+    yield "power x^n", ["x^{0} - 3*y^{0}*z^{0} >= x*y^{0}".format(n) for n in (32, 64, 128)]
+    yield "long product", [" * ".join(["(x + y - {})".format(i) for i in range(n)]) + " >= x^{}".format(n)
+                           for n in (6, 8)]
+    yield "long sum", [" + ".join("{}*x{}".format(i + 1, i) for i in range(n)) + " <= 0"
+                       for n in (200, 1000)]
+    yield "long nonlinear sum", [" + ".join("x{0}*y{0}^2".format(i) for i in range(n)) + " = z"
+                                 for n in (200, 1000)]
+
+
+def run(transformer, tree, repeat):
+    best = None
+    for __ in range(repeat):
+        start = time.perf_counter()
+        result = transformer().transform(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    argParser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    argParser.add_argument("--repeat", type=int, default=3)
+    args = argParser.parse_args()
+    lark = Parser_Constraint().get_lark()
+    print("{:<20} {:>12} {:>12} {:>8}".format("case", "lpi (s)", "builder (s)", "speedup"))
+    for name, texts in cases():
+        old_total = new_total = 0
+        for text in texts:
+            tree = lark.parse(text)
+            old, old_c = run(LpiTreeTransformer, tree, args.repeat)
+            new, new_c = run(ConstraintTreeTransformer, tree, args.repeat)
+            if str(old_c) != str(new_c):
+                raise SystemExit("different result for {}".format(text))
+            old_total += old
+            new_total += new
+        print("{:<20} {:>12.4f} {:>12.4f} {:>7.1f}x".format(name, old_total, new_total, old_total / new_total))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark of ``Cfg.export``.
+
+Compares writing the same CFG to fc, koat, Prolog and SMT2 with one
+``Cfg.export`` call (one walk of the graph and one string per constraint
+and syntax, sequentially or in threads) against calling ``toFc``,
+``toKoat``, ``toProlog`` and ``toSMT2`` one after another.
+
+Usage::
+
+    python benchmarks/export.py [--repeat N] [--threads N]
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from genericparser.Parser_fc import Parser_fc  # noqa: E402
+
+FORMATS = ("fc", "koat", "prolog", "smt2")
+
+
+def program(nodes, transitions, variables=10):
+    vs = ["x{}".format(i) for i in range(variables)]
+    trs = []
+    for t in range(transitions):
+        cons = ["{}' = {} + {}".format(v, v, t % 5) for v in vs[:variables // 2]]
+        cons += ["x{} + {}*x{} <= {}".format(i, t % 3 + 1, (i + 1) % variables, t % 7) for i in range(variables)]
+        trs.append("{{source: n{}, target: n{}, name: t{}, constraints: [{}]}}".format(
+            t % nodes, (t * 7 + 1) % nodes, t, ", ".join(cons)))
+    return "{{vars: [{}], pvars: [{}], initnode: n0, transitions: [{}]}}".format(
+        ", ".join(vs), ", ".join(v + "'" for v in vs), ", ".join(trs))
+
+
+def sequential(cfg):
+    outputs = {fmt: io.StringIO() for fmt in FORMATS}
+    cfg.toFc(outputs["fc"])
+    cfg.toKoat(outputs["koat"])
+    cfg.toProlog(outputs["prolog"])
+    cfg.toSMT2(outputs["smt2"])
+    return outputs
+
+
+def exported(threads):
+    def write(cfg):
+        outputs = {fmt: io.StringIO() for fmt in FORMATS}
+        cfg.export(outputs, threads=threads)
+        return outputs
+    return write
+
+
+def run(write, text, repeat):
+    best = None
+    for __ in range(repeat):
+        cfg = Parser_fc().parse_string(text)
+        gc.collect()
+        start = time.perf_counter()
+        outputs = write(cfg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, {fmt: out.getvalue() for fmt, out in outputs.items()}
+
+
+def main():
+    argParser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    argParser.add_argument("--repeat", type=int, default=3)
+    argParser.add_argument("--threads", type=int, default=4)
+    args = argParser.parse_args()
+    print("{:<20} {:>12} {:>12} {:>12} {:>8}".format(
+        "nodes x transitions", "to* (s)", "export (s)", "threads (s)", "speedup"))
+    for nodes, transitions in ((20, 200), (100, 1000), (500, 3000)):
+        text = program(nodes, transitions)
+        old, old_out = run(sequential, text, args.repeat)
+        new, new_out = run(exported(1), text, args.repeat)
+        par, par_out = run(exported(args.threads), text, args.repeat)
+        assert old_out == new_out == par_out
+        print("{:<20} {:>12.4f} {:>12.4f} {:>12.4f} {:>7.1f}x".format(
+            "{} x {}".format(nodes, transitions), old, new, par, old / min(new, par)))
+
+
+if __name__ == "__main__":
+    main()
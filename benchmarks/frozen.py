@@ -0,0 +1,107 @@
+"""Benchmark of ``FrozenCfg`` against the networkx graph of ``Cfg``.
+
+Times the traversals that ``FrozenCfg`` answers from its integer arrays
+(successors, transitions of each node, reachable nodes and strongly
+connected components) on the ``Cfg`` and on its snapshot, and measures
+the memory allocated to build each of them. Both must give the same
+results.
+
+Usage::
+
+    python benchmarks/frozen.py [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import networkx as nx  # noqa: E402
+from genericparser import constants  # noqa: E402
+from genericparser.Cfg import Cfg  # noqa: E402
+
+
+def build(nodes, degree, seed=0):
+    """A cfg of ``nodes`` nodes, where every node goes to the next one and
+    to ``degree`` - 1 random nodes.
+    """
+    rnd = random.Random(seed)
+    cfg = Cfg()
+    k = 0
+    for i in range(nodes):
+        for j in [(i + 1) % nodes] + [rnd.randrange(nodes) for __ in range(degree - 1)]:
+            cfg.add_edge("n{}".format(i), "n{}".format(j), "t{}".format(k),
+                         constraints=[], local_vars=[], linear=True)
+            k += 1
+    cfg.set_info(constants.initnode, "n0")
+    return cfg
+
+
+def traversals(nodes):
+    """The traversals, as (name, on the Cfg, on the FrozenCfg)."""
+    return [
+        ("successors",
+         lambda g: [sorted(g.successors(n)) for n in nodes],
+         lambda f: [sorted(f.successors(n)) for n in nodes]),
+        ("get_edges(source)",
+         lambda g: [[e["name"] for e in g.get_edges(source=n)] for n in nodes],
+         lambda f: [[e["name"] for e in f.get_edges(source=n)] for n in nodes]),
+        ("reachable",
+         lambda g: nx.descendants(g, "n0") | {"n0"},
+         lambda f: f.reachable("n0")),
+        ("reverse reachable",
+         lambda g: nx.ancestors(g, "n0") | {"n0"},
+         lambda f: f.reachable("n0", reverse=True)),
+        ("scc",
+         lambda g: sorted(sorted(c) for c in nx.strongly_connected_components(g)),
+         lambda f: sorted(sorted(c) for c in f.strongly_connected_components())),
+    ]
+
+
+def run(function, graph, repeat):
+    best = None
+    for __ in range(repeat):
+        start = time.perf_counter()
+        result = function(graph)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def allocated(function):
+    """Returns the result of ``function()`` and the bytes it allocated
+    that are still alive."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    argParser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    argParser.add_argument("--repeat", type=int, default=3)
+    args = argParser.parse_args()
+    for nodes, degree in [(2000, 3), (20000, 3)]:
+        cfg, cfg_bytes = allocated(lambda: build(nodes, degree))
+        frozen, frozen_bytes = allocated(cfg.freeze)
+        freeze, frozen = run(lambda g: g.freeze(), cfg, args.repeat)
+        print("{} nodes, {} transitions: Cfg {:.1f} MB, FrozenCfg {:.1f} MB, freeze {:.4f} s".format(
+            nodes, cfg.number_of_edges(), cfg_bytes / 2 ** 20, frozen_bytes / 2 ** 20, freeze))
+        print("{:<20} {:>10} {:>12} {:>8}".format("traversal", "Cfg (s)", "Frozen (s)", "speedup"))
+        for name, on_cfg, on_frozen in traversals(list(cfg.nodes())):
+            old, old_result = run(on_cfg, cfg, args.repeat)
+            new, new_result = run(on_frozen, frozen, args.repeat)
+            if old_result != new_result:
+                raise SystemExit("different result for {}".format(name))
+            print("{:<20} {:>10.4f} {:>12.4f} {:>7.1f}x".format(name, old, new, old / new))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark of ``Cfg.toSMT2``.
+
+Compares the streamed writer, which emits one flat ``(and c1 ... cn)``
+per transition, with the previous one, which nested ``(and prev c)``
+pairwise and built the polyhedrons first, on CFGs with hundreds of
+constraints per transition. Reports the time and the size of the output.
+
+Usage::
+
+    python benchmarks/smt2.py [--repeat N]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from genericparser import constants  # noqa: E402
+from genericparser.Parser_fc import Parser_fc  # noqa: E402
+
+
+def legacy_smt2(cfg, path, invariant_type="none"):
+    """The previous ``toSMT2``."""
+    path.write("(declare-sort Loc 0)\n")
+    for n in cfg.get_nodes():
+        path.write("(declare-const {} Loc)\n".format(n))
+    path.write("(assert (distinct {}))\n".format(" ".join(cfg.get_nodes())))
+    path.write("(define-fun cfg_init ( (pc Loc) (src Loc) (rel Bool) ) Bool (and (= pc src) rel))\n")
+    path.write("(define-fun cfg_trans2 ( (pc Loc) (src Loc) (pc1 Loc) (dst Loc) (rel Bool) ) Bool\n")
+    path.write("                       (and (= pc src) (= pc1 dst) rel))\n")
+    path.write("(define-fun cfg_trans3 ( (pc Loc) (exit Loc) (pc1 Loc) (call Loc) (pc2 Loc) (return Loc)\n")
+    path.write("                         (rel Bool) ) Bool (and (= pc exit) (= pc1 call) (= pc2 return) rel))\n")
+    global_vars = cfg.graph[constants.variables]
+    N = int(len(global_vars) / 2)
+    vs_str = " ".join(["({} Int)".format(v) for v in global_vars[:N]])
+    pvs_str = " ".join(["({} Int)".format(v) for v in global_vars[N:]])
+    path.write("(define-fun init_main ( (pc Loc) {} ) Bool (cfg_init pc {} true))\n".format(
+        vs_str, cfg.graph[constants.initnode]))
+    path.write("(define-fun next_main ( (pc Loc) {} (pc1 Loc) {}) Bool (or\n".format(vs_str, pvs_str))
+
+    def toprefixformat(c):
+        return c.toString(str, int, eq_symb="=", opformat="prefix")
+    cfg.build_polyhedrons()
+    for tr in cfg.get_edges():
+        cons = tr[constants.transition.constraints]
+        if len(cons) == 0:
+            prefix_cons = "true"
+        else:
+            prefix_cons = toprefixformat(cons[0])
+            for c in cons[1:]:
+                prefix_cons = "(and {} {})".format(prefix_cons, toprefixformat(c))
+        if len(tr[constants.transition.localvariables]) > 0:
+            prefix_cons = "(exists ({}) {})".format(" ".join(["({} Int)".format(v) for v in tr[
+                constants.transition.localvariables]]), prefix_cons)
+        path.write("    (cfg_trans2 pc {} pc1 {} {})\n".format(tr["source"], tr["target"], prefix_cons))
+    path.write("  )\n)\n")
+
+
+def program(transitions, constraints, variables=20):
+    vs = ["x{}".format(i) for i in range(variables)]
+    trs = []
+    for t in range(transitions):
+        cons = ["{}' = {} + {}".format(v, v, t) for v in vs]
+        cons += ["x{} + {}*x{} <= {}".format(i % variables, i % 7 + 1, (i * 3) % variables, i)
+                 for i in range(constraints - variables)]
+        trs.append("{{source: n{}, target: n{}, name: t{}, constraints: [{}]}}".format(
+            t % 10, (t + 1) % 10, t, ", ".join(cons)))
+    return "{{vars: [{}], pvars: [{}], initnode: n0, transitions: [{}]}}".format(
+        ", ".join(vs), ", ".join(v + "'" for v in vs), ", ".join(trs))
+
+
+def run(write, text, repeat):
+    best = None
+    for __ in range(repeat):
+        cfg = Parser_fc().parse_string(text)
+        out = io.StringIO()
+        start = time.perf_counter()
+        write(cfg, out)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(out.getvalue())
+
+
+def main():
+    argParser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    argParser.add_argument("--repeat", type=int, default=3)
+    args = argParser.parse_args()
+    print("{:<22} {:>10} {:>10} {:>8} {:>12} {:>12}".format(
+        "transitions x cons", "old (s)", "new (s)", "speedup", "old (bytes)", "new (bytes)"))
+    for transitions, constraints in ((50, 100), (50, 400), (20, 1000)):
+        text = program(transitions, constraints)
+        old, old_size = run(legacy_smt2, text, args.repeat)
+        new, new_size = run(lambda cfg, out: cfg.toSMT2(out), text, args.repeat)
+        print("{:<22} {:>10.4f} {:>10.4f} {:>7.1f}x {:>12} {:>12}".format(
+            "{} x {}".format(transitions, constraints), old, new, old / new, old_size, new_size))
+
+
+if __name__ == "__main__":
+    main()
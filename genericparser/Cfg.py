@@ -1,27 +1,181 @@
 import networkx as nx
 from networkx.utils import open_file
 from networkx.classes.multidigraph import MultiDiGraph
-from networkx.drawing.nx_pydot import write_dot
 import genericparser.constants as constants
 
 
+def _polyhedron_task(task):
+    from lpi import C_Polyhedron
+    from genericparser.linear import to_lpi
+    cons, variables = task
+    return C_Polyhedron(constraints=[to_lpi(c) for c in cons], variables=variables)
+
+
+# the lpi polyhedrons can be sent back from the workers
+_ship_polyhedrons = None
+
+
+def _pickles_polyhedrons():
+    global _ship_polyhedrons
+    if _ship_polyhedrons is None:
+        import pickle
+        from lpi import C_Polyhedron
+        try:
+            pickle.loads(pickle.dumps(C_Polyhedron(constraints=[], variables=["x"])))
+            _ship_polyhedrons = True
+        except Exception:
+            _ship_polyhedrons = False
+    return _ship_polyhedrons
+
+
 class Cfg(MultiDiGraph):
+    """Control flow graph: a networkx ``MultiDiGraph`` whose edges are the
+    transitions, keyed by name, with their ``source``, ``target``,
+    ``constraints``, ``local_vars`` and ``linear`` attributes.
+
+    The linear constraints built by the parsers are
+    :class:`genericparser.linear.LinearConstraint` objects, which behave
+    as ``lpi.Constraint`` but are not instances of it; the other ones are
+    ``lpi`` objects. Use :func:`genericparser.linear.to_lpi` to get the
+    ``lpi.Constraint`` of any of them.
+    """
+
     def get_info(self, key=None):
         return self.graph[key] if key is not None else self.graph
 
     def set_info(self, key, value):
         self.graph[key] = value
 
+    def get_interning_stats(self):
+        """Returns how many names, leaf expressions and constraints were
+        shared while parsing the cfg and the estimated memory saved
+        (see :class:`genericparser.Constraint_parser.Interner`), or None
+        if the parser did not report it. They are not pickled.
+        """
+        return self._interning_stats
+
+    def get_satcheck_stats(self):
+        """Returns how many transitions the last ``remove_unsat_edges``
+        decided as SAT or UNSAT with the prefilter and with the solver,
+        or None if it was not called. They are not pickled.
+        """
+        return self._satcheck_stats
+
+    # statistics of the parse and of remove_unsat_edges, kept out of the
+    # graph information
+    _interning_stats = None
+    _satcheck_stats = None
+    _private_stats = ["_interning_stats", "_satcheck_stats"]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for key in self._private_stats:
+            state.pop(key, None)
+        return state
+
+    # name -> {(source, target): None}, and the edges sorted by name.
+    # They are built on demand and dropped when the edges change. Graph
+    # views (subgraphs) scan their edges instead.
+    _edge_index = None
+    _sorted_edges = None
+
+    def _is_view(self):
+        return "_graph" in self.__dict__
+
+    def _reset_edge_index(self):
+        self._edge_index = None
+        self._sorted_edges = None
+
+    def _name_index(self):
+        if self._edge_index is None:
+            index = {}
+            for s, t, n in self.edges(keys=True):
+                index.setdefault(n, {})[(s, t)] = None
+            self._edge_index = index
+        return self._edge_index
+
     def add_edge(self, source, target, name, **kwargs):
         kwargs["source"] = source
         kwargs["target"] = target
         kwargs["name"] = name
-        return MultiDiGraph.add_edge(self, source, target, key=name, **kwargs)
+        key = MultiDiGraph.add_edge(self, source, target, key=name, **kwargs)
+        if self._edge_index is not None:
+            self._edge_index.setdefault(name, {})[(source, target)] = None
+        self._sorted_edges = None
+        return key
+
+    def remove_edge(self, u, v, key=None):
+        MultiDiGraph.remove_edge(self, u, v, key)
+        pairs = None if key is None or self._edge_index is None else self._edge_index.get(key)
+        if pairs is not None:
+            pairs.pop((u, v), None)
+            if not pairs:
+                del self._edge_index[key]
+            self._sorted_edges = None
+        else:
+            self._reset_edge_index()
+
+    def add_edges_from(self, ebunch_to_add, **attr):
+        try:
+            return MultiDiGraph.add_edges_from(self, ebunch_to_add, **attr)
+        finally:
+            self._reset_edge_index()
+
+    def remove_edges_from(self, ebunch):
+        try:
+            MultiDiGraph.remove_edges_from(self, ebunch)
+        finally:
+            self._reset_edge_index()
+
+    def remove_node(self, n):
+        try:
+            MultiDiGraph.remove_node(self, n)
+        finally:
+            self._reset_edge_index()
+
+    def remove_nodes_from(self, nodes):
+        try:
+            MultiDiGraph.remove_nodes_from(self, nodes)
+        finally:
+            self._reset_edge_index()
+
+    def clear(self):
+        MultiDiGraph.clear(self)
+        self._reset_edge_index()
+
+    def clear_edges(self):
+        MultiDiGraph.clear_edges(self)
+        self._reset_edge_index()
 
     def get_nodes(self, data=False):
         return sorted(self.nodes(data=data))
 
     def get_edges(self, source=None, target=None, name=None):
+        """Returns the edges (their data) sorted by name, filtered by
+        ``source``, ``target`` and ``name`` when they are given.
+        """
+        if self._is_view():
+            edges = self._scan_edges(source, target, name)
+        elif name is not None:
+            adj = self._adj
+            edges = [adj[s][t][name] for s, t in self._name_index().get(name, ())
+                     if (source is None or source == s) and (target is None or target == t)]
+        elif source is not None:
+            nbrs = self._adj.get(source, {})
+            if target is not None:
+                nbrs = {target: nbrs[target]} if target in nbrs else {}
+            edges = [e for keydict in nbrs.values() for e in keydict.values()]
+        elif target is not None:
+            preds = self._pred.get(target, {})
+            edges = [e for keydict in preds.values() for e in keydict.values()]
+        else:
+            if self._sorted_edges is None:
+                self._sorted_edges = sorted((e for __, __, e in self.edges(data=True)),
+                                            key=lambda tr: tr["name"])
+            return list(self._sorted_edges)
+        return sorted(edges, key=lambda tr: tr["name"])
+
+    def _scan_edges(self, source=None, target=None, name=None):
         edges = []
         for s in self:
             if source is None or source == s:
@@ -30,20 +184,66 @@ class Cfg(MultiDiGraph):
                         for n in self[s][t]:
                             if name is None or name == n:
                                 edges.append(self[s][t][n])
-        return sorted(edges, key=lambda tr: tr["name"])
+        return edges
 
     def set_edge_info(self, key, value, source=None, target=None, name=None):
         """Add or Replace a some edge information (``key``, ``value``)
+
+        Setting the ``name`` renames the transitions, which changes their
+        key in the graph.
         """
-        for s in self:
-            if source is None or source == s:
-                for t in self[s]:
-                    if target is None or target == t:
-                        for n in self[s][t]:
-                            if name is None or name == n:
-                                if key in self[s][t][n]:
-                                    del self[s][t][n][key]
-                                self[s][t][n][key] = value
+        for e in self.get_edges(source=source, target=target, name=name):
+            self._set_edge_value(e, key, value)
+
+    def set_edges_info(self, mapping):
+        """Add or Replace the information of several edges at once.
+
+        :param mapping: Edge name -> :obj:`dict` of (``key``, ``value``) to set.
+        :type mapping: dict
+        """
+        for name, info in mapping.items():
+            for e in self.get_edges(name=name):
+                for key, value in info.items():
+                    self._set_edge_value(e, key, value)
+
+    def _set_edge_value(self, e, key, value):
+        if key == "name" and value != e["name"]:
+            self._rename_edge(e, value)
+        if key in e:
+            del e[key]
+        e[key] = value
+
+    def _rename_edge(self, e, name):
+        # the key of a transition is its name
+        if self._is_view():
+            raise ValueError("The transitions of a graph view can not be renamed.")
+        s, t, old = e["source"], e["target"], e["name"]
+        if self._edge_index is not None:
+            used = bool(self._edge_index.get(name))
+        else:
+            used = any(n == name for __, __, n in self.edges(keys=True))
+        if used:
+            raise ValueError("Duplicate transition name {}.".format(name))
+        keydict = self._adj[s][t]
+        # the successors and the predecessors share the key dict
+        del keydict[old]
+        keydict[name] = e
+        if self._edge_index is not None:
+            pairs = self._edge_index[old]
+            del pairs[(s, t)]
+            if not pairs:
+                del self._edge_index[old]
+            self._edge_index.setdefault(name, {})[(s, t)] = None
+        self._sorted_edges = None
+
+    def freeze(self):
+        """Returns a read-only snapshot of the cfg with integer ids and
+        array-backed adjacency, for traversal-heavy analyses.
+
+        :returns: :obj:`genericparser.frozen.FrozenCfg`
+        """
+        from genericparser.frozen import FrozenCfg
+        return FrozenCfg(self)
 
     def set_nodes_info(self, attrs, label=None):
         nx.set_node_attributes(self, attrs, label)
@@ -97,29 +297,93 @@ class Cfg(MultiDiGraph):
         json.dump(summary, path)
         return summary
 
-    def build_polyhedrons(self, update=False):
-        from lpi import C_Polyhedron
+    def build_polyhedrons(self, update=False, workers=1, chunksize=None, min_parallel=256):
+        """Builds the polyhedron of the linear constraints of each
+        transition and removes the unsatisfiable transitions.
+
+        :param update: Rebuild the polyhedrons that already exist.
+        :type update: bool
+        :param workers: Number of processes. None for the number of cpus.
+                        With 1 the polyhedrons are built in this process,
+                        as they are if the lpi polyhedrons can not be pickled.
+        :type workers: int
+        :param chunksize: Number of transitions sent to a worker at once.
+                          Defaults to ``len(transitions) // (4 * workers)``
+                          (at least 1).
+        :type chunksize: int
+        :param min_parallel: Below this number of transitions the
+                             polyhedrons are built in this process.
+        :type min_parallel: int
+        """
+        import os
         gvars = self.graph[constants.variables]
+        pending = []
         for e in self.get_edges():
             if constants.transition.polyhedron in e:
                 if update:
                     del e[constants.transition.polyhedron]
                 else:
                     continue
-            all_vars = gvars + e[constants.transition.localvariables]
-            cons = [c for c in e[constants.transition.constraints] if c.is_linear()]
-            e[constants.transition.polyhedron] = C_Polyhedron(constraints=cons, variables=all_vars)
+            pending.append(e)
+        tasks = [([c for c in e[constants.transition.constraints] if c.is_linear()],
+                  gvars + e[constants.transition.localvariables]) for e in pending]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(tasks) // max(min_parallel, 1) + 1)
+        if workers <= 1 or not _pickles_polyhedrons():
+            results = map(_polyhedron_task, tasks)
+        else:
+            from multiprocessing import Pool
+            if chunksize is None:
+                chunksize = max(1, len(tasks) // (4 * workers))
+            with Pool(workers) as pool:
+                # map keeps the order of the transitions
+                results = pool.map(_polyhedron_task, tasks, chunksize)
+        for e, poly in zip(pending, results):
+            e[constants.transition.polyhedron] = poly
         self.remove_unsat_edges()
 
-    def remove_unsat_edges(self):
+    def constraint_matrices(self, update=False):
+        """Returns the linear constraints of each transition as NumPy
+        arrays ``A x op b`` with the columns in ``global_vars + local_vars``
+        order. They are stored in the transitions and reused unless ``update``.
+
+        :returns: :obj:`dict` from transition name to
+            :obj:`genericparser.matrices.ConstraintMatrices`
+        """
+        from genericparser.matrices import build_matrices
+        return build_matrices(self, update)
+
+    def remove_unsat_edges(self, cache=None):
+        """Removes the transitions whose polyhedron is empty, and then the
+        isolated nodes. Most transitions are decided by a cheap bound
+        propagation; the rest by one solver (see
+        :class:`genericparser.satcheck.SatChecker`).
+
+        :param cache: Results of previous checks, keyed by the constraint
+                      set in any order. None for a cache of this cfg,
+                      True for the cache shared by the process
+                      (:func:`genericparser.satcheck.default_cache`),
+                      False for no cache, or a
+                      :class:`genericparser.satcheck.SatCache`.
+        :returns: :obj:`list` of the names of the removed transitions.
+        """
+        from genericparser.satcheck import SatCache, SatChecker, default_cache
+        if cache is None:
+            if self.__dict__.get("_sat_cache") is None:
+                self._sat_cache = SatCache()
+            cache = self._sat_cache
+        elif cache is True:
+            cache = default_cache()
+        elif cache is False:
+            cache = None
         removed = []
-        from lpi import Solver
+        checker = SatChecker(cache)
         for e in self.get_edges():
-            s = Solver()
-            s.add(e[constants.transition.polyhedron].get_constraints())
-            if not s.is_sat():
+            if not checker.is_sat(e[constants.transition.polyhedron].get_constraints()):
                 self.remove_edge(e["source"], e["target"], e["name"])
                 removed.append(e["name"])
+        self._satcheck_stats = checker.stats
         isolate_node = list(nx.isolates(self))
         for n in isolate_node:
             self.remove_node(n)
@@ -157,32 +421,64 @@ class Cfg(MultiDiGraph):
         return self.get_strongly_connected_component()
 
     def get_close_walks(self, max_length=5, max_appears=2, linear=False):
-        def bt_cw(src, m_len, init, trs_cw=[], trs_count={}):
-            trg = init if m_len == 1 else None
-            for t in self.get_edges(source=src, target=trg):
-                if linear and not t["linear"]:
-                    continue
-                if trs_count.get(t["name"], 0) >= max_appears:
-                    continue
-                new_trs_cw = trs_cw + [t]
-                if m_len == 1:
-                    yield new_trs_cw
+        """Yields the walks (lists of transitions) of at most ``max_length``
+        transitions that start and end in the same entry node, using each
+        transition at most ``max_appears`` times (only the linear ones if
+        ``linear``).
+
+        From each node of a walk, first the transitions that close it are
+        yielded and then the walks that continue through each transition,
+        in name order. A transition is not followed when the shortest path
+        from its target back to the entry node is longer than the
+        transitions left.
+        """
+        from collections import deque
+        out_trs = {}
+        in_trs = {}
+        for t in self.get_edges():
+            if linear and not t[constants.transition.islinear]:
+                continue
+            out_trs.setdefault(t["source"], []).append(t)
+            in_trs.setdefault(t["target"], []).append(t)
+        for init in self.get_info(constants.entries):
+            # shortest number of transitions from each node to init
+            dist = {init: 0}
+            queue = deque([init])
+            while queue:
+                v = queue.popleft()
+                for t in in_trs.get(v, ()):
+                    if t["source"] not in dist:
+                        dist[t["source"]] = dist[v] + 1
+                        queue.append(t["source"])
+            walk = []
+            count = {}
+            # [transitions from the node, next position (-1: not visited), transitions left]
+            stack = [[out_trs.get(init, ()), -1, max_length]]
+            while stack:
+                frame = stack[-1]
+                trs, pos, left = frame
+                if pos < 0:
+                    for t in trs:
+                        if t["target"] == init and count.get(t["name"], 0) < max_appears:
+                            yield walk + [t]
+                    pos = 0 if left > 1 else len(trs)
+                nxt = None
+                while pos < len(trs):
+                    t = trs[pos]
+                    pos += 1
+                    if count.get(t["name"], 0) < max_appears and dist.get(t["target"], left) < left:
+                        nxt = t
+                        break
+                frame[1] = pos
+                if nxt is None:
+                    stack.pop()
+                    if walk:
+                        t = walk.pop()
+                        count[t["name"]] -= 1
                     continue
-                if t["target"] == init:
-                    yield new_trs_cw
-            if m_len > 1:
-                for t in self.get_edges(source=src, target=trg):
-                    if linear and not t["linear"]:
-                        continue
-                    if trs_count.get(t["name"], 0) >= max_appears:
-                        continue
-                    new_trs_cw = trs_cw + [t]
-                    trs_count[t["name"]] = trs_count.get(t["name"], 0) + 1
-                    yield from bt_cw(t["target"], m_len - 1, init, new_trs_cw, trs_count)
-                    trs_count[t["name"]] -= 1
-        entries = self.get_info(constants.entries)
-        for init in entries:
-            yield from bt_cw(init, max_length, init)
+                walk.append(nxt)
+                count[nxt["name"]] = count.get(nxt["name"], 0) + 1
+                stack.append([out_trs.get(nxt["target"], ()), -1, left - 1])
 
     def remove_no_important_variables(self):
         def are_related_vars(vs, vas):
@@ -251,6 +547,10 @@ class Cfg(MultiDiGraph):
             gvars.pop(pos + N)
             gvars.pop(pos)
             N = int(len(gvars) / 2)
+        if count > 0 or nivars:
+            # their rows and columns are no longer the constraints and variables
+            for tr in self.get_edges():
+                tr.pop(constants.transition.matrices, None)
         if count > 0:
             self.build_polyhedrons(update=True)
         return count, nivars
@@ -269,66 +569,34 @@ class Cfg(MultiDiGraph):
         """
         return nx.simple_cycles(self)
 
-    def toDot(self, outfile, invariant_type="none"):
-        """
-        """
-        color = ["#3366CC", "#3B3EAC", "#DC3912", "#FF9900", "#109618",
-                 "#990099", "#3B8EAC", "#0099C6", "#DD4477", "#66AA00",
-                 "#B82E2E", "#316395", "#994499", "#22AA99", "#AAAA11",
-                 "#6633CC", "#E67300", "#8B0707", "#329262", "#5574A6"]
+    @open_file(1, "w")
+    def toDot(self, outfile, invariant_type="none", sccs=False, max_tooltip=None):
+        """Writes the cfg in DOT format, with a label, tooltip and color per
+        transition and the entry nodes filled. The cfg is not modified.
 
-        edg = self.edges(keys=True)
-        count = 0
-        for (u, v, k) in edg:
-            if u == "":
-                continue
-            tr_poly = self[u][v][k][constants.transition.constraints]
-            tr_linear = self[u][v][k][constants.transition.islinear]
-            name = str(k)
-            if not tr_linear:
-                name += " no linear"
-            cons = tr_poly
-            if invariant_type != "none":
-                try:
-                    invariants = self.nodes[u]["invariant_" + str(invariant_type)].get_constraints()
-                    cons += invariants
-                except KeyError:
-                    pass
-            str_cs = [str(c) for c in cons]
-            self[u][v][k]["label"] = name  # + "{{\n{}}}".format(",\n".join(str_cs))
-            endl = '&#13;&#10;'
-            tab = '&#09;'
-            tooltip = "\"" + name + " {" + endl + tab + ("," + endl + tab).join(str_cs) + endl + "}\""
-            self[u][v][k]["tooltip"] = tooltip
-            self[u][v][k]["labeltooltip"] = tooltip
-            self[u][v][k]["edgetooltip"] = tooltip
-            self[u][v][k]["title"] = tooltip
-            self[u][v][k]["color"] = color[count % len(color)]
-            self[u][v][k]["fontcolor"] = color[count % len(color)]
-            count += 1
-
-        entries = self.get_info(constants.entries)
-        for n in self.get_nodes():
-            if n in entries:
-                self.nodes[n]["fillcolor"] = "darkolivegreen1"
-                self.nodes[n]["style"] = "filled"
-            else:
-                self.nodes[n]["fillcolor"] = "transparent"
-                self.nodes[n]["style"] = ""
-            if invariant_type != "none":
-                try:
-                    self.nodes[n]["tooltip"] = str(self.nodes[u]["invariant_" + str(invariant_type)].get_constraints())
-                except KeyError:
-                    pass
-        write_dot(self, outfile)
+        :param sccs: Draw each strongly connected component in a cluster.
+        :type sccs: bool
+        :param max_tooltip: Maximum number of constraints in each tooltip.
+                            None for all of them.
+        :type max_tooltip: int
+        """
+        from genericparser.exporters import BufferedWriter, write_dot
+        with BufferedWriter(outfile) as out:
+            write_dot(self, out, invariant_type, sccs, max_tooltip)
 
     @open_file(1, "w")
     def toSMT2(self, path=None, invariant_type="none"):
+        from genericparser.exporters import BufferedWriter, ExportContext
+        with BufferedWriter(path) as out:
+            self._write_smt2(out, ExportContext(self, invariant_type))
+
+    def _write_smt2(self, path, context):
         path.write("(declare-sort Loc 0)\n")
         # declare nodes
-        for n in self.get_nodes():
+        nodes = context.nodes
+        for n in nodes:
             path.write("(declare-const {} Loc)\n".format(n))
-        path.write("(assert (distinct {}))\n".format(" ".join(self.get_nodes())))
+        path.write("(assert (distinct {}))\n".format(" ".join(nodes)))
         # define how a transition works
         path.write("(define-fun cfg_init ( (pc Loc) (src Loc) (rel Bool) ) Bool (and (= pc src) rel))\n")
         path.write("(define-fun cfg_trans2 ( (pc Loc) (src Loc) (pc1 Loc) (dst Loc) (rel Bool) ) Bool\n")
@@ -345,52 +613,34 @@ class Cfg(MultiDiGraph):
         path.write("(define-fun next_main ( (pc Loc) {} (pc1 Loc) {}) Bool (or\n".format(vs_str, pvs_str))
 
         def toprefixformat(c):
-            return c.toString(str, int, eq_symb="=", opformat="prefix")
-        self.build_polyhedrons()
-        for tr in self.get_edges():
-            cons = tr[constants.transition.constraints]
-            if invariant_type != "none":
-                try:
-                    invariants = self.nodes[tr["source"]]["invariant_" + str(invariant_type)].get_constraints()
-                    cons += invariants
-                except KeyError:
-                    pass
+            return context.format(c, "smt2")
+        for tr in context.edges:
+            cons = tr[constants.transition.constraints] + context.invariants[tr["source"]]
+            local_vars = tr[constants.transition.localvariables]
+            path.write("    (cfg_trans2 pc {} pc1 {} ".format(tr["source"], tr["target"]))
+            if local_vars:
+                path.write("(exists ({}) ".format(" ".join(["({} Int)".format(v) for v in local_vars])))
             if len(cons) == 0:
-                prefix_cons = "true"
+                path.write("true")
+            elif len(cons) == 1:
+                path.write(toprefixformat(cons[0]))
             else:
-                prefix_cons = toprefixformat(cons[0])
-                for c in cons[1:]:
-                    prefix_cons = "(and {} {})".format(prefix_cons, toprefixformat(c))
-            if len(tr[constants.transition.localvariables]) > 0:
-                prefix_cons = "(exists ({}) {})".format(" ".join(["({} Int)".format(v) for v in tr[constants.transition.localvariables]]), prefix_cons)
-
-            path.write("    (cfg_trans2 pc {} pc1 {} {})\n".format(tr["source"], tr["target"], prefix_cons))
+                path.write("(and")
+                for c in cons:
+                    path.write(" ")
+                    path.write(toprefixformat(c))
+                path.write(")")
+            if local_vars:
+                path.write(")")
+            path.write(")\n")
         path.write("  )\n)\n")
 
     @open_file(1, "w")
     def toEspecialProlog(self, path, number=1, idname="noname", invariant_type="none"):
-        def saveName(word):
-            import re
-            return re.sub('[\'\?\!\^.]', '_P', word)
-
-        def generate_pl_names(variables, pl_vars=[], related_vars={}):
-            vs = variables.copy()
-            out_pl_vars = pl_vars.copy()
-            out_related_vars = related_vars.copy()
-            for v in variables:
-                vs.remove(v)
-                i = 1
-                new_v = saveName(v)
-                rnew_v = "Var" + new_v
-                while rnew_v in vs or rnew_v in out_pl_vars:
-                    rnew_v = new_v + str(i)
-                    i += 1
-                out_related_vars[v] = rnew_v
-                out_pl_vars.append(rnew_v)
-            return out_pl_vars, out_related_vars
-
+        from genericparser.exporters import BufferedWriter, ExportContext, prolog_names, save_name
+        context = ExportContext(self, invariant_type)
         global_vars = self.graph[constants.variables]
-        pl_global_vars, related_vars = generate_pl_names(global_vars)
+        pl_global_vars, related_vars = prolog_names(global_vars)
 
         N = int(len(global_vars) / 2)
         if N == 0:
@@ -402,53 +652,36 @@ class Cfg(MultiDiGraph):
             vs = "[" + vs + "]"
             pvs = "[" + pvs + "]"
 
-        # print transitions
-        trs = []
-        for s in self.get_nodes():  # source node
-            source = "n_{}".format(saveName(s))
-            for t in self.get_nodes():  # target node
-                target = "n_{}".format(saveName(t))
-                for tr in self.get_edges(source=s, target=t):  # concrete edge
+        with BufferedWriter(path) as out:
+            out.write("\n\ntest({},\n\t'{}',\n\t{},\n\t{},\n\t[\n".format(number, idname[2:], vs, pvs))
+            sep = ""
+            tr_names = {}
+            for s, edges in context.by_source:
+                source = "n_{}".format(save_name(s))
+                invariants = context.invariants[s]
+                for tr in edges:
+                    target = "n_{}".format(save_name(tr["target"]))
                     local_vars = tr[constants.transition.localvariables]
-                    __, tr_related_vars = generate_pl_names(local_vars, pl_global_vars, related_vars)
-                    renamedvars = lambda v: tr_related_vars[v]
+                    key = tuple(local_vars)
+                    if key not in tr_names:
+                        tr_names[key] = prolog_names(local_vars, pl_global_vars, related_vars)[1]
                     cons = [c for c in tr[constants.transition.constraints] if c.is_linear()]
-                    if invariant_type != "none":
-                        try:
-                            invariants = self.nodes[s]["invariant_" + str(invariant_type)].get_constraints()
-                            cons += invariants
-                        except KeyError:
-                            pass
-                    str_cs = [c.toString(renamedvars, int, eq_symb="=", leq_symb="=<")
-                              for c in cons]
+                    cons += invariants
+                    str_cs = [context.format(c, "prolog", tr_names[key]) for c in cons]
                     phi = ",".join(str_cs)
-                    trs.append("\t\ttr({}, {}, {}, [{}])".format(tr["name"], source, target, phi))
-        path.write("\n\ntest({},\n\t'{}',\n\t{},\n\t{},\n\t[\n{}\n\t]).\n".format(number, idname[2:], vs, pvs, ",\n".join(trs)))
+                    out.write("{}\t\ttr({}, {}, {}, [{}])".format(sep, tr["name"], source, target, phi))
+                    sep = ",\n"
+            out.write("\n\t]).\n")
 
     @open_file(1, "w")
     def toProlog(self, path=None, invariant_type="none", with_cost=False):
+        from genericparser.exporters import BufferedWriter, ExportContext
+        with BufferedWriter(path) as out:
+            return self._write_prolog(out, ExportContext(self, invariant_type), with_cost)
+
+    def _write_prolog(self, out, context, with_cost=False):
         from lpi import Expression
-        def saveName(word):
-            import re
-            return re.sub('[\'\?\!\^.]', '_P', word)
-
-        def generate_pl_names(variables, pl_vars=[], related_vars={}):
-            vs = variables.copy()
-            out_pl_vars = pl_vars.copy()
-            out_related_vars = related_vars.copy()
-            for v in variables:
-                vs.remove(v)
-                i = 1
-                new_v = saveName(v)
-                rnew_v = "Var" + new_v
-                while rnew_v in vs or rnew_v in out_pl_vars:
-                    rnew_v = new_v + str(i)
-                    i += 1
-                out_related_vars[v] = rnew_v
-                out_pl_vars.append(rnew_v)
-            return out_pl_vars, out_related_vars
-
-        
+        from genericparser.exporters import SYNTAXES, prolog_names, save_name
         global_vars = self.graph[constants.variables]
         N = int(len(global_vars) / 2)
         cost_var, cost_pvar = (None, None)
@@ -462,7 +695,7 @@ class Cfg(MultiDiGraph):
             global_vars = global_vars[:N] +[cost_var]+ global_vars[N:]+[cost_pvar]
             N= N + 1
 
-        pl_global_vars, related_vars = generate_pl_names(global_vars)
+        pl_global_vars, related_vars = prolog_names(global_vars)
         if N == 0:
             vs = ""
             pvs = ""
@@ -472,36 +705,40 @@ class Cfg(MultiDiGraph):
             vs = "(" + vs + ")"
             pvs = "(" + pvs + ")"
 
+        # one renaming per list of local variables
+        tr_names = {}
         # print transitions
-        for s in self.get_nodes():  # source node
-            path.write("\n% transitions from node {}\n".format(s))
-            source = "n_{}{}".format(saveName(s), vs)
-            for t in self.get_nodes():  # target node
-                target = "n_{}{}".format(saveName(t), pvs)
-                for tr in self.get_edges(source=s, target=t):  # concrete edge
-                    cons = [c for c in tr[constants.transition.constraints] if c.is_linear()]
-                    if with_cost:
-                        c = tr.get("cost", 1)
-                        cons.append(Expression(cost_pvar) == Expression(cost_var)+c)
-                    if invariant_type != "none":
-                        try:
-                            invariants = self.nodes[tr["source"]]["invariant_" + str(invariant_type)].get_constraints()
-                            cons += invariants
-                        except KeyError:
-                            pass
-                    local_vars = tr[constants.transition.localvariables]
-                    __, tr_related_vars = generate_pl_names(local_vars, pl_global_vars, related_vars)
-                    renamedvars = lambda v: tr_related_vars[v]
-                    str_cs = [c.toString(renamedvars, int, eq_symb="=", leq_symb="=<")
-                              for c in cons]
-                    phi = ",".join(str_cs)
-                    if phi != "":
-                        phi += ", "
-                    path.write("{} :- {}{}.\n".format(source, phi, target))
+        for s, edges in context.by_source:
+            out.write("\n% transitions from node {}\n".format(s))
+            source = "n_{}{}".format(save_name(s), vs)
+            invariants = context.invariants[s]
+            for tr in edges:
+                target = "n_{}{}".format(save_name(tr["target"]), pvs)
+                local_vars = tr[constants.transition.localvariables]
+                key = tuple(local_vars)
+                if key not in tr_names:
+                    tr_names[key] = prolog_names(local_vars, pl_global_vars, related_vars)[1]
+                tr_related_vars = tr_names[key]
+                str_cs = [context.format(c, "prolog", tr_related_vars)
+                          for c in tr[constants.transition.constraints] if c.is_linear()]
+                if with_cost:
+                    c = tr.get("cost", 1)
+                    c = Expression(cost_pvar) == Expression(cost_var)+c
+                    str_cs.append(c.toString(tr_related_vars.__getitem__, int, **SYNTAXES["prolog"]))
+                str_cs += [context.format(c, "prolog", tr_related_vars) for c in invariants]
+                phi = ",".join(str_cs)
+                if phi != "":
+                    phi += ", "
+                out.write("{} :- {}{}.\n".format(source, phi, target))
         return cost_var, cost_pvar
 
     @open_file(1, "w")
     def toFc(self, path=None, invariant_type="none"):
+        from genericparser.exporters import BufferedWriter, ExportContext
+        with BufferedWriter(path) as out:
+            self._write_fc(out, ExportContext(self, invariant_type))
+
+    def _write_fc(self, path, context):
         path.write("{\n")
         global_vars = self.graph[constants.variables]
         N = int(len(global_vars) / 2)
@@ -549,123 +786,147 @@ class Cfg(MultiDiGraph):
                 path.write("      inv_interval: {},\n".format(data["invariant_interval"].get_constraints()))
             path.write("    },\n")
         path.write("  },\n")
-        trs = []
-        for tr in self.get_edges():
-            cons = tr[constants.transition.constraints]
-            if invariant_type != "none":
-                try:
-                    invariants = self.nodes[tr["source"]]["invariant_" + str(invariant_type)].get_constraints()
-                    cons += invariants
-                except KeyError:
-                    pass
-            str_cs = [c.toString(lambda v:v, int, eq_symb="=", leq_symb="=<")
-                      for c in cons]
+        path.write("  transitions: [\n    ")
+        sep = ""
+        for tr in context.edges:
+            cons = tr[constants.transition.constraints] + context.invariants[tr["source"]]
+            str_cs = [context.format(c, "fc") for c in cons]
             c = ", ".join(str_cs)
-            trs.append("{{\n\tsource: {},\n\ttarget: {},".format(tr["source"], tr["target"]) +
+            path.write(sep + "{{\n\tsource: {},\n\ttarget: {},".format(tr["source"], tr["target"]) +
                        "\n\tname: {},\n\tconstraints: [{}]\n    }}".format(tr["name"], c))
-        ts = ",\n    ".join(trs)
-        path.write("  transitions: [\n    {}\n  ]\n".format(ts))
+            sep = ",\n    "
+        path.write("\n  ]\n")
         path.write("}\n")
 
     @open_file(1, "w")
     def toKoat(self, path=None, goal_complexity=False, invariant_type="none", with_cost=False):
+        from genericparser.exporters import BufferedWriter, ExportContext
+        with BufferedWriter(path) as out:
+            self._write_koat(out, ExportContext(self, invariant_type), goal_complexity, with_cost)
+
+    def _write_koat(self, out, context, goal_complexity=False, with_cost=False):
+        import shutil
+        import tempfile
+        from genericparser.exporters import BufferedWriter
         if goal_complexity:
             goal = "COMPLEXITY"
         else:
             goal = "TERMINATION"
-        path.write("(GOAL {})\n".format(goal))
         initnode = self.graph[constants.initnode]
-        rules, str_vars = self._toKoat_rules(invariant_type, with_cost)
-        if len(self.get_edges(target=initnode)) > 0:
-            initnode = "pyRinit"
-            it = 1
-            while initnode in self.get_nodes():
-                initnode = "pyRinit_" + str(it)
-                it += 1
-            global_vars = self.graph[constants.variables]
-            N = int(len(global_vars) / 2)
-            str_vars = ",".join(global_vars[:N])
-            rules = "\n  {}({}) -> Com_1({}({}))\n".format(initnode, str_vars, self.graph[constants.initnode], str_vars) + rules
-        else:
-            rules = "\n" + rules
-        path.write("(STARTTERM (FUNCTIONSYMBOLS {}))\n".format(initnode))
-        path.write("(VAR {})\n".format(str_vars))
-        path.write("(RULES {})\n".format(rules))
+        # the variables are known after writing the rules
+        with tempfile.SpooledTemporaryFile(max_size=1 << 24, mode="w+") as rules:
+            with BufferedWriter(rules) as rules_out:
+                str_vars = self._write_koat_rules(rules_out, context, with_cost)
+            rules.seek(0)
+            out.write("(GOAL {})\n".format(goal))
+            init_rule = ""
+            if len(self.get_edges(target=initnode)) > 0:
+                initnode = "pyRinit"
+                it = 1
+                while initnode in self:
+                    initnode = "pyRinit_" + str(it)
+                    it += 1
+                global_vars = self.graph[constants.variables]
+                N = int(len(global_vars) / 2)
+                str_vars = ",".join(global_vars[:N])
+                init_rule = "  {}({}) -> Com_1({}({}))\n".format(initnode, str_vars, self.graph[constants.initnode], str_vars)
+            out.write("(STARTTERM (FUNCTIONSYMBOLS {}))\n".format(initnode))
+            out.write("(VAR {})\n".format(str_vars))
+            out.write("(RULES \n" + init_rule)
+            shutil.copyfileobj(rules, out)
+            out.write(")\n")
 
     def _toKoat_rules(self, invariant_type, with_cost=False):
-        def isolate(cons, pvars):
-            from lpi import Expression
-            result = cons[:]
-            pvar_exps = []
-            lvars = []
-            lvars_count = 0
-            for v in pvars:
-                v_exp = None
-                try:
-                    toremove = []
-                    for c in result[:]:
-                        if str(c) == "0 == 0":
-                            toremove.append(c)
-                            continue
-                        if not(v in c.get_variables()):
-                            continue
-                        v_exp_isolate = c.isolate(v)
-                        if v_exp is not None:
-                            if str(v_exp) == str(v_exp_isolate):
-                                continue
-                            raise ValueError("Transition is false.")
-                        v_exp = v_exp_isolate
-                        for v2 in pvars:
-                            if v2 in v_exp.get_variables():
-                                raise ValueError("Multiple pvars on the same constraint.")
-                        toremove.append(c)
-                    for c in toremove:
-                        result.remove(c)
-                except ValueError:
-                    v_exp = Expression(v)
-                if not v_exp:
-                    lvars.append("NoDet{}".format(lvars_count))
-                    v_exp = Expression(lvars[lvars_count])
-                    lvars_count += 1
-                pvar_exps.append(v_exp)
-            pvar_str = ", ".join([str(e) for e in pvar_exps])
-            return result, pvar_str, lvars
+        from io import StringIO
+        from genericparser.exporters import ExportContext
+        rules = StringIO()
+        str_vars = self._write_koat_rules(rules, ExportContext(self, invariant_type), with_cost)
+        return rules.getvalue(), str_vars
+
+    def _write_koat_rules(self, path, context, with_cost=False):
+        from genericparser.exporters import KoatUpdates
+        updates = KoatUpdates()
         global_vars = self.graph[constants.variables]
         N = int(len(global_vars) / 2)
         str_vars = ",".join(global_vars[:N])
-        rules = ""
         # lpvars = ",".join(global_vars[N:])
         localV = set()
-        for src in self.get_nodes():
-            for trg in self.get_nodes():
-                for tr in self.get_edges(source=src, target=trg):
-                    cons = tr[constants.transition.constraints]
-                    local_vars = tr[constants.transition.localvariables]
-                    localV = localV.union(local_vars)
-                    cons, pvalues, local_vars = isolate(cons, global_vars[N:])
-                    localV = localV.union(local_vars)
-                    renamedvars = lambda v: str(v)
-                    if invariant_type != "none":
-                        try:
-                            invariants = self.nodes[src]["invariant_" + str(invariant_type)].get_constraints()
-                            cons += invariants
-                        except KeyError:
-                            pass
-
-                    cons_str = [c.toString(renamedvars, int, eq_symb="=")
-                                for c in cons]
-                    if len(cons_str) > 0:
-                        phi = " :|: " + " && ".join(cons_str)
-                    else:
-                        phi = ""
-                    cost = 1
-                    if with_cost:
-                        cost = tr.get("cost", 1)
-                    if cost == 1:
-                        rules += "  {}({}) -> Com_1({}({})){}\n".format(src, str_vars, trg, pvalues, phi)
-                    else:
-                        rules += "  {}({}) -{{{}}}> Com_1({}({})){}\n".format(src, str_vars, int(cost), trg, pvalues, phi)
-        return rules, " ".join(global_vars + list(localV))
+        for src, edges in context.by_source:
+            invariants = context.invariants[src]
+            for tr in edges:
+                trg = tr["target"]
+                cons = tr[constants.transition.constraints]
+                local_vars = tr[constants.transition.localvariables]
+                localV = localV.union(local_vars)
+                cons, pvalues, local_vars = updates.isolate(cons, global_vars[N:])
+                localV = localV.union(local_vars)
+                cons += invariants
+
+                cons_str = [context.format(c, "koat") for c in cons]
+                if len(cons_str) > 0:
+                    phi = " :|: " + " && ".join(cons_str)
+                else:
+                    phi = ""
+                cost = 1
+                if with_cost:
+                    cost = tr.get("cost", 1)
+                if cost == 1:
+                    path.write("  {}({}) -> Com_1({}({})){}\n".format(src, str_vars, trg, pvalues, phi))
+                else:
+                    path.write("  {}({}) -{{{}}}> Com_1({}({})){}\n".format(src, str_vars, int(cost), trg, pvalues, phi))
+        return " ".join(global_vars + list(localV))
+
+    def export(self, outputs, invariant_type="none", threads=1, options=None):
+        """Writes the cfg in several formats with one walk of the graph: the
+        transitions, the invariants and the string of each constraint in
+        each syntax are computed once and shared by every output.
+
+        Example::
+
+            cfg.export({"fc": "prog.fc", "koat": "prog.koat"},
+                       options={"koat": {"goal_complexity": True}})
+
+        :param outputs: Path (or file) of each format: "fc", "koat",
+                        "prolog", "smt2" or "dot".
+        :type outputs: dict
+        :param invariant_type: Invariant added to the transitions, or "none".
+        :type invariant_type: str
+        :param threads: Number of outputs written at the same time.
+        :type threads: int
+        :param options: Extra arguments of the ``to*`` method of each format,
+                        for example ``{"prolog": {"with_cost": True}}``.
+        :type options: dict
+        :returns: :obj:`dict` from format to the value returned by its ``to*`` method.
+        """
+        from genericparser.exporters import BufferedWriter, ExportContext, write_dot
+        writers = {
+            "fc": self._write_fc,
+            "koat": self._write_koat,
+            "prolog": self._write_prolog,
+            "smt2": self._write_smt2,
+            "dot": lambda out, context, **kwargs: write_dot(self, out, context=context, **kwargs),
+        }
+        options = options or {}
+        for fmt in list(outputs) + list(options):
+            if fmt not in writers:
+                raise ValueError("Unknown export format {}. Formats: {}.".format(fmt, ", ".join(writers)))
+        context = ExportContext(self, invariant_type)
+
+        def task(fmt):
+            @open_file(0, "w")
+            def write(path):
+                with BufferedWriter(path) as out:
+                    return writers[fmt](out, context, **options.get(fmt, {}))
+            return write(outputs[fmt])
+
+        formats = list(outputs)
+        if threads > 1 and len(formats) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(task, formats))
+        else:
+            results = [task(fmt) for fmt in formats]
+        return dict(zip(formats, results))
 
     def edge_data_subgraph(self, edges):
         edges_ref = [(e["source"], e["target"], e["name"])
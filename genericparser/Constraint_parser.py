@@ -1,6 +1,10 @@
+import re
+import sys
 from lpi import Expression
 from lark import Transformer
 from . import ParserInterface
+from .linear import LinearConstraint, VariableTable
+from .linear import compare, fold, leaf, negate, power
 
 
 class Parser_Constraint(ParserInterface):
@@ -19,8 +23,10 @@ class Parser_Constraint(ParserInterface):
         return self.parse_string(fctext, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar())
+        constraint = FastConstraintReader().read(cad)
+        if constraint is not None:
+            return constraint
+        parser = self.get_lark()
         return ConstraintTreeTransformer().transform(parser.parse(cad))
 
     def get_grammar(self):
@@ -47,6 +53,116 @@ class Parser_Constraint(ParserInterface):
         """
     
 
+def lark_regexp(pattern):
+    """Returns the Python regular expression ``pattern`` written as a
+    Lark grammar regexp literal.
+    """
+    return "/" + pattern.replace("/", "\\/") + "/"
+
+
+class Parser_ProgramConstraint(Parser_Constraint):
+    """Parser of a single constraint of a fc or mlc program, where ``^``
+    and ``.`` are part of the names (there is no power operator).
+    """
+
+    def parse_string(self, cad, __=None, debug=False):
+        constraint = FastConstraintReader(power=False).read(cad)
+        if constraint is not None:
+            return constraint
+        parser = self.get_lark()
+        return ConstraintTreeTransformer().transform(parser.parse(cad))
+
+    def get_grammar(self):
+        return """
+        start:constraint
+        CMP: "<="|"=>"|"=<"|"=="|">="|">"|"<"|"="
+        SUM: "+" | "-"
+        MUL: "*" | "/"
+
+        CNAME: ("_"|LETTER) ("_"|LETTER|DIGIT|"'"|"^"|"!"|".")*
+
+        term: [SUM] NUMBER | [SUM] CNAME | "(" expression ")"
+        factor: term (MUL term)*
+        expression:  factor (SUM factor)*
+
+        constraint: expression CMP expression
+
+        %import common.NUMBER
+        %import common.LETTER
+        %import common.DIGIT
+        %import common.WS
+        %ignore WS
+        """
+
+
+class Interner:
+    """Shares identical variable names, leaf expressions and constraints
+    built during a parse, and counts how many objects it saved.
+
+    It also keeps the :class:`genericparser.linear.VariableTable` of the
+    linear expressions and constraints of the parse.
+    """
+
+    kinds = ["names", "expressions", "constraints"]
+
+    def __init__(self):
+        # kind -> key -> [shared object, number of requests]
+        self._tables = {k: {} for k in self.kinds}
+        self.variables = VariableTable()
+
+    def _share(self, kind, key, build):
+        table = self._tables[kind]
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [build(), 1]
+        else:
+            entry[1] += 1
+        return entry[0]
+
+    def name(self, name):
+        """Returns the shared copy of the string ``name``.
+        """
+        name = str(name)
+        return self._share("names", name, lambda: sys.intern(name))
+
+    def leaf(self, value):
+        """Returns a shared expression of ``value`` (a variable name or a
+        number): a :class:`genericparser.linear.LinearExpression`, or an
+        ``Expression(value)`` for decimal numbers.
+        """
+        if isinstance(value, str):
+            value = self.name(value)
+        return self._share("expressions", (type(value), value),
+                           lambda: leaf(value, self.variables) or Expression(value))
+
+    def constraint(self, c):
+        """Returns the shared constraint equal to ``c``.
+        """
+        key = c.key() if isinstance(c, LinearConstraint) else str(c)
+        return self._share("constraints", key, lambda: c)
+
+    def stats(self):
+        """Returns, for each kind of object, the number of ``unique`` objects
+        kept and the ``total`` requested, and the estimated ``bytes_saved``.
+        """
+        info = {}
+        saved = 0
+        for k in self.kinds:
+            table = self._tables[k]
+            info[k] = {"unique": len(table), "total": sum(e[1] for e in table.values())}
+            saved += sum((e[1] - 1) * _shallow_size(e[0]) for e in table.values())
+        info["bytes_saved"] = saved
+        return info
+
+
+def _shallow_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        # a copy, the size of a shared-key __dict__ depends on its history
+        size += sys.getsizeof(dict(obj.__dict__))
+    return size
+
+
 class ConstraintTreeTransformer(Transformer):
     """To use this parser, you must add ConstraintTreeTransformer
     as parent of your transformer. Also, your syntax should
@@ -64,76 +180,234 @@ class ConstraintTreeTransformer(Transformer):
     expression:  factor (SUM factor)*
 
     constraint: expression CMP expression
+
+    Names, leaf expressions and constraints are shared through the
+    ``interner`` of the transformer (see :class:`Interner`).
+
+    A grammar may also read a whole constraint as a single token
+    (``constraint: ... | CONSTRAINT``). Its text is read with the
+    :class:`FastConstraintReader` and, if it is rejected, parsed with
+    ``constraint_parser``.
     """
+    interner = None
+    # True if ``^`` is the power operator (see FastConstraintReader)
+    power = True
+    # Parser class for the CONSTRAINT tokens the fast reader rejects.
+    constraint_parser = None
+    _reader = None
+
+    def _interner(self):
+        if self.interner is None:
+            self.interner = Interner()
+        return self.interner
+
     def start(self, node):
         return node[0]
 
+    def name(self, node):
+        return self._interner().name(node[0])
+
     def constraint(self, node):
-        e1 = node[0]
-        e2 = node[2]
-
-        comp = node[1]
-        if(comp == "<"):
-            exp = (e1 < (e2))
-        elif(comp == ">"):
-            exp = (e1 > (e2))
-        elif(comp == "<=" or comp == "=<"):
-            exp = (e1 <= e2)
-        elif(comp == ">=" or comp == "=>"):
-            exp = (e1 >= e2)
-        elif(comp == "=" or comp == "=="):
-            exp = (e1 == e2)
-        else:
-            raise ValueError("Expecting compare op getting {}".format(comp))
-        return exp
+        if len(node) == 1:
+            return self.plain_constraint(str(node[0]))
+        return self._interner().constraint(compare(node[0], node[1], node[2]))
+
+    def plain_constraint(self, text):
+        """Returns the constraint of the text of a CONSTRAINT token.
+        """
+        interner = self._interner()
+        if self._reader is None or self._reader.interner is not interner:
+            self._reader = FastConstraintReader(self.power, interner)
+        c = self._reader.read(text)
+        if c is None:
+            transformer = ConstraintTreeTransformer()
+            transformer.interner = interner
+            c = transformer.transform(self.constraint_parser().get_lark().parse(text))
+        return c
 
     def expression(self, node):
-        exp = node[0]
-        for i in range(2, len(node), 2):
-            op = node[i - 1]
-            e2 = node[i]
-            if op == "+":
-                exp = exp + e2
-            elif op == "-":
-                exp = exp - e2
-        return exp
+        return fold(node[0], [(node[i - 1], node[i]) for i in range(2, len(node), 2)])
 
     def factor(self, node):
-        exp = node[0]
-        for i in range(2, len(node), 2):
-            op = node[i - 1]
-            e2 = node[i]
-            if op == "*":
-                exp = exp * e2
-            elif op == "/":
-                exp = exp / e2
-        return exp
+        return fold(node[0], [(node[i - 1], node[i]) for i in range(2, len(node), 2)])
 
     def term(self, node):
         if len(node) > 2:
             base = self.term(node[:-2])
-            try:
-                pw = int(str(node[-1]))
-            except ValueError:
-                pw = -1
-            if pw < 0:
-                raise ValueError("Exponent must be positive.")
-            elif pw == 0:
-                return Expression(1)
-            else:
-                exp = base
-                for i in range(1,pw):
-                    exp = exp * base
-                return exp
+            return _power(base, str(node[-1]), self._interner())
         if len(node) == 2:
             val_pos = 1
         else:
             val_pos = 0
-        if isinstance(node[val_pos], Expression):
+        if not isinstance(node[val_pos], str):
             val = node[val_pos]
         else:
-            val = Expression(str(node[val_pos]))
+            val = self._interner().leaf(str(node[val_pos]))
         if len(node) == 2 and str(node[0]) == "-":
-            return Expression(0) - val
+            return negate(val)
         else:
             return val
+
+
+def _power(base, exponent, interner):
+    try:
+        pw = int(exponent)
+    except ValueError:
+        pw = -1
+    if pw < 0:
+        raise ValueError("Exponent must be positive.")
+    elif pw == 0:
+        return interner.leaf(1)
+    else:
+        return power(base, pw)
+
+
+_CNAME = r"[_a-zA-Z][_a-zA-Z0-9'!.]*"
+_CNAME_POW = r"[_a-zA-Z][_a-zA-Z0-9'^!.]*"
+_FAST_TOKEN = r"""[ \t\f\r\n]*(?:
+    (?P<number>[0-9]+)(?![0-9.eE_a-zA-Z])
+  | (?P<name>{name})
+  | (?P<cmp><=|=>|=<|==|>=|>|<|=)
+  | (?P<op>[-+*/{pow}()])
+  | (?P<end>\Z))"""
+
+_FAST_TOKENS = {
+    True: re.compile(_FAST_TOKEN.format(name=_CNAME, pow="^"), re.X),
+    # without power operator, "^" is part of the names (fc and mlc)
+    False: re.compile(_FAST_TOKEN.format(name=_CNAME_POW, pow=""), re.X),
+}
+
+# binding powers of the infix operators
+_INFIX = {"+": 10, "-": 10, "*": 20, "/": 20}
+
+
+class FastConstraintReader:
+    """Hand-written reader of the constraint language described in
+    :class:`ConstraintTreeTransformer` (integer numbers only).
+
+    It builds exactly the same constraints as the Lark grammar, but
+    without building a parse tree. :meth:`read` returns None for any
+    input that it does not accept (decimal numbers, syntax errors, ...),
+    then the caller must use the Lark parser, which gives the result or
+    the error message.
+
+    Reading is done in two steps: :meth:`compile` checks the syntax and
+    returns the operations in postfix order, and :meth:`evaluate` builds
+    the constraint. Nothing is interned until :meth:`evaluate`.
+
+    :param power: True if ``^`` is the power operator. Otherwise ``^``
+                  is part of the names, as in the fc and mlc languages.
+    :type power: bool
+    :param interner: :class:`Interner` used to share the names, leafs and
+                     constraints. Defaults to a new one.
+    """
+
+    def __init__(self, power=True, interner=None):
+        self.power = power
+        self.interner = interner if interner is not None else Interner()
+        self._match = _FAST_TOKENS[power].match
+
+    def tokenize(self, text):
+        """Returns the list of (kind, text) tokens of ``text`` or None.
+        """
+        tokens = []
+        pos = 0
+        match = self._match
+        while True:
+            m = match(text, pos)
+            if m is None:
+                return None
+            kind = m.lastgroup
+            if kind == "end":
+                return tokens
+            tokens.append((kind, m.group(kind)))
+            pos = m.end()
+
+    def read(self, text):
+        """Returns the constraint of ``text`` or None if it is rejected.
+        """
+        program = self.compile(text)
+        if program is None:
+            return None
+        return self.evaluate(program)
+
+    def compile(self, text):
+        """Returns the postfix operations of the constraint ``text`` or
+        None if it is rejected.
+        """
+        tokens = self.tokenize(text)
+        if tokens is None:
+            return None
+        tokens.append(("end", ""))
+        program = []
+        i = self._expression(tokens, 0, 0, program)
+        if i is None or tokens[i][0] != "cmp":
+            return None
+        j = self._expression(tokens, i + 1, 0, program)
+        if j is None or tokens[j][0] != "end":
+            return None
+        program.append(("cmp", tokens[i][1]))
+        return program
+
+    def evaluate(self, program):
+        """Builds the constraint of a ``program`` given by :meth:`compile`.
+        Returns None if an arithmetic operation fails, other errors are raised.
+        """
+        leaf = self.interner.leaf
+        # (expression, True if it is not shared)
+        stack = []
+        try:
+            for kind, value in program:
+                if kind == "leaf":
+                    stack.append((leaf(value), False))
+                elif kind == "neg":
+                    stack[-1] = (negate(stack[-1][0]), True)
+                elif kind == "pow":
+                    stack[-1] = (_power(stack[-1][0], value, self.interner), False)
+                else:
+                    right = stack.pop()[0]
+                    left, owned = stack.pop()
+                    if kind == "cmp":
+                        stack.append((compare(left, value, right), False))
+                    else:
+                        stack.append((fold(left, [(value, right)], owned), True))
+        except (ArithmeticError, ValueError):
+            # e.g. division by zero or by a variable, Lark reports the error
+            return None
+        return self.interner.constraint(stack[0][0])
+
+    def _expression(self, tokens, i, min_bp, program):
+        i = self._term(tokens, i, program)
+        while i is not None:
+            kind, op = tokens[i]
+            bp = _INFIX.get(op) if kind == "op" else None
+            if bp is None or bp <= min_bp:
+                break
+            i = self._expression(tokens, i + 1, bp, program)
+            program.append(("op", op))
+        return i
+
+    def _term(self, tokens, i, program):
+        kind, text = tokens[i]
+        if kind == "op" and text == "(":
+            i = self._expression(tokens, i + 1, 0, program)
+            if i is None or tokens[i] != ("op", ")"):
+                return None
+            return i + 1
+        sign = None
+        if kind == "op" and text in "+-":
+            sign = text
+            i += 1
+            kind, text = tokens[i]
+        if kind != "number" and kind != "name":
+            return None
+        program.append(("leaf", text))
+        if sign == "-":
+            program.append(("neg", None))
+        i += 1
+        if kind == "name" and tokens[i] == ("op", "^"):
+            if tokens[i + 1][0] != "number":
+                return None
+            program.append(("pow", tokens[i + 1][1]))
+            return i + 2
+        return i
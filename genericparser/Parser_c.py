@@ -1,4 +1,4 @@
-from genericparser import ParserInterface
+from genericparser import ParserInterface, _communicate
 
 
 class Parser_c(ParserInterface):
@@ -15,15 +15,22 @@ class Parser_c(ParserInterface):
         :returns: :obj:`pyParser.Cfg.Cfg` ControlFlowGraph.
         """
         # C to Koat
-        koatprogram, err = self.c2koat(filepath)
-        koatprogram = koatprogram.decode("utf-8")
-        if err is not None and err:
-            raise Exception(err)
+        def convert():
+            koatprogram, err = self.c2koat(filepath)
+            koatprogram = koatprogram.decode("utf-8")
+            if err is not None and err:
+                raise Exception(err)
+            return koatprogram
+        koatprogram = self.converted_text(filepath, self.c2koatpath, convert)
         # Koat to cfg
         from genericparser.Parser_koat import Parser_koat
-        pkoat = Parser_koat()
+        pkoat = Parser_koat(self.mode)
         return pkoat.parse_string(koatprogram, debug)
 
+    def cache_tag(self):
+        from genericparser.Parser_koat import Parser_koat
+        return Parser_koat().get_grammar()
+
     def c2koat(self, filepath):
         from subprocess import PIPE
         from subprocess import Popen
@@ -31,4 +38,4 @@ class Parser_c(ParserInterface):
         tmpdirname = tempfile.mkdtemp()
         pipe = Popen([self.c2koatpath, self.binpath, tmpdirname, filepath],
                      stdout=PIPE, stderr=PIPE)
-        return pipe.communicate()
+        return _communicate(pipe)
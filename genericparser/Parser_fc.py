@@ -1,11 +1,29 @@
-from genericparser.Constraint_parser import ConstraintTreeTransformer
+import io
+import re
+from genericparser.Constraint_parser import ConstraintTreeTransformer, Parser_ProgramConstraint
+from genericparser.Constraint_parser import lark_regexp
 from genericparser import ParserInterface
 from lpi import Constraint
 from genericparser import constants
+from genericparser.linear import LinearConstraint
+from genericparser.validation import TransitionMetadata, TransitionNames
+from genericparser.validation import check_variables, unique_keys
+
+
+# A constraint without comments nor strings, with at most two levels of
+# parentheses and not starting with a keyword (true, false or null) is read
+# as a single token, by the fast reader of ConstraintTreeTransformer. Any
+# other is parsed with the grammar rules.
+_CHAR = r'(?:[^\[\]{}(),:"#/]|/(?![/*]))'
+_NESTED = r'(?:{c}|\((?:{c}|\((?:{c})*\))*\))'.format(c=_CHAR)
+_CONSTRAINT = r"(?!(?:true|false|null)(?![\w'^!.])){x}*[<>=]{x}*(?=[,\]}}#]|/[/*])".format(x=_NESTED)
 
 
 class Parser_fc(ParserInterface):
 
+    # keywords (vars, source, ...) are told apart from keys by the contextual lexer
+    modes = ["lalr"]
+
     def parse(self, filepath, debug=False):
         """Parse .fc file
 
@@ -20,10 +38,133 @@ class Parser_fc(ParserInterface):
         return self.parse_string(fctext, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar(), parser='lalr')
+        parser = self.get_lark()
         return self.program2cfg(FcTreeTransformer().transform(parser.parse(cad)))
 
+    def parse_stream(self, filepath, debug=False):
+        """Parse .fc file transition by transition.
+
+        The header keys are read first and then each transition is parsed
+        and added to the Cfg on its own, so the memory needed grows with
+        the largest transition and not with the whole program.
+
+        The names of the transitions are read first (without parsing
+        them), so a transition without name gets the same name as with
+        :meth:`parse`.
+
+        :param filepath: Full path to file to be parsed.
+        :type filepath: str
+        :returns: :obj:`pyParser.Cfg.Cfg` ControlFlowGraph.
+        """
+        from genericparser.Cfg import Cfg
+        from genericparser.Constraint_parser import Interner
+        interner = Interner()
+        program, span = self._read_header(filepath, interner)
+        checker = TransitionChecker(program[constants.variables], self._transition_names(filepath, span))
+        G = Cfg()
+        tr_names = TransitionNames()
+        first_source = None
+        for tr in self._iter_transitions(filepath, span, checker, interner):
+            if first_source is None:
+                first_source = tr["source"]
+            self.add_transition(G, tr, tr_names)
+        if _check_key(program, "initnode", optional=True):
+            program[constants.initnode] = program["initnode"]
+            program.pop("initnode", None)
+        elif not _check_key(program, constants.initnode, optional=True):
+            if first_source is None:
+                raise ValueError("No transitions found.")
+            program[constants.initnode] = first_source
+        program["max_local_vars"] = checker.max_local_vars
+        program["interning"] = interner.stats()
+        return self.complete_cfg(G, program, tr_names)
+
+    def read_header(self, filepath):
+        """Reads every key of a .fc file but the transitions.
+
+        :param filepath: Full path to file to be parsed.
+        :type filepath: str
+        :returns: :obj:`dict` with the program information (global variables, nodes, ...)
+        """
+        return self._read_header(filepath)[0]
+
+    def iter_transitions(self, filepath, program=None):
+        """Generator of the transitions of a .fc file, parsed and checked one by one.
+
+        :param filepath: Full path to file to be parsed.
+        :type filepath: str
+        :param program: Header of the program, as given by :meth:`read_header`.
+        :type program: dict
+        :returns: generator of transitions (dict)
+        """
+        from genericparser.Constraint_parser import Interner
+        interner = Interner()
+        header, span = self._read_header(filepath, interner)
+        if program is None:
+            program = header
+        checker = TransitionChecker(program[constants.variables], self._transition_names(filepath, span))
+        return self._iter_transitions(filepath, span, checker, interner)
+
+    def _parse_piece(self, text, interner=None):
+        transformer = FcPieceTransformer()
+        transformer.interner = interner
+        return transformer.transform(self.get_lark().parse(text))
+
+    def _read_header(self, filepath, interner=None):
+        program = {}
+        span = None
+        with open(filepath, "rb") as f, open(filepath, "rb") as g:
+            for start, colon, end in _fc_items(f):
+                text = _read_span(g, start, end)
+                if _is_blank(text):
+                    continue
+                key = None if colon is None else _strip_comments(_read_span(g, start, colon)).strip()
+                if key == "transitions":
+                    if span is not None:
+                        raise ValueError("Duplicate key: {}".format(key))
+                    span = (colon + 1, end)
+                    continue
+                for k, v in self._parse_piece("{" + text + "}", interner).items():
+                    if k in program:
+                        raise ValueError("Duplicate key: {}".format(k))
+                    program[k] = v
+        if span is None:
+            raise ValueError("transitions key not found.")
+        return fc_header(program), span
+
+    def _transition_names(self, filepath, span):
+        """Returns the names given to the transitions in ``span`` (but the
+        ignored ones), read from the top level keys of each transition.
+        A transition that is not a dict is skipped, its parse reports it.
+        """
+        names = []
+        with open(filepath, "rb") as f, open(filepath, "rb") as g:
+            for start, __, end in _fc_items(f, span[0], span[1]):
+                g.seek(start)
+                text = g.read(end - start)
+                keys = {}
+                try:
+                    for k_start, colon, k_end in _fc_items(io.BytesIO(text)):
+                        if colon is not None:
+                            key = _strip_comments(text[k_start:colon].decode("utf-8")).strip()
+                            keys[key] = text[colon + 1:k_end].decode("utf-8")
+                except ValueError:
+                    continue
+                if "name" in keys and "ignore" not in keys:
+                    names.append(_strip_comments(keys["name"]).strip())
+        return names
+
+    def _iter_transitions(self, filepath, span, checker, interner=None):
+        with open(filepath, "rb") as f, open(filepath, "rb") as g:
+            for start, __, end in _fc_items(f, span[0], span[1]):
+                text = _read_span(g, start, end)
+                if _is_blank(text):
+                    continue
+                tr = self._parse_piece(text, interner)
+                if _check_key(tr, "ignore", optional=True):
+                    continue
+                yield checker.check(tr)
+
     def get_grammar(self):
         return """
         // fc language based on json
@@ -38,7 +179,7 @@ class Parser_fc(ParserInterface):
         factor: term (MUL term)*
         expression:  factor (SUM factor)*
         
-        constraint: expression CMP expression
+        constraint: expression CMP expression | CONSTRAINT
         name: CNAME
         string: ESCAPED_STRING
         bool: "true" | "false"
@@ -76,10 +217,12 @@ class Parser_fc(ParserInterface):
         %import common.WS
         %ignore WS
         %ignore COMMENT
-        """
+        """ + "CONSTRAINT.2: " + lark_regexp(_CONSTRAINT) + "\n"
 
 class FcTreeTransformer(ConstraintTreeTransformer):
 
+    power = False
+    constraint_parser = Parser_ProgramConstraint
     list = list
     lvars = list
     pair = tuple
@@ -89,91 +232,211 @@ class FcTreeTransformer(ConstraintTreeTransformer):
     key = lambda self, node: str(node[0])
     namekey = lambda self, node: str(node[0])
     lvarskey = lambda self, node: str(node[0])
-    name = lambda self, node: str(node[0])
 
     def dict(self, node):
-        keys = []
-        for n in node:
-            k, __ = n
-            if k in keys:
-                raise ValueError("Duplicate key: {}".format(k))
-            keys.append(k)
-        return dict(node)
+        return unique_keys(node)
 
     def start(self, node):
-
-        def _check_key(dic, key, optional=False):
-            isin = key in dic
-            if not isin and not optional:
-                raise ValueError("{} key not found.".format(key))
-            return isin
-
         program = node[0]
-        _check_key(program, "vars")
-        program[constants.variables] = program["vars"]
-
-        if _check_key(program, "pvars", optional=True):
-            if len(program["vars"]) != len(program["pvars"]):
-                raise ValueError("Different number of variables and" +
-                                 " prime variables.")
-            program[constants.variables] += program["pvars"]
-            program.pop("pvars", None)
-        else:
-            program[constants.variables] += [v + "'" for v in program["vars"]]
-        program.pop("vars", None)
-
-        for i in range(len(program[constants.variables]) - 1):
-            if program[constants.variables][i] in program[constants.variables][i + 1:]:
-                raise ValueError("Multiple definition of variable: {}".format(program[constants.variables][i]))
-
+        fc_header(program)
         _check_key(program, "transitions")
         program["transitions"] = [tr for tr in program["transitions"] if not _check_key(tr, "ignore", optional=True)]
-        set_gvars = set(program[constants.variables])
-        max_local_vars = 0
-        trs = []
-        trs_name = [t["name"] for t in program["transitions"] if "name" in t]
-        rnd_name_count = 0
-        it_trs = 0
-        for tr in program["transitions"]:
-            _check_key(tr, "source")
-            _check_key(tr, "target")
-            if not _check_key(tr, "name", optional=True):
-                from termination.output import Output_Manager as OM
-                tr_name = "tr" + str(rnd_name_count)
-                while tr_name in trs_name:
-                    rnd_name_count += 1
-                    tr_name = "tr" + str(rnd_name_count)
-                rnd_name_count += 1
-                tr["name"] = tr_name
-                OM.printif(2, "WARNING: no transition name for a transition" +
-                           " from {} to {}. Name given: {}".format(tr["source"], tr["target"], tr["name"]))
-                trs_name.append(tr_name)
-            else:
-                it_trs += 1
-                if tr["name"] in trs_name[it_trs:]:
-                    raise ValueError("Multiple transitions with the same name: {}.".format(tr["name"]))
-            _check_key(tr, constants.transition.constraints)
-            linear = True
-            l_vars = []
-            for c in tr[constants.transition.constraints]:
-                if not isinstance(c, Constraint):
-                    raise ValueError("No-constraint object ({}) found at transition {}.".format(c, tr["name"]))
-                if not c.is_linear():
-                    linear = False
-                ll_vars = [x for x in c.get_variables()
-                           if x not in set_gvars]
-                l_vars.extend(x for x in ll_vars
-                              if x not in l_vars)
-            if len(l_vars) > max_local_vars:
-                max_local_vars = len(l_vars)
-            tr[constants.transition.islinear] = linear
-            tr[constants.transition.localvariables] = l_vars
-            trs.append(tr)
-        program.update(transitions=trs)
+        checker = TransitionChecker(program[constants.variables],
+                                    [t["name"] for t in program["transitions"] if "name" in t])
+        program.update(transitions=[checker.check(tr) for tr in program["transitions"]])
         if _check_key(program, "initnode", optional=True):
             program[constants.initnode] = program["initnode"]
             program.pop("initnode", None)
         elif not _check_key(program, constants.initnode, optional=True):
             program[constants.initnode] = program["transitions"][0]["source"]
-        program["max_local_vars"] = max_local_vars
+        program["max_local_vars"] = checker.max_local_vars
+        program["interning"] = self._interner().stats()
         return program
+
+
+class FcPieceTransformer(FcTreeTransformer):
+    """Transforms a single dict of a fc program (without checking it as a program).
+    """
+
+    def start(self, node):
+        return node[0]
+
+
+def _check_key(dic, key, optional=False):
+    isin = key in dic
+    if not isin and not optional:
+        raise ValueError("{} key not found.".format(key))
+    return isin
+
+
+def fc_header(program):
+    """Checks the variables of a fc ``program`` and sets its global variables.
+    """
+    _check_key(program, "vars")
+    program[constants.variables] = program["vars"]
+
+    if _check_key(program, "pvars", optional=True):
+        if len(program["vars"]) != len(program["pvars"]):
+            raise ValueError("Different number of variables and" +
+                             " prime variables.")
+        program[constants.variables] += program["pvars"]
+        program.pop("pvars", None)
+    else:
+        program[constants.variables] += [v + "'" for v in program["vars"]]
+    program.pop("vars", None)
+
+    check_variables(program[constants.variables])
+    return program
+
+
+class TransitionChecker:
+    """Checks the transitions of a fc program one by one and computes
+    their metadata (name, local variables, linearity).
+
+    :param gvars: Global variables of the program.
+    :param names: Names already used by transitions.
+    """
+
+    def __init__(self, gvars, names=()):
+        # names given in the program, and names of the checked transitions
+        self.names = TransitionNames(names)
+        self.seen = TransitionNames()
+        self.rnd_name_count = 0
+        self.metadata = TransitionMetadata(gvars)
+
+    @property
+    def max_local_vars(self):
+        return self.metadata.max_local_vars
+
+    def check(self, tr):
+        _check_key(tr, "source")
+        _check_key(tr, "target")
+        if not _check_key(tr, "name", optional=True):
+            from termination.output import Output_Manager as OM
+            tr_name = self.names.fresh("tr", self.rnd_name_count)
+            self.rnd_name_count = int(tr_name[len("tr"):]) + 1
+            tr["name"] = tr_name
+            OM.printif(2, "WARNING: no transition name for a transition" +
+                       " from {} to {}. Name given: {}".format(tr["source"], tr["target"], tr["name"]))
+        self.seen.add(tr["name"])
+        self.names.reserve(tr["name"])
+        _check_key(tr, constants.transition.constraints)
+        for c in tr[constants.transition.constraints]:
+            if not isinstance(c, (Constraint, LinearConstraint)):
+                raise ValueError("No-constraint object ({}) found at transition {}.".format(c, tr["name"]))
+        return self.metadata.update(tr)
+
+
+_STREAM_CHUNK = 1 << 16
+_NORMAL = re.compile(rb'[\[\]{}(),:"/#]')
+_STRING_END = re.compile(rb'\\.|"', re.S)
+_COMMENTS = re.compile(r'/\*.*?\*/|//[^\n]*|#[^\n]*', re.S)
+
+
+def _fc_structure(f, offset=0, chunk_size=_STREAM_CHUNK):
+    """Yields (char, offset) for the brackets, commas and colons of a fc
+    text read from the binary file ``f`` (from ``offset``), skipping
+    strings and comments.
+    """
+    f.seek(offset)
+    buf = b""
+    i = 0
+    state = None
+    eof = False
+    while not eof:
+        chunk = f.read(chunk_size)
+        if chunk:
+            offset += i
+            buf = buf[i:] + chunk
+            i = 0
+        else:
+            eof = True
+        n = len(buf)
+        while i < n:
+            if state is None:
+                m = _NORMAL.search(buf, i)
+                if m is None:
+                    i = n
+                    break
+                j = m.start()
+                c = buf[j:j + 1]
+                if c == b"/":
+                    if j + 1 >= n and not eof:
+                        i = j
+                        break
+                    nxt = buf[j + 1:j + 2]
+                    if nxt == b"/":
+                        state = b"\n"
+                        i = j + 2
+                    elif nxt == b"*":
+                        state = b"*/"
+                        i = j + 2
+                    else:
+                        i = j + 1
+                elif c == b"#":
+                    state = b"\n"
+                    i = j + 1
+                elif c == b'"':
+                    state = b'"'
+                    i = j + 1
+                else:
+                    yield c, offset + j
+                    i = j + 1
+            elif state == b'"':
+                m = _STRING_END.search(buf, i)
+                if m is None:
+                    i = n - 1 if buf.endswith(b"\\") and not eof else n
+                    break
+                i = m.end()
+                if m.group() == b'"':
+                    state = None
+            else:
+                j = buf.find(state, i)
+                if j < 0:
+                    i = max(i, n - len(state) + 1)
+                    break
+                i = j + len(state)
+                state = None
+
+
+def _fc_items(f, start=0, end=None, chunk_size=_STREAM_CHUNK):
+    """Yields the (start, colon, end) offsets of the items of the first
+    dict or list found in ``f`` from ``start``. ``colon`` is the offset
+    of the first top level colon of the item (None if there is not).
+    """
+    depth = 0
+    item_start = colon = None
+    for c, off in _fc_structure(f, start, chunk_size):
+        if end is not None and off >= end:
+            break
+        if c in b"{[(":
+            depth += 1
+            if depth == 1:
+                item_start = off + 1
+                colon = None
+        elif c in b"}])":
+            depth -= 1
+            if depth == 0:
+                yield item_start, colon, off
+                return
+        elif depth == 1:
+            if c == b",":
+                yield item_start, colon, off
+                item_start = off + 1
+                colon = None
+            elif c == b":" and colon is None:
+                colon = off
+    raise ValueError("Unexpected end of file.")
+
+
+def _read_span(f, start, end):
+    f.seek(start)
+    return f.read(end - start).decode("utf-8")
+
+
+def _strip_comments(text):
+    return _COMMENTS.sub("", text)
+
+
+def _is_blank(text):
+    return _strip_comments(text).strip() == ""
@@ -1,7 +1,8 @@
 from genericparser.Constraint_parser import ConstraintTreeTransformer
+from genericparser.linear import compare
 from genericparser import ParserInterface
-from lpi import Expression
 from genericparser import constants
+from genericparser.validation import TransitionMetadata, check_variables
 
 
 class Parser_kittle(ParserInterface):
@@ -20,8 +21,7 @@ class Parser_kittle(ParserInterface):
         return self.parse_string(text, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar())
+        parser = self.get_lark()
         return self.program2cfg(KittleTreeTransformer().transform(parser.parse(cad)))
 
     def get_grammar(self):
@@ -32,6 +32,7 @@ class Parser_kittle(ParserInterface):
         CMP: "<="|"=>"|"=<"|"=="|">="|">"|"<"|"="
         SUM: "+" | "-"
         MUL: "*" | "/" 
+        POW: "^"
         
         CNAME: ("_"|LETTER) ("_"|LETTER|DIGIT|"'"|"!"|".")*
         
@@ -83,7 +84,6 @@ class Parser_kittle(ParserInterface):
         """
 
 class KittleTreeTransformer(ConstraintTreeTransformer):
-    name = lambda self, node: str(node[0])
     entry = lambda self, node: node[0]
     constraints = list
     rules = variables = list
@@ -101,14 +101,11 @@ class KittleTreeTransformer(ConstraintTreeTransformer):
         g_vars = [str(v) for v in g_vars]
         N -= 1
         transitions = node
-        program[constants.variables] = g_vars + [v + "'" for v in g_vars]
+        program[constants.variables] = g_vars + [self._interner().name(v + "'") for v in g_vars]
         g_vars = program[constants.variables]
-        for i in range(len(program[constants.variables]) - 1):
-            if program[constants.variables][i] in program[constants.variables][i + 1:]:
-                raise ValueError("Multiple definition of variable: {}".format(program[constants.variables][i]))
+        check_variables(program[constants.variables])
 
-        set_gvars = set(program[constants.variables])
-        max_local_vars = 0
+        metadata = TransitionMetadata(program[constants.variables])
         trs = []
         count = 0
         for t in transitions:
@@ -126,26 +123,14 @@ class KittleTreeTransformer(ConstraintTreeTransformer):
             for idx in range(len(left)):
                 if str(left[idx]) == g_vars[idx]:
                     continue
-                cons.append(left[idx] == Expression(g_vars[idx]))
+                cons.append(self._interner().constraint(compare(left[idx], "==", self._interner().leaf(g_vars[idx]))))
             # add post constraints
             for idx in range(len(right)):
-                cons.append(right[idx] == Expression(g_vars[N + idx]))
+                cons.append(self._interner().constraint(compare(right[idx], "==", self._interner().leaf(g_vars[N + idx]))))
             tr[constants.transition.constraints] = cons
-            linear = True
-            l_vars = []
-            for c in tr[constants.transition.constraints]:
-                if not c.is_linear():
-                    linear = False
-                ll_vars = [x for x in c.get_variables()
-                           if x not in set_gvars]
-                l_vars.extend(x for x in ll_vars
-                              if x not in l_vars)
-            if len(l_vars) > max_local_vars:
-                max_local_vars = len(l_vars)
-            tr[constants.transition.islinear] = linear
-            tr[constants.transition.localvariables] = l_vars
-            trs.append(tr)
+            trs.append(metadata.update(tr))
         program["transitions"] = trs
         program[constants.initnode] = entry
-        program["max_local_vars"] = max_local_vars
+        program["max_local_vars"] = metadata.max_local_vars
+        program["interning"] = self._interner().stats()
         return program
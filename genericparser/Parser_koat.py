@@ -1,7 +1,8 @@
 from genericparser.Constraint_parser import ConstraintTreeTransformer
+from genericparser.linear import compare
 from genericparser import ParserInterface
 from genericparser import constants
-from lpi import Expression
+from genericparser.validation import TransitionMetadata
 
 
 class Parser_koat(ParserInterface):
@@ -20,8 +21,7 @@ class Parser_koat(ParserInterface):
         return self.parse_string(fctext, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar())
+        parser = self.get_lark()
         return self.program2cfg(KoatTreeTransformer().transform(parser.parse(cad)))
 
     def get_grammar(self):
@@ -33,8 +33,10 @@ class Parser_koat(ParserInterface):
         SUM: "+" | "-"
         MUL: "*" | "/"
         POW: "^"
+        COM: /Com_[0-9]+/
         
-        CNAME: ("_"|LETTER) ("_"|LETTER|DIGIT|"'"|"!"|".")*
+        // "Com_<n>" is reserved for the right hand side of the rules
+        CNAME: /(?!Com_[0-9]+(?![_a-zA-Z0-9'!.]))[_a-zA-Z][_a-zA-Z0-9'!.]*/
         
         term: [SUM] NUMBER | [SUM] CNAME | "(" expression ")" | [SUM] CNAME POW NUMBER
         factor: term (MUL term)*
@@ -43,7 +45,6 @@ class Parser_koat(ParserInterface):
         constraint: expression CMP expression
         
         name: CNAME
-        number: NUMBER
         
         _goal: "(" "GOAL" name ")"
         _startterm: "(" "STARTTERM" entry ")"
@@ -59,7 +60,7 @@ class Parser_koat(ParserInterface):
         | (":|:" constraint ( _and constraint)*)
         
         right_hand: node
-        | ("Com_" number "(" (node ("," node)*)? ")")
+        | (COM "(" (node ("," node)*)? ")")
         
         
         rule: node "->" right_hand constraints?
@@ -85,8 +86,6 @@ class Parser_koat(ParserInterface):
 
 class KoatTreeTransformer(ConstraintTreeTransformer):
 
-    name = lambda self, node: str(node[0])
-    number = lambda self, node: int(node[0])
     entry = lambda self, node: node[0]
     constraints = list
     variables = list
@@ -97,7 +96,7 @@ class KoatTreeTransformer(ConstraintTreeTransformer):
         self.variable_list = None
         self.pvars = None
         self.node_data = {}
-        self.max_local_vars = 0
+        self.metadata = None
 
     def rules(self, node):
         trs = []
@@ -123,52 +122,38 @@ class KoatTreeTransformer(ConstraintTreeTransformer):
             self.node_data[src_name]["Com"].append(len(right))
         if self.variable_list is None:
             self.variable_list = [str(v) for v in src_vars]
-            self.pvars = [v + "'" for v in self.variable_list]
+            self.pvars = [self._interner().name(v + "'") for v in self.variable_list]
+            self.metadata = TransitionMetadata(self.variable_list)
         else:
             if len(self.variable_list) != len(src_vars):
                 raise ValueError("variables are not uniform.")
             for v1, v2 in zip(self.variable_list, src_vars):
                 if v1 != str(v2):
                     raise ValueError("variables are not uniform.")
-        base_lvars = []
-        base_linear = True
-        for c in cons:
-            if not c.is_linear():
-                base_linear = False
-            for v in c.get_variables():
-                if v not in self.variable_list and v not in base_lvars:
-                    base_lvars.append(v)
+        base_lvars, base_linear = self.metadata.local_variables(cons)
         trs = []
         for trg, trg_exp in right:
             if len(trg_exp) != len(self.variable_list):
                 raise ValueError("node arguments doesn't match at transition: {} -> {}".format(src_name, trg))
             if trg not in self.node_data:
                 self.node_data[trg] = {"Com": []}
-            linear = base_linear
-            lvars = list(base_lvars)
+            lvars, linear = self.metadata.local_variables(trg_exp, base_lvars)
+            linear = linear and base_linear
             final_cons = list(cons)
             for exp, pv in zip(trg_exp, self.pvars):
-                if not exp.is_linear():
-                    linear = False
-                for v in exp.get_variables():
-                    if v not in self.variable_list and v not in lvars:
-                        lvars.append(v)
-                final_cons.append(exp == Expression(pv))
+                final_cons.append(self._interner().constraint(compare(exp, "==", self._interner().leaf(pv))))
             tr = {}
             tr["source"] = src_name
             tr["target"] = trg
             tr["name"] = "t" + str(self.trs_count)
             tr[constants.transition.constraints] = final_cons
-            tr[constants.transition.localvariables] = lvars
-            tr[constants.transition.islinear] = linear
-            if len(lvars) > self.max_local_vars:
-                self.max_local_vars = len(lvars)
+            self.metadata.set(tr, lvars, linear)
             self.trs_count += 1
             trs.append(tr)
         return trs
 
     def right_hand(self, node):
-        if len(node) > 1 and len(node) == node[0] + 1:
+        if len(node) > 1 and len(node) == int(str(node[0])[len("Com_"):]) + 1:
             return node[1:]
         elif len(node) == 1:
             return node
@@ -187,5 +172,6 @@ class KoatTreeTransformer(ConstraintTreeTransformer):
             program[constants.initnode] = entry
         else:
             program[constants.initnode] = program["transitions"][0]["source"]
-        program["max_local_vars"] = self.max_local_vars
+        program["max_local_vars"] = self.metadata.max_local_vars
+        program["interning"] = self._interner().stats()
         return program
@@ -1,6 +1,15 @@
 from genericparser.Constraint_parser import ConstraintTreeTransformer
+from genericparser.Constraint_parser import Parser_ProgramConstraint, lark_regexp
 from genericparser import ParserInterface
 from genericparser import constants
+from genericparser.validation import TransitionMetadata, check_variables
+
+
+# A constraint line without comments is read as a single token, by the
+# fast reader of ConstraintTreeTransformer. Any other is parsed with the
+# grammar rules.
+_CHAR = r'(?:[^\n#/]|/(?![/*]))'
+_CONSTRAINT = r'{c}*[<>=]{c}*(?=[\n#]|/[/*])'.format(c=_CHAR)
 
 
 class Parser_mlc(ParserInterface):
@@ -19,11 +28,17 @@ class Parser_mlc(ParserInterface):
         return self.parse_string(fctext, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar())
+        parser = self.get_lark()
         return self.program2cfg(MlcTreeTransformer().transform(parser.parse(cad)))
 
     def get_grammar(self):
+        # Earley does not support the priority of the CONSTRAINT token
+        if (self.mode or self.lark_options["parser"]) != "lalr":
+            return self._grammar().replace("PLAIN_CONSTRAINT", "")
+        return self._grammar().replace("PLAIN_CONSTRAINT", "| CONSTRAINT") + \
+            "CONSTRAINT.2: " + lark_regexp(_CONSTRAINT) + "\n"
+
+    def _grammar(self):
         return """
         // mlc language
         
@@ -42,7 +57,7 @@ class Parser_mlc(ParserInterface):
         factor: term (MUL term)*
         expression:  factor (SUM factor)*
         
-        constraint: expression CMP expression
+        constraint: expression CMP expression PLAIN_CONSTRAINT
         
         transition: "!path" _endls (constraint _endls)+
         
@@ -69,7 +84,8 @@ class Parser_mlc(ParserInterface):
 
 
 class MlcTreeTransformer(ConstraintTreeTransformer):
-    name = lambda self, node: str(node[0])
+    power = False
+    constraint_parser = Parser_ProgramConstraint
     transition = list
     transitions = list
     vars = pvars = list
@@ -83,17 +99,14 @@ class MlcTreeTransformer(ConstraintTreeTransformer):
                 raise ValueError("Different number of variables and" +
                                  " prime variables.")
         else:
-            pvars = [v + "'" for v in g_vars]
+            pvars = [self._interner().name(v + "'") for v in g_vars]
 
         program[constants.variables] = g_vars + pvars
-        for i in range(len(program[constants.variables]) - 1):
-            if program[constants.variables][i] in program[constants.variables][i + 1:]:
-                raise ValueError("Multiple definition of variable: {}".format(program[constants.variables][i]))
+        check_variables(program[constants.variables])
 
         program["transitions"] = node[-1]
 
-        set_gvars = set(program[constants.variables])
-        max_local_vars = 0
+        metadata = TransitionMetadata(program[constants.variables])
         trs = []
         count = 0
         for t in program["transitions"]:
@@ -101,22 +114,10 @@ class MlcTreeTransformer(ConstraintTreeTransformer):
             tr["source"] = tr["target"] = "n"
             tr["name"] = "t" + str(count)
             count += 1
-            linear = True
-            l_vars = []
             tr[constants.transition.constraints] = t
-            for c in t:
-                if not c.is_linear():
-                    linear = False
-                ll_vars = [x for x in c.get_variables()
-                           if x not in set_gvars]
-                l_vars.extend(x for x in ll_vars
-                              if x not in l_vars)
-            if len(l_vars) > max_local_vars:
-                max_local_vars = len(l_vars)
-            tr[constants.transition.islinear] = linear
-            tr[constants.transition.localvariables] = l_vars
-            trs.append(tr)
+            trs.append(metadata.update(tr))
         program.update(transitions=trs)
         program[constants.initnode] = program["transitions"][0]["source"]
-        program["max_local_vars"] = max_local_vars
+        program["max_local_vars"] = metadata.max_local_vars
+        program["interning"] = self._interner().stats()
         return program
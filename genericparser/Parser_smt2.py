@@ -1,4 +1,4 @@
-from genericparser import ParserInterface
+from genericparser import ParserInterface, _communicate
 
 
 class Parser_smt2(ParserInterface):
@@ -15,15 +15,22 @@ class Parser_smt2(ParserInterface):
         :returns: :obj:`pyParser.Cfg.Cfg` ControlFlowGraph.
         """
         # SMT2 to Fc
-        fcprogram, err = self.toFC(filepath)
-        fcprogram = fcprogram.decode("utf-8")
-        if err is not None and err:
-            raise Exception(err)
+        def convert():
+            fcprogram, err = self.toFC(filepath)
+            fcprogram = fcprogram.decode("utf-8")
+            if err is not None and err:
+                raise Exception(err)
+            return fcprogram
+        fcprogram = self.converted_text(filepath, self.smtpushdown2path, convert)
         # Fc to cfg
         from genericparser.Parser_fc import Parser_fc
-        pfc = Parser_fc()
+        pfc = Parser_fc(self.mode)
         return pfc.parse_string(fcprogram, debug)
 
+    def cache_tag(self):
+        from genericparser.Parser_fc import Parser_fc
+        return Parser_fc().get_grammar()
+
     def toT2(self, filepath):
         return self.smtpushdown('T2', filepath)
 
@@ -35,4 +42,4 @@ class Parser_smt2(ParserInterface):
         from subprocess import Popen
         pipe = Popen([self.smtpushdown2path, '-convertto', convertto, filepath],
                      stdout=PIPE, stderr=PIPE)
-        return pipe.communicate()
+        return _communicate(pipe)
@@ -1,5 +1,6 @@
 from genericparser.Constraint_parser import ConstraintTreeTransformer
 from genericparser.Parser_fc import Parser_fc
+from genericparser.validation import unique_keys
 
 class Parser_Properties(Parser_fc):
 
@@ -9,8 +10,7 @@ class Parser_Properties(Parser_fc):
         return self.parse_string(fctext, debug=debug)
 
     def parse_string(self, cad, __=None, debug=False):
-        from lark.lark import Lark
-        parser = Lark(self.get_grammar(), parser='lalr')
+        parser = self.get_lark()
         return PropsTreeTransformer().transform(parser.parse(cad))
 
 
@@ -28,13 +28,7 @@ class PropsTreeTransformer(ConstraintTreeTransformer):
     name = lambda self, node: str(node[0])
 
     def dict(self, node):
-        keys = []
-        for n in node:
-            k, __ = n
-            if k in keys:
-                raise ValueError("Duplicate key: {}".format(k))
-            keys.append(k)
-        return dict(node)
+        return unique_keys(node)
 
     def start(self, node):
         return node[0]
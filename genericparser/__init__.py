@@ -3,13 +3,15 @@
 This module can parse several languages and convert them
 to a common Control Flow Graph Class.
 """
+import contextlib
 import os
+import threading
 
-from . import Cfg
 from . import constants
 
 
-__all__ = ['parse', 'parse_constraint', 'parse_cfg_props', 'Cfg', "constants"]
+__all__ = ['parse', 'parse_many', 'parse_constraint', 'parse_constraints', 'parse_cfg_props', 'Cfg', "constants",
+           'warm_grammar_cache', 'grammar_cache_info', 'clear_grammar_cache']
 
 
 class ParserInterface:
@@ -19,7 +21,82 @@ class ParserInterface:
     binpath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "bin")
     c2koatpath = os.path.join(binpath, "c2koat")
     smtpushdown2path = os.path.join(binpath, "smtpushdown2")
-    
+
+    # Options given to ``Lark`` when compiling the grammar of the parser.
+    lark_options = {"parser": "lalr"}
+    # Lark algorithms the grammar is written for.
+    modes = ["lalr", "earley"]
+
+    def __init__(self, mode=None, cache=None):
+        """
+        :param mode: Lark algorithm used to parse: "lalr" or "earley".
+                     Defaults to the ``parser`` of ``lark_options``.
+        :type mode: str
+        :param cache: Persistent cache for :meth:`parse_cached`.
+        :type cache: :obj:`genericparser.cache.ParseCache`
+        """
+        if mode is not None and mode not in self.modes:
+            raise ValueError("Invalid parser mode: {}".format(mode))
+        self.mode = mode
+        self.cache = cache
+
+    # Compiled ``Lark`` instances shared by every parser of the process,
+    # keyed by (parser class, lark options).
+    _lark_cache = {}
+    _lark_cache_lock = threading.Lock()
+    # The counters have their own lock, so a hit does not wait for the
+    # compilation of another grammar.
+    _lark_cache_stats = {"hits": 0, "misses": 0, "tables": 0}
+    _lark_stats_lock = threading.Lock()
+
+    def get_grammar(self):
+        """Returns the lark grammar of the language.
+        """
+        raise Exception("Not implemented yet!")
+
+    def get_lark(self, **options):
+        """Returns the compiled ``Lark`` parser of ``get_grammar()``.
+
+        The grammar is compiled (or loaded from its pre-generated table,
+        see :mod:`genericparser.tables`) only the first time it is requested
+        for a given parser class and options, later calls (from any thread)
+        reuse the same instance.
+
+        :param options: Extra options for ``Lark``. They override ``lark_options``
+                        and the parser ``mode``.
+        :returns: :obj:`lark.Lark` parser.
+        """
+        opts = dict(self.lark_options)
+        if self.mode is not None:
+            opts["parser"] = self.mode
+        opts.update(options)
+        key = (type(self), tuple(sorted(opts.items())))
+        cache = ParserInterface._lark_cache
+        lark = cache.get(key)
+        if lark is not None:
+            ParserInterface._count_lark("hits")
+            return lark
+        with ParserInterface._lark_cache_lock:
+            lark = cache.get(key)
+            if lark is None:
+                from .tables import load_table
+                lark = load_table(self, opts)
+                if lark is None:
+                    from lark.lark import Lark
+                    lark = Lark(self.get_grammar(), **opts)
+                else:
+                    ParserInterface._count_lark("tables")
+                cache[key] = lark
+                ParserInterface._count_lark("misses")
+            else:
+                ParserInterface._count_lark("hits")
+        return lark
+
+    @staticmethod
+    def _count_lark(counter):
+        with ParserInterface._lark_stats_lock:
+            ParserInterface._lark_cache_stats[counter] += 1
+
     def parse(self, filepath, debug=False):
         """Parse .EXTENSION file
 
@@ -31,14 +108,74 @@ class ParserInterface:
         """
         raise Exception("Not implemented yet!")
 
+    def cache_tag(self):
+        """Returns what, besides the content of the file, changes the
+        result of :meth:`parse` (e.g. the grammar).
+        """
+        return self.get_grammar()
+
+    def parse_cached(self, filepath):
+        """Parse a file through the persistent ``cache`` of the parser.
+
+        :param filepath: Full path to file to be parsed.
+        :type filepath: str
+        :returns: :obj:`genericparser.Cfg.Cfg` ControlFlowGraph.
+        """
+        if self.cache is None:
+            return self.parse(filepath)
+        with open(filepath, "rb") as f:
+            content = f.read()
+        key = self.cache.key(content, type(self).__name__, self.mode, self.cache_tag())
+        cfg = self.cache.get(key)
+        if cfg is None:
+            cfg = self.parse(filepath)
+            with _timer_paused():
+                self.cache.put(key, cfg)
+        return cfg
+
+    def converted_text(self, filepath, tool, convert):
+        """Returns ``convert()``, the text given by the external ``tool``
+        (path to the binary) for ``filepath``, through the persistent
+        ``cache`` of the parser.
+        """
+        if self.cache is None:
+            return convert()
+        try:
+            st = os.stat(tool)
+            stamp = (tool, st.st_size, st.st_mtime)
+        except OSError:
+            stamp = tool
+        with open(filepath, "rb") as f:
+            key = self.cache.key(f.read(), stamp)
+        text = self.cache.get(key)
+        if text is None:
+            text = convert()
+            with _timer_paused():
+                self.cache.put(key, text)
+        return text
+
     def program2cfg(self, program):
-        G = Cfg.Cfg()
-        tr_names = []
+        from .Cfg import Cfg
+        from .validation import TransitionNames
+        G = Cfg()
+        tr_names = TransitionNames()
         for t in program["transitions"]:
-            if t["name"] in tr_names:
-                raise ValueError("Multiple transitions with the same name: {}.".format(t["name"]))
-            tr_names.append(t["name"])
-            G.add_edge(**t)
+            self.add_transition(G, t, tr_names)
+        return self.complete_cfg(G, program, tr_names)
+
+    def add_transition(self, G, transition, tr_names):
+        """Adds ``transition`` to the Cfg ``G``.
+
+        :param tr_names: Names of the transitions already in ``G``. It is updated.
+        :type tr_names: :class:`genericparser.validation.TransitionNames`
+        """
+        tr_names.add(transition["name"])
+        G.add_edge(**transition)
+
+    def complete_cfg(self, G, program, tr_names):
+        """Sets the program information (nodes, entries, domain, ...)
+        into ``G`` once its transitions are added.
+        """
         if constants.entries not in program and constants.initnode in program:
             program[constants.entries] = [program[constants.initnode]]
         if "nodes" in program:
@@ -46,23 +183,18 @@ class ParserInterface:
                 for k in program["nodes"][n]:
                     G.nodes[n][k] = program["nodes"][n][k]
         for key in program:
-            if not(key in ["transitions", "nodes"]):
+            if not(key in ["transitions", "nodes", "interning"]):
                 G.set_info(key, program[key])
+        G._interning_stats = program.get("interning")
 
         if len(G.in_edges(G.get_info(constants.initnode))) > 0:
             default_name = "_init"
             init_node = default_name
             i = 1
-            while init_node in G.get_nodes():
+            while init_node in G:
                 init_node = default_name + str(i)
                 i += 1
-            default_name = "t"
-            init_tr = default_name + str(0)
-            i = 1
-            trs_name = [t["name"] for t in program["transitions"]]
-            while init_tr in trs_name:
-                init_tr = default_name + str(i)
-                i += 1
+            init_tr = tr_names.fresh("t")
             from lpi import Expression
             gvs = G.get_info(constants.variables)
             N = int(len(gvs) / 2)
@@ -79,46 +211,330 @@ class ParserInterface:
         return G
 
 
-from . import Parser_fc
-from . import Parser_mlc
-from . import Parser_smt2
-from . import Parser_koat
-from . import Parser_c
+# Submodules are imported the first time they are used, so importing
+# genericparser does not load networkx, pydot, lark or lpi.
+_lazy_modules = ["Cfg", "Parser_fc", "Parser_mlc", "Parser_smt2", "Parser_koat",
+                 "Parser_c", "Parser_kittle", "Constraint_parser", "Properties_parser",
+                 "tables", "cache", "linear", "validation", "frozen", "matrices",
+                 "satcheck", "exporters"]
+
+
+def __getattr__(name):
+    if name in _lazy_modules:
+        import importlib
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_modules))
+
 
 _parserlist = {
-    ".fc": Parser_fc.Parser_fc,
-    ".smt2": Parser_smt2.Parser_smt2,
-    ".mlc": Parser_mlc.Parser_mlc,
-    ".koat": Parser_koat.Parser_koat,
-    ".c": Parser_c.Parser_c
+    ".fc": ("Parser_fc", "Parser_fc"),
+    ".smt2": ("Parser_smt2", "Parser_smt2"),
+    ".mlc": ("Parser_mlc", "Parser_mlc"),
+    ".koat": ("Parser_koat", "Parser_koat"),
+    ".c": ("Parser_c", "Parser_c")
 }
 
 
-def parse(filepath):
+def _parser_class(module, name):
+    import importlib
+    return getattr(importlib.import_module("." + module, __name__), name)
+
+
+def _grammar_parsers():
+    return [_parser_class(m, n) for m, n in [
+        ("Parser_fc", "Parser_fc"), ("Parser_koat", "Parser_koat"),
+        ("Parser_mlc", "Parser_mlc"), ("Parser_kittle", "Parser_kittle"),
+        ("Properties_parser", "Parser_Properties"),
+        ("Constraint_parser", "Parser_Constraint"), ("Constraint_parser", "Parser_ProgramConstraint")]]
+
+
+def warm_grammar_cache(parsers=None, mode=None):
+    """Compile the grammars of the parsers, so later parses skip it.
+
+    :param parsers: Parser classes to warm. Defaults to every parser with a grammar.
+    :type parsers: list
+    :param mode: Lark algorithm to warm. Parsers without that mode are skipped.
+    :type mode: str
+    """
+    if parsers is None:
+        parsers = _grammar_parsers()
+    for p in parsers:
+        if mode is None or mode in p.modes:
+            p(mode).get_lark()
+
+
+def grammar_cache_info():
+    """Returns information about the compiled grammar cache.
+
+    :returns: :obj:`dict` with the number of ``hits``, ``misses`` (and how
+              many of them were loaded from pre-generated ``tables``) and the
+              compiled ``entries`` as (parser name, options).
+    """
+    with ParserInterface._lark_cache_lock:
+        entries = [(cls.__name__, dict(opts))
+                   for cls, opts in ParserInterface._lark_cache]
+        with ParserInterface._lark_stats_lock:
+            info = dict(ParserInterface._lark_cache_stats)
+    info["entries"] = entries
+    return info
+
+
+def clear_grammar_cache():
+    """Remove every compiled grammar from the cache.
+    """
+    with ParserInterface._lark_cache_lock:
+        ParserInterface._lark_cache.clear()
+        with ParserInterface._lark_stats_lock:
+            ParserInterface._lark_cache_stats.update(hits=0, misses=0, tables=0)
+
+
+def parse(filepath, mode=None, cache=None):
     """Parse a file with their corresponding parser
 
     :param filepath: Full path to the file to be parsed
     :type filepath: str
+    :param mode: Lark algorithm: "lalr" (default) or "earley".
+    :type mode: str
+    :param cache: True to use the default persistent cache (see
+                  :mod:`genericparser.cache`) or a ``ParseCache``.
     :returns: :obj:`genericparser.Cfg.Cfg` The corresponding Cfg
     :raises: ParserError
     """
     __, file_extension = os.path.splitext(filepath)
     if(file_extension in _parserlist):
-        name = _parserlist[file_extension]
-        parser = name()
-        return parser.parse(filepath)
+        name = _parser_class(*_parserlist[file_extension])
+        if cache is True:
+            from .cache import default_cache
+            cache = default_cache()
+        elif not cache:
+            cache = None
+        parser = name(mode, cache)
+        return parser.parse_cached(filepath)
     raise Exception("Parser not found (ext: '" + file_extension + "' )")
 
 
-def parse_constraint(cons_string):
-    from . import Constraint_parser
+class _time_limit:
+    """Raise TimeoutError if the block lasts more than ``seconds``.
+
+    It relies on SIGALRM, so it only limits the main thread of a process.
+    The timer is paused while the block stores in the persistent cache or
+    waits for an external tool (see :func:`_timer_paused`).
+    """
+
+    # innermost limit of the main thread
+    _active = None
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def _timeout(self, *__):
+        raise TimeoutError("Parsing timeout ({}s) exceeded.".format(self.seconds))
+
+    def __enter__(self):
+        import signal
+        import time
+        self.enabled = (self.seconds is not None and hasattr(signal, "setitimer") and
+                        threading.current_thread() is threading.main_thread())
+        if self.enabled:
+            self.deadline = time.monotonic() + self.seconds
+            self.outer = _time_limit._active
+            _time_limit._active = self
+            self.old_handler = signal.signal(signal.SIGALRM, self._timeout)
+            try:
+                signal.setitimer(signal.ITIMER_REAL, self.seconds)
+            except BaseException:
+                # a tiny limit can fire before the block starts
+                self.__exit__()
+                raise
+        return self
+
+    def __exit__(self, *__):
+        if self.enabled:
+            import signal
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.old_handler)
+            _time_limit._active = self.outer
+        return False
+
+
+@contextlib.contextmanager
+def _timer_paused():
+    """Disarm the current :class:`_time_limit` during the block, so
+    SIGALRM does not interrupt it, and yield the seconds left (None if
+    there is no limit). The timer is armed again with the time left after
+    the block, and it fires at once if the block used it up.
+    """
+    limit = _time_limit._active
+    if limit is None or threading.current_thread() is not threading.main_thread():
+        yield None
+        return
+    import signal
+    import time
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    try:
+        yield max(limit.deadline - time.monotonic(), 0)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, max(limit.deadline - time.monotonic(), 1e-6))
+
+
+def _communicate(pipe):
+    """Returns ``pipe.communicate()``. The process is killed if it lasts
+    more than the time left of the current :class:`_time_limit`.
+
+    :param pipe: Process started with ``stdout`` and ``stderr`` as PIPE.
+    :type pipe: subprocess.Popen
+    :raises: TimeoutError
+    """
+    import subprocess
+    with _timer_paused() as seconds:
+        try:
+            return pipe.communicate(timeout=seconds)
+        except subprocess.TimeoutExpired:
+            pipe.kill()
+            pipe.communicate()
+            raise TimeoutError("Parsing timeout ({}s) exceeded.".format(_time_limit._active.seconds))
+
+
+def _parse_one(args):
+    filepath, mode, timeout, cache = args
+    try:
+        with _time_limit(timeout):
+            return filepath, parse(filepath, mode, cache)
+    except Exception as e:
+        return filepath, e
+
+
+def _parse_task(args):
+    filepath, result = _parse_one(args)
+    if isinstance(result, Exception):
+        # the exception travels back to the main process
+        import pickle
+        try:
+            pickle.loads(pickle.dumps(result))
+        except Exception:
+            result = Exception("{}: {}".format(type(result).__name__, result))
+    return filepath, result
+
+
+def parse_many(paths, workers=None, chunksize=1, ordered=True, timeout=None, mode=None, cache=None):
+    """Parse several files in a pool of processes.
+
+    Every worker warms the grammar cache once and then parses its share of
+    ``paths``. A file that fails (or lasts more than ``timeout``) gives
+    its exception instead of a Cfg, it does not stop the batch.
+
+    :param paths: Full paths to the files to be parsed.
+    :type paths: iterable
+    :param workers: Number of processes. Defaults to the number of cpus.
+                    With 1 the files are parsed in the calling process.
+    :type workers: int
+    :param chunksize: Number of files sent to a worker at once.
+    :type chunksize: int
+    :param ordered: Yield in the order of ``paths`` (True) or as soon as
+                    each file is parsed (False).
+    :type ordered: bool
+    :param timeout: Seconds allowed to parse each file. None for no limit.
+    :type timeout: float
+    :param mode: Lark algorithm: "lalr" (default) or "earley".
+    :type mode: str
+    :param cache: Persistent cache, as in :func:`parse`.
+    :returns: generator of (path, :obj:`genericparser.Cfg.Cfg` or Exception)
+    """
+    if cache is True:
+        from .cache import default_cache
+        cache = default_cache()
+    tasks = ((path, mode, timeout, cache) for path in paths)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        warm_grammar_cache(mode=mode)
+        for task in tasks:
+            yield _parse_one(task)
+        return
+    from multiprocessing import Pool
+    with Pool(workers, initializer=warm_grammar_cache, initargs=(None, mode)) as pool:
+        if ordered:
+            results = pool.imap(_parse_task, tasks, chunksize)
+        else:
+            results = pool.imap_unordered(_parse_task, tasks, chunksize)
+        for result in results:
+            yield result
+
+
+def _memoized_constraints(maxsize):
+    from functools import lru_cache
+
+    @lru_cache(maxsize=maxsize)
+    def parse(cons_string, mode):
+        from . import Constraint_parser
+        return Constraint_parser.Parser_Constraint(mode).parse_string(cons_string)
+    return parse
+
+
+_parse_constraint_memo = _memoized_constraints(1024)
+
+
+def set_constraint_cache_size(maxsize):
+    """Sets how many constraints ``parse_constraint`` remembers (and empties it).
+
+    :param maxsize: Number of constraints. None for no limit, 0 to disable it.
+    :type maxsize: int
+    """
+    global _parse_constraint_memo
+    _parse_constraint_memo = _memoized_constraints(maxsize)
+
+
+def constraint_cache_info():
+    """Returns hits, misses, maxsize and currsize of the ``parse_constraint`` memo.
+    """
+    return _parse_constraint_memo.cache_info()._asdict()
+
+
+def parse_constraint(cons_string, mode=None):
     """Parse a string to a constraint
+
+    Parsed strings are remembered (see ``set_constraint_cache_size``), the
+    result is a copy, so it can be modified safely.
+
     :param cons_string: string to be parsed
     :type cons_string: str
+    :param mode: Lark algorithm: "lalr" (default) or "earley".
+    :type mode: str
     :returns: :obj: `lpi.Constraint` The corresponding constraint
     :raises: ParserError
     """
-    return Constraint_parser.Parser_Constraint().parse_string(cons_string)
+    from copy import deepcopy
+    return deepcopy(_parse_constraint_memo(cons_string, mode))
+
+
+def parse_constraints(cons_strings, mode=None):
+    """Parse several strings to constraints with a single parser.
+
+    :param cons_strings: strings to be parsed
+    :type cons_strings: iterable
+    :param mode: Lark algorithm: "lalr" (default) or "earley".
+    :type mode: str
+    :returns: :obj: `list` of `lpi.Constraint`, one per string (repeated
+              strings give copies of the same constraint)
+    :raises: ParserError
+    """
+    from copy import deepcopy
+    from . import Constraint_parser
+    parser = Constraint_parser.Parser_Constraint(mode)
+    parsed = {}
+    constraints = []
+    for cons_string in cons_strings:
+        if cons_string in parsed:
+            constraints.append(deepcopy(parsed[cons_string]))
+        else:
+            c = parser.parse_string(cons_string)
+            parsed[cons_string] = c
+            constraints.append(c)
+    return constraints
 
 
 def parse_cfg_props(filepath, cfg):
@@ -0,0 +1,264 @@
+"""Persistent parse cache.
+
+Parsed programs are stored on disk, keyed by a hash of the content of the
+file, the parser (and its grammar), the version of genericparser and the
+cache format version, so
+parsing again the same file (from any process) only loads a pickle.
+The parsers that convert the file with an external tool (``.c`` with
+c2koat, ``.smt2`` with smtpushdown2) also store the converted text.
+
+The cache is bounded: when it grows over ``max_size`` bytes the least
+recently used entries are removed.
+
+Example::
+
+    import genericparser
+    cfg = genericparser.parse("program.koat", cache=True)
+    genericparser.cache.stats()
+    genericparser.cache.purge()
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+# Increase it when the stored objects change (e.g. the Cfg class).
+CACHE_VERSION = 2
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+# stores between two scans of the directory, which other processes may share
+RESCAN_STORES = 1024
+
+# evict() leaves the cache at this fraction of max_size
+EVICT_TARGET = 0.9
+
+_package_version = None
+
+
+def package_version():
+    """Returns the version of genericparser: ``version.txt`` of the source
+    tree or the installed distribution, or "unknown".
+    """
+    global _package_version
+    if _package_version is None:
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "version.txt")
+        try:
+            with open(path) as f:
+                _package_version = f.read().strip()
+        except OSError:
+            try:
+                from importlib.metadata import version
+                _package_version = version("genericparser")
+            except Exception:
+                _package_version = "unknown"
+    return _package_version
+
+
+def default_directory():
+    """Returns ``$GENERICPARSER_CACHE_DIR`` or ``~/.cache/genericparser``.
+    """
+    path = os.environ.get("GENERICPARSER_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "genericparser")
+
+
+class ParseCache:
+    """On disk cache of parsed programs.
+
+    :param directory: Directory of the cache. Defaults to :func:`default_directory`.
+    :type directory: str
+    :param max_size: Maximum size of the cache in bytes.
+    :type max_size: int
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or default_directory()
+        self.max_size = max_size
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        self._lock = threading.Lock()
+        # bytes on disk, None until the directory is scanned
+        self._size = None
+        self._stores = 0
+
+    def __getstate__(self):
+        return {"directory": self.directory, "max_size": self.max_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def key(self, content, *parts):
+        """Returns the key of ``content`` (bytes) for the given ``parts``
+        (parser name, grammar, ...) and the version of genericparser.
+        """
+        h = hashlib.sha256()
+        h.update(str(CACHE_VERSION).encode("utf-8"))
+        h.update(b"\0")
+        h.update(package_version().encode("utf-8"))
+        for p in parts:
+            h.update(b"\0")
+            h.update(str(p).encode("utf-8"))
+        h.update(b"\0")
+        h.update(content)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        """Returns the object stored with ``key`` or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except Exception:
+            self._count("errors")
+            self._count("misses")
+            if self._remove(path):
+                with self._lock:
+                    self._size = None
+            return None
+        try:
+            # recently used
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return value
+
+    def put(self, key, value):
+        """Stores ``value`` with ``key``. Returns False if it can not be pickled.
+        """
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self._count("errors")
+            return False
+        path = self._path(key)
+        try:
+            old = os.stat(path).st_size
+        except OSError:
+            old = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._count("stores")
+        if self.max_size is None:
+            return True
+        # the size is kept in memory; the directory is only scanned the
+        # first time, when the cache is full and every RESCAN_STORES stores
+        with self._lock:
+            self._stores += 1
+            if self._size is not None:
+                self._size += len(data) - old
+            scan = self._size is None or self._size > self.max_size or self._stores % RESCAN_STORES == 0
+        if scan:
+            self.evict()
+        return True
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(".pkl"):
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self):
+        """Removes the least recently used entries when the cache does not
+        fit in ``max_size``, until it takes ``EVICT_TARGET`` of it.
+        """
+        if self.max_size is None:
+            return
+        entries = self._entries()
+        size = sum(e[1] for e in entries)
+        if size > self.max_size:
+            target = self.max_size * EVICT_TARGET
+            entries.sort()
+            for __, esize, path in entries:
+                if size <= target:
+                    break
+                if self._remove(path):
+                    size -= esize
+                    self._count("evictions")
+        with self._lock:
+            self._size = size
+
+    def stats(self):
+        """Returns the hits, misses, stores, evictions and errors of this
+        process, and the number of ``entries`` and ``size`` on disk.
+        """
+        entries = self._entries()
+        with self._lock:
+            info = dict(self._stats)
+        info.update(entries=len(entries), size=sum(e[1] for e in entries),
+                    max_size=self.max_size, directory=self.directory)
+        return info
+
+    def purge(self):
+        """Removes every entry of the cache.
+        """
+        for __, __, path in self._entries():
+            self._remove(path)
+        with self._lock:
+            self._size = None
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Returns the cache used by ``genericparser.parse(..., cache=True)``.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def configure(directory=None, max_size=DEFAULT_MAX_SIZE):
+    """Sets the directory and size of the default cache.
+    """
+    global _default_cache
+    _default_cache = ParseCache(directory, max_size)
+    return _default_cache
+
+
+def stats():
+    """Statistics of the default cache. See :meth:`ParseCache.stats`.
+    """
+    return default_cache().stats()
+
+
+def purge():
+    """Removes every entry of the default cache.
+    """
+    default_cache().purge()
@@ -14,6 +14,7 @@ class transition:
     localvariables = "local_vars"
     islinear = "linear"
     isdeterministic = "deterministic"
+    matrices = "constraint_matrices"
 
 
 class node:
@@ -0,0 +1,375 @@
+"""Shared core of the ``Cfg.to*`` exporters.
+
+The exporters walk the transitions grouped by source node
+(:func:`edges_by_source`, one pass over the edges instead of one lookup
+per pair of nodes) and write through a :class:`BufferedWriter`, which
+joins the small pieces of text and writes them in large blocks, so the
+whole output is never built in memory.
+"""
+import re
+import threading
+from fractions import Fraction
+from genericparser import constants
+from genericparser.linear import LinearConstraint, linear_terms
+
+BUFFER_SIZE = 1 << 16
+
+
+class BufferedWriter:
+    """Collects the text written and passes it to ``out`` in blocks of
+    about ``size`` characters. Use it as a context manager, or call
+    :meth:`flush` at the end.
+
+    :param out: File-like object with a ``write`` method.
+    :param size: Characters kept before writing.
+    :type size: int
+    """
+
+    def __init__(self, out, size=BUFFER_SIZE):
+        self.out = out
+        self.size = size
+        self._parts = []
+        self._length = 0
+
+    def write(self, text):
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self.size:
+            self.flush()
+
+    def writelines(self, texts):
+        for text in texts:
+            self.write(text)
+
+    def flush(self):
+        if self._parts:
+            self.out.write("".join(self._parts))
+            self._parts = []
+            self._length = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+
+def edges_by_source(cfg):
+    """Returns a list of ``(source, edges)`` for every node of ``cfg`` in
+    ``get_nodes`` order, with its outgoing edges ordered by target (in
+    ``get_nodes`` order) and name, as the loops over every pair of nodes.
+    """
+    return _group_by_source(cfg.get_nodes(), cfg.get_edges())
+
+
+def _group_by_source(nodes, edges):
+    position = {n: i for i, n in enumerate(nodes)}
+    groups = {n: [] for n in nodes}
+    for e in edges:
+        groups[e["source"]].append(e)
+    for edges in groups.values():
+        # stable: keeps the name order for the same target
+        edges.sort(key=lambda e: position[e["target"]])
+    return [(n, groups[n]) for n in nodes]
+
+
+def node_invariants(cfg, node, invariant_type):
+    """Returns the constraints of the invariant ``invariant_type`` of
+    ``node``, or an empty list if it has none (or it is "none").
+    """
+    if invariant_type == "none":
+        return []
+    try:
+        return cfg.nodes[node]["invariant_" + str(invariant_type)].get_constraints()
+    except KeyError:
+        return []
+
+
+# toString options of the constraints in each output syntax
+SYNTAXES = {
+    "fc": {"eq_symb": "=", "leq_symb": "=<"},
+    "koat": {"eq_symb": "="},
+    "prolog": {"eq_symb": "=", "leq_symb": "=<"},
+    "smt2": {"eq_symb": "=", "opformat": "prefix"},
+}
+
+
+class ExportContext:
+    """What the exporters need from ``cfg``, computed in one walk of the
+    graph: the transitions (in ``get_edges`` order and grouped by source,
+    as :func:`edges_by_source`) and the invariant of each node. It also
+    keeps the string of each constraint in each syntax, so one context
+    shared by several exporters formats every constraint once per syntax.
+
+    The caches of :meth:`format` are only written under a lock, so one
+    context can be shared by several threads (see ``Cfg.export``). Two
+    threads may format the same constraint at once, the first string
+    stored is kept.
+
+    :param cfg: Control flow graph.
+    :type cfg: :class:`genericparser.Cfg.Cfg`
+    :param invariant_type: Invariant added to the transitions, or "none".
+    :type invariant_type: str
+    """
+
+    def __init__(self, cfg, invariant_type="none"):
+        self.invariant_type = invariant_type
+        self.nodes = cfg.get_nodes()
+        self.edges = cfg.get_edges()
+        self.by_source = _group_by_source(self.nodes, self.edges)
+        self.invariants = {n: node_invariants(cfg, n, invariant_type) for n in self.nodes}
+        # (syntax, id(names)) -> {id(constraint): (constraint, string)}
+        self._strings = {}
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def format(self, c, syntax, names=None):
+        """Returns the string of the constraint ``c`` in ``syntax`` (a key
+        of ``SYNTAXES``), with the variables renamed by the dict ``names``.
+        The same ``names`` object must be used for the same renaming.
+        """
+        key = (syntax, id(names))
+        strings = self._strings.get(key)
+        if strings is None:
+            with self._lock:
+                # keeps names alive, so its id is not reused
+                self._names[id(names)] = names
+                strings = self._strings.setdefault(key, {})
+        entry = strings.get(id(c))
+        if entry is None:
+            rename = str if names is None else names.__getitem__
+            string = c.toString(rename, int, **SYNTAXES[syntax])
+            with self._lock:
+                entry = strings.setdefault(id(c), (c, string))
+        return entry[1]
+
+
+def save_name(word):
+    """Replaces the characters that are not valid in Prolog names.
+    """
+    return re.sub('[\'\\?\\!\\^.]', '_P', word)
+
+
+def prolog_names(variables, pl_vars=(), related_vars=None):
+    """Returns the Prolog variable names (``pl_vars`` followed by the new
+    ones) and the map from each variable to its Prolog name, for the
+    ``variables`` added to ``pl_vars`` and ``related_vars``.
+    """
+    vs = list(variables)
+    out_pl_vars = list(pl_vars)
+    out_related_vars = dict(related_vars or {})
+    for v in variables:
+        vs.remove(v)
+        i = 1
+        new_v = save_name(v)
+        rnew_v = "Var" + new_v
+        while rnew_v in vs or rnew_v in out_pl_vars:
+            rnew_v = new_v + str(i)
+            i += 1
+        out_related_vars[v] = rnew_v
+        out_pl_vars.append(rnew_v)
+    return out_pl_vars, out_related_vars
+
+
+_FAILED = object()
+
+
+class KoatUpdates:
+    """Isolates the value of each primed variable from the constraints of
+    the transitions, for the koat rules ``f(x) -> Com_1(g(update))``.
+
+    Each transition is indexed by variable, so only the constraints that
+    contain a primed variable are visited, and the isolated expressions
+    are cached by constraint (the parsers share equal constraints), so
+    the same equality is isolated once per export.
+    """
+
+    def __init__(self):
+        # id(constraint) -> (constraint, {variable: expression or _FAILED})
+        self._isolated = {}
+        self._strings = {}
+
+    def _isolate(self, c, v):
+        entry = self._isolated.get(id(c))
+        if entry is None:
+            entry = self._isolated[id(c)] = (c, {})
+        cache = entry[1]
+        if v not in cache:
+            try:
+                cache[v] = c.isolate(v)
+            except ValueError:
+                cache[v] = _FAILED
+        if cache[v] is _FAILED:
+            raise ValueError("Can not isolate {}.".format(v))
+        return cache[v]
+
+    def _str(self, exp):
+        entry = self._strings.get(id(exp))
+        if entry is None:
+            entry = self._strings[id(exp)] = (exp, str(exp))
+        return entry[1]
+
+    def _same(self, c1, e1, c2, e2, v):
+        # e1 and e2 are the values of v isolated from c1 and c2
+        if e1 is e2:
+            return True
+        if isinstance(c1, LinearConstraint) and isinstance(c2, LinearConstraint):
+            f1, f2 = _scaled(c1, v), _scaled(c2, v)
+            if f1 is not None and f2 is not None:
+                return f1 == f2
+        return self._str(e1) == self._str(e2)
+
+    def isolate(self, cons, pvars):
+        """Returns the constraints of ``cons`` that are not used to define
+        the primed variables ``pvars``, the string of the values of
+        ``pvars`` and the new non-deterministic variables.
+        """
+        from lpi import Expression
+        alive = [True] * len(cons)
+        index = {}
+        trivial = set()
+        for pos, c in enumerate(cons):
+            variables = c.variable_names() if isinstance(c, LinearConstraint) else c.get_variables()
+            for x in variables:
+                index.setdefault(x, []).append(pos)
+            if not _nonzero_variables(c, variables) and str(c) == "0 == 0":
+                trivial.add(pos)
+        pvar_set = set(pvars)
+        pvar_exps = []
+        lvars = []
+        lvars_count = 0
+        for v in pvars:
+            v_exp = None
+            v_cons = None
+            try:
+                toremove = []
+                # in order, the constraints "0 == 0" and the ones with v
+                positions = sorted(trivial.union(index.get(v, ())))
+                for pos in positions:
+                    if not alive[pos]:
+                        continue
+                    if pos in trivial:
+                        toremove.append(pos)
+                        continue
+                    c = cons[pos]
+                    v_exp_isolate = self._isolate(c, v)
+                    if v_exp is not None:
+                        if self._same(v_cons, v_exp, c, v_exp_isolate, v):
+                            continue
+                        raise ValueError("Transition is false.")
+                    v_exp = v_exp_isolate
+                    v_cons = c
+                    if pvar_set.intersection(v_exp.get_variables()):
+                        raise ValueError("Multiple pvars on the same constraint.")
+                    toremove.append(pos)
+                for pos in toremove:
+                    alive[pos] = False
+            except ValueError:
+                v_exp = Expression(v)
+            if not v_exp:
+                lvars.append("NoDet{}".format(lvars_count))
+                v_exp = Expression(lvars[lvars_count])
+                lvars_count += 1
+            pvar_exps.append(v_exp)
+        result = [c for c, a in zip(cons, alive) if a]
+        pvar_str = ", ".join([self._str(e) for e in pvar_exps])
+        return result, pvar_str, lvars
+
+
+def _nonzero_variables(c, variables):
+    if isinstance(c, LinearConstraint):
+        return any(a != 0 for a in c.coeffs.values())
+    return bool(variables)
+
+
+def _scaled(c, v):
+    # linear form of c divided by the coefficient of v, or None
+    variables, coeffs, const, __ = linear_terms(c)
+    forms = {x: Fraction(a) for x, a in zip(variables, coeffs) if a != 0}
+    a = forms.get(v)
+    if not a or c.op != "==":
+        return None
+    return {x: b / a for x, b in forms.items()}, Fraction(const) / a
+
+
+DOT_COLORS = ["#3366CC", "#3B3EAC", "#DC3912", "#FF9900", "#109618",
+              "#990099", "#3B8EAC", "#0099C6", "#DD4477", "#66AA00",
+              "#B82E2E", "#316395", "#994499", "#22AA99", "#AAAA11",
+              "#6633CC", "#E67300", "#8B0707", "#329262", "#5574A6"]
+
+
+def dot_id(value):
+    """Returns ``value`` as a quoted DOT identifier.
+    """
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _dot_attrs(attrs):
+    return "[" + ", ".join("{}={}".format(k, dot_id(v)) for k, v in attrs) + "]"
+
+
+def write_dot(cfg, out, invariant_type="none", sccs=False, max_tooltip=None, context=None):
+    """Writes ``cfg`` in DOT format to ``out``, with the same labels,
+    tooltips and colors as ``Cfg.toDot``, without changing ``cfg``.
+
+    :param sccs: Draw each strongly connected component (of more than one
+                 node) in a cluster.
+    :type sccs: bool
+    :param max_tooltip: Maximum number of constraints in each tooltip.
+                        None for all of them.
+    :type max_tooltip: int
+    :param context: Shared :class:`ExportContext`, which gives the
+                    ``invariant_type``.
+    """
+    if context is None:
+        context = ExportContext(cfg, invariant_type)
+    endl = '&#13;&#10;'
+    tab = '&#09;'
+    entries = cfg.get_info(constants.entries)
+
+    def node_line(n):
+        attrs = [("fillcolor", "darkolivegreen1"), ("style", "filled")] if n in entries else \
+            [("fillcolor", "transparent"), ("style", "")]
+        invariant = context.invariants[n]
+        if invariant:
+            attrs.append(("tooltip", str(invariant)))
+        return "{} {};\n".format(dot_id(n), _dot_attrs(attrs))
+
+    out.write("digraph  {\n")
+    nodes = context.nodes
+    clustered = set()
+    if sccs:
+        frozen = cfg.freeze()
+        members = {}
+        for n, c in zip(frozen.nodes, frozen.scc_ids()):
+            members.setdefault(c, []).append(n)
+        components = [ns for ns in members.values() if len(ns) > 1]
+        for i, component in enumerate(components):
+            out.write("subgraph cluster_{} {{\n".format(i))
+            for n in component:
+                out.write(node_line(n))
+            out.write("}\n")
+            clustered.update(component)
+    for n in nodes:
+        if n not in clustered:
+            out.write(node_line(n))
+    count = 0
+    for u, v, k, data in cfg.edges(keys=True, data=True):
+        if u == "":
+            out.write("{} -> {} [key={}];\n".format(dot_id(u), dot_id(v), dot_id(k)))
+            continue
+        name = str(k)
+        if not data[constants.transition.islinear]:
+            name += " no linear"
+        str_cs = [str(c) for c in data[constants.transition.constraints]]
+        str_cs += [str(c) for c in context.invariants[u]]
+        if max_tooltip is not None and len(str_cs) > max_tooltip:
+            str_cs = str_cs[:max_tooltip] + ["... {} more".format(len(str_cs) - max_tooltip)]
+        tooltip = name + " {" + endl + tab + ("," + endl + tab).join(str_cs) + endl + "}"
+        color = DOT_COLORS[count % len(DOT_COLORS)]
+        attrs = [("key", k), ("label", name), ("tooltip", tooltip), ("labeltooltip", tooltip),
+                 ("edgetooltip", tooltip), ("title", tooltip), ("color", color), ("fontcolor", color)]
+        out.write("{} -> {} {};\n".format(dot_id(u), dot_id(v), _dot_attrs(attrs)))
+        count += 1
+    out.write("}\n")
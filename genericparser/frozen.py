@@ -0,0 +1,261 @@
+"""Read-only compact snapshot of a :class:`genericparser.Cfg.Cfg`.
+
+Nodes and transitions are numbered with integers: nodes in the order of
+``Cfg.get_nodes`` and transitions in the order of ``Cfg.get_edges``
+(by name). The forward and reverse adjacency are stored in CSR form
+(offsets and transition ids in ``array`` objects) and the transition
+attributes in parallel sequences, so traversals do not go through the
+dict-of-dict structure of networkx.
+
+Example::
+
+    frozen = cfg.freeze()
+    for scc in frozen.strongly_connected_components():
+        ...
+    frozen.reachable(frozen.get_info("init_node"))
+"""
+from array import array
+from types import MappingProxyType
+from genericparser import constants
+
+_KNOWN = ("source", "target", "name", constants.transition.constraints,
+          constants.transition.localvariables, constants.transition.islinear)
+
+
+def _csr(count, keys, ids):
+    # offsets[k]..offsets[k + 1] are the positions of the ids with key k
+    offsets = array("i", [0]) * (count + 1)
+    for k in keys:
+        offsets[k + 1] += 1
+    for k in range(count):
+        offsets[k + 1] += offsets[k]
+    filled = array("i", offsets[:-1])
+    items = array("i", [0]) * len(ids)
+    for i in ids:
+        k = keys[i]
+        items[filled[k]] = i
+        filled[k] += 1
+    return offsets, items
+
+
+class FrozenCfg:
+    """Immutable snapshot of ``cfg``. See :meth:`genericparser.Cfg.Cfg.freeze`.
+
+    :param cfg: Control flow graph.
+    :type cfg: :class:`genericparser.Cfg.Cfg`
+    """
+
+    def __init__(self, cfg):
+        try:
+            nodes = sorted(cfg.nodes())
+        except TypeError:
+            nodes = list(cfg.nodes())
+        self.nodes = tuple(nodes)
+        self._node_id = {n: i for i, n in enumerate(self.nodes)}
+        self._info = MappingProxyType(dict(cfg.get_info()))
+        self._node_data = tuple(MappingProxyType(dict(cfg.nodes[n])) for n in self.nodes)
+
+        edges = cfg.get_edges()
+        node_id = self._node_id
+        self.names = tuple(e["name"] for e in edges)
+        self._edge_id = {}
+        for i, name in enumerate(self.names):
+            self._edge_id.setdefault(name, []).append(i)
+        self.sources = array("i", (node_id[e["source"]] for e in edges))
+        self.targets = array("i", (node_id[e["target"]] for e in edges))
+        self.constraints = tuple(tuple(e.get(constants.transition.constraints, ())) for e in edges)
+        self.local_vars = tuple(tuple(e.get(constants.transition.localvariables, ())) for e in edges)
+        self.linear = array("b", (bool(e.get(constants.transition.islinear, False)) for e in edges))
+        # other attributes (polyhedron, cost, ...), None if there are not
+        self._extra = tuple({k: v for k, v in e.items() if k not in _KNOWN} or None for e in edges)
+        # read-only mappings, built on demand by edge()
+        self._edges = [None] * len(edges)
+
+        ids = range(len(edges))
+        self._out_offsets, self._out = _csr(len(self.nodes), self.sources, ids)
+        self._in_offsets, self._in = _csr(len(self.nodes), self.targets, ids)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node):
+        return node in self._node_id
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.names)
+
+    def get_info(self, key=None):
+        return self._info[key] if key is not None else self._info
+
+    def get_nodes(self, data=False):
+        if data:
+            return list(zip(self.nodes, self._node_data))
+        return list(self.nodes)
+
+    def node_id(self, node):
+        """Returns the integer id of ``node``.
+        """
+        return self._node_id[node]
+
+    def out_edge_ids(self, node_id):
+        """Ids of the transitions leaving the node ``node_id``, by name.
+        """
+        return self._out[self._out_offsets[node_id]:self._out_offsets[node_id + 1]]
+
+    def in_edge_ids(self, node_id):
+        """Ids of the transitions reaching the node ``node_id``, by name.
+        """
+        return self._in[self._in_offsets[node_id]:self._in_offsets[node_id + 1]]
+
+    def edge(self, edge_id):
+        """Returns a read-only mapping with the data of the transition ``edge_id``.
+        """
+        if self._edges[edge_id] is not None:
+            return self._edges[edge_id]
+        data = {"source": self.nodes[self.sources[edge_id]],
+                "target": self.nodes[self.targets[edge_id]],
+                "name": self.names[edge_id],
+                constants.transition.constraints: self.constraints[edge_id],
+                constants.transition.localvariables: self.local_vars[edge_id],
+                constants.transition.islinear: bool(self.linear[edge_id])}
+        if self._extra[edge_id] is not None:
+            data.update(self._extra[edge_id])
+        self._edges[edge_id] = MappingProxyType(data)
+        return self._edges[edge_id]
+
+    def get_edges(self, source=None, target=None, name=None):
+        """Same as :meth:`genericparser.Cfg.Cfg.get_edges`, with read-only edges.
+        """
+        if name is not None:
+            ids = self._edge_id.get(name, ())
+        elif source is not None:
+            if source not in self._node_id:
+                return []
+            ids = self.out_edge_ids(self._node_id[source])
+        elif target is not None:
+            if target not in self._node_id:
+                return []
+            ids = self.in_edge_ids(self._node_id[target])
+        else:
+            ids = range(len(self.names))
+        if source is not None:
+            s = self._node_id.get(source)
+            ids = [i for i in ids if self.sources[i] == s]
+        if target is not None:
+            t = self._node_id.get(target)
+            ids = [i for i in ids if self.targets[i] == t]
+        return [self.edge(i) for i in ids]
+
+    def successors(self, node):
+        """Nodes reached by a transition from ``node`` (without repetitions).
+        """
+        targets = self.targets
+        ids = self.out_edge_ids(self._node_id[node])
+        return [self.nodes[t] for t in dict.fromkeys(targets[i] for i in ids)]
+
+    def predecessors(self, node):
+        """Nodes with a transition to ``node`` (without repetitions).
+        """
+        sources = self.sources
+        ids = self.in_edge_ids(self._node_id[node])
+        return [self.nodes[s] for s in dict.fromkeys(sources[i] for i in ids)]
+
+    def neighbors(self, node):
+        """Predecessors and successors of ``node``, as ``Cfg.neighbors``.
+        """
+        return self.predecessors(node) + self.successors(node)
+
+    def reachable(self, sources, reverse=False):
+        """Returns the set of nodes reachable from ``sources`` (a node or a
+        list of nodes), including them. With ``reverse``, the nodes that
+        reach them.
+        """
+        try:
+            if sources in self._node_id:
+                sources = [sources]
+        except TypeError:
+            pass
+        if reverse:
+            offsets, items, ends = self._in_offsets, self._in, self.sources
+        else:
+            offsets, items, ends = self._out_offsets, self._out, self.targets
+        seen = bytearray(len(self.nodes))
+        stack = [self._node_id[n] for n in sources]
+        for v in stack:
+            seen[v] = 1
+        while stack:
+            v = stack.pop()
+            for p in range(offsets[v], offsets[v + 1]):
+                w = ends[items[p]]
+                if not seen[w]:
+                    seen[w] = 1
+                    stack.append(w)
+        return {self.nodes[v] for v in range(len(self.nodes)) if seen[v]}
+
+    def scc_ids(self):
+        """Returns an ``array`` with the strongly connected component of each
+        node id. Components are numbered in reverse topological order.
+        """
+        n = len(self.nodes)
+        offsets, items, targets = self._out_offsets, self._out, self.targets
+        index = array("i", [-1]) * n
+        low = array("i", [0]) * n
+        component = array("i", [-1]) * n
+        on_stack = bytearray(n)
+        stack = []
+        counter = 0
+        components = 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            # iterative Tarjan: (node, position of its next transition)
+            work = [[root, offsets[root]]]
+            while work:
+                frame = work[-1]
+                v, p = frame
+                if p < offsets[v + 1]:
+                    frame[1] = p + 1
+                    w = targets[items[p]]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append([w, offsets[w]])
+                    elif on_stack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    if low[v] < low[u]:
+                        low[u] = low[v]
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        component[w] = components
+                        if w == v:
+                            break
+                    components += 1
+        return component
+
+    def strongly_connected_components(self):
+        """Returns the strongly connected components (sets of nodes) in
+        reverse topological order.
+        """
+        component = self.scc_ids()
+        sccs = [set() for __ in range(max(component, default=-1) + 1)]
+        for v, c in enumerate(component):
+            sccs[c].add(self.nodes[v])
+        return sccs
@@ -0,0 +1,544 @@
+"""Compact representation of linear expressions and constraints.
+
+The parsers build linear expressions as a sparse map from variable index
+to integer coefficient plus a constant, instead of a chain of
+``lpi.Expression`` operations. The variable names are kept once in a
+:class:`VariableTable` shared by every expression of a parse.
+
+A :class:`LinearConstraint` answers ``is_linear`` and ``is_equality`` by
+itself. It is converted to an ``lpi.Constraint`` the first time anything
+else is needed (``get_variables``, ``toString``, ``isolate``, ``==``,
+``hash``, arithmetic, ...), so it behaves as the ``lpi.Constraint`` of the
+same comparison. It is not an instance of ``lpi.Constraint``: code that
+checks the type must use :func:`to_lpi`, which returns the ``lpi``
+object itself (and leaves ``lpi`` objects as they are).
+
+Products and powers of variables build a :class:`Polynomial` (a sparse
+map from monomial to coefficient), which is converted to ``lpi`` once,
+when its constraint is built. Operations that leave the integer
+polynomials (division, non integer numbers) are done with ``lpi``
+objects.
+"""
+import re
+import sys
+from lpi import Expression
+
+
+class VariableTable:
+    """Index of the variable names of a parse.
+    """
+    __slots__ = ("names", "_index")
+
+    def __init__(self):
+        self.names = []
+        self._index = {}
+
+    def index(self, name):
+        """Returns the index of ``name``, adding it if it is new.
+        """
+        i = self._index.get(name)
+        if i is None:
+            i = self._index[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def __getstate__(self):
+        return (self.names,)
+
+    def __setstate__(self, state):
+        names, = state
+        self.names = names
+        self._index = {n: i for i, n in enumerate(names)}
+
+
+class LinearExpression:
+    """Linear expression: sum of ``coeffs[i] * variables.names[i]`` plus ``const``.
+
+    :param coeffs: Sparse map from variable index to integer coefficient.
+    :type coeffs: dict
+    :param const: Independent term.
+    :type const: int
+    :param variables: Table of the variable names.
+    :type variables: :class:`VariableTable`
+    """
+    __slots__ = ("coeffs", "const", "variables", "_lpi")
+
+    def __init__(self, coeffs, const, variables):
+        self.coeffs = coeffs
+        self.const = const
+        self.variables = variables
+        self._lpi = None
+
+    def __getstate__(self):
+        return (self.coeffs, self.const, self.variables)
+
+    def __setstate__(self, state):
+        self.coeffs, self.const, self.variables = state
+        self._lpi = None
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self.coeffs)
+
+    def is_linear(self):
+        return True
+
+    def variable_names(self):
+        """Returns the names of the variables, in no particular order.
+        """
+        names = self.variables.names
+        return [names[i] for i, c in self.coeffs.items() if c != 0]
+
+    def get_variables(self):
+        """Returns the names of the variables, in the order of ``lpi``.
+        """
+        return self.to_lpi().get_variables()
+
+    def to_lpi(self):
+        """Returns the equivalent ``lpi.Expression``.
+        """
+        if self._lpi is None:
+            names = self.variables.names
+            terms = [Expression(self.const)]
+            for i, c in self.coeffs.items():
+                if c == 0:
+                    continue
+                var = Expression(names[i])
+                terms.append(var if c == 1 else var * Expression(c))
+            self._lpi = _lpi_sum(terms)
+        return self._lpi
+
+    def __str__(self):
+        if self.const == 0 and len(self.coeffs) == 1:
+            [(i, c)] = self.coeffs.items()
+            if c == 1:
+                return self.variables.names[i]
+        return str(self.to_lpi())
+
+    __repr__ = __str__
+
+
+class LinearConstraint:
+    """Linear constraint ``expression op 0``.
+
+    It behaves as the ``lpi.Constraint`` built by ``lpi`` for the same
+    comparison: the attributes that are not defined here, equality, hash
+    and the operators are taken from that constraint, built on first use.
+
+    :param coeffs: Sparse map from variable index to integer coefficient.
+    :type coeffs: dict
+    :param const: Independent term.
+    :type const: int
+    :param op: One of ``<``, ``<=``, ``==``, ``>=`` and ``>``.
+    :type op: str
+    :param variables: Table of the variable names.
+    :type variables: :class:`VariableTable`
+    """
+    __slots__ = ("coeffs", "const", "op", "variables", "_lpi")
+
+    def __init__(self, coeffs, const, op, variables):
+        self.coeffs = coeffs
+        self.const = const
+        self.op = op
+        self.variables = variables
+        self._lpi = None
+
+    def __getstate__(self):
+        return (self.coeffs, self.const, self.op, self.variables)
+
+    def __setstate__(self, state):
+        self.coeffs, self.const, self.op, self.variables = state
+        self._lpi = None
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self.coeffs)
+
+    def key(self):
+        """Returns a hashable key, equal for equal constraints of the same table.
+        """
+        return (self.op, self.const, tuple(sorted(self.coeffs.items())))
+
+    def is_linear(self):
+        return True
+
+    def is_equality(self):
+        return self.op == "=="
+
+    def variable_names(self):
+        """Returns the names of the variables, in no particular order.
+        """
+        names = self.variables.names
+        return [names[i] for i in self.coeffs]
+
+    def get_variables(self):
+        """Returns the names of the variables, in the order of ``lpi``.
+        """
+        return self.to_lpi().get_variables()
+
+    def to_lpi(self):
+        """Returns the equivalent ``lpi.Constraint``.
+        """
+        if self._lpi is None:
+            exp = LinearExpression(self.coeffs, self.const, self.variables).to_lpi()
+            self._lpi = _lpi_compare(exp, self.op, Expression(0))
+        return self._lpi
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in LinearConstraint.__slots__:
+            raise AttributeError(name)
+        return getattr(self.to_lpi(), name)
+
+    def __eq__(self, other):
+        return self.to_lpi() == to_lpi(other)
+
+    def __ne__(self, other):
+        return self.to_lpi() != to_lpi(other)
+
+    def __hash__(self):
+        return hash(self.to_lpi())
+
+    def __neg__(self):
+        return -self.to_lpi()
+
+    def __str__(self):
+        return str(self.to_lpi())
+
+    __repr__ = __str__
+
+
+def _forward(name):
+    # LinearConstraint.name that calls the one of its lpi.Constraint
+    def method(self, other):
+        c = self.to_lpi()
+        op = getattr(type(c), name, None)
+        if op is None:
+            return NotImplemented
+        return op(c, to_lpi(other))
+    method.__name__ = name
+    return method
+
+
+for _name in ("add", "sub", "mul", "truediv", "and", "or", "lt", "le", "gt", "ge"):
+    setattr(LinearConstraint, "__{}__".format(_name), _forward("__{}__".format(_name)))
+    if _name not in ("lt", "le", "gt", "ge"):
+        setattr(LinearConstraint, "__r{}__".format(_name), _forward("__r{}__".format(_name)))
+
+
+class Polynomial:
+    """Polynomial: sum of ``terms[m] * m`` where a monomial ``m`` is a
+    sorted tuple of (variable index, exponent) pairs, ``()`` being the
+    independent term.
+
+    :param terms: Sparse map from monomial to integer coefficient.
+    :type terms: dict
+    :param variables: Table of the variable names.
+    :type variables: :class:`VariableTable`
+    """
+    __slots__ = ("terms", "variables", "_lpi")
+
+    def __init__(self, terms, variables):
+        self.terms = terms
+        self.variables = variables
+        self._lpi = None
+
+    def __getstate__(self):
+        return (self.terms, self.variables)
+
+    def __setstate__(self, state):
+        self.terms, self.variables = state
+        self._lpi = None
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + sys.getsizeof(self.terms)
+
+    def degree(self):
+        return max([sum(e for __, e in m) for m, c in self.terms.items() if c != 0] or [0])
+
+    def is_linear(self):
+        return self.degree() <= 1
+
+    def get_variables(self):
+        """Returns the names of the variables, in the order of ``lpi``.
+        """
+        return self.to_lpi().get_variables()
+
+    def to_lpi(self):
+        """Returns the equivalent ``lpi.Expression``.
+        """
+        if self._lpi is None:
+            names = self.variables.names
+            terms = [Expression(self.terms.get((), 0))]
+            for m, c in self.terms.items():
+                if c == 0 or not m:
+                    continue
+                mon = None
+                for i, e in m:
+                    factor = _lpi_power(Expression(names[i]), e)
+                    mon = factor if mon is None else mon * factor
+                terms.append(mon if c == 1 else mon * Expression(c))
+            self._lpi = _lpi_sum(terms)
+        return self._lpi
+
+    def __str__(self):
+        return str(self.to_lpi())
+
+    __repr__ = __str__
+
+
+def _polynomial(a):
+    if isinstance(a, Polynomial):
+        return a
+    terms = {((i, 1),): c for i, c in a.coeffs.items()}
+    terms[()] = a.const
+    return Polynomial(terms, a.variables)
+
+
+def _linear(p):
+    """Returns the LinearExpression of the polynomial ``p`` if it is linear.
+    """
+    coeffs = {}
+    const = 0
+    for m, c in p.terms.items():
+        if c == 0:
+            continue
+        if not m:
+            const = c
+        elif len(m) == 1 and m[0][1] == 1:
+            coeffs[m[0][0]] = c
+        else:
+            return None
+    return LinearExpression(coeffs, const, p.variables)
+
+
+def _multiply(a, b):
+    terms = {}
+    for m1, c1 in a.terms.items():
+        if c1 == 0:
+            continue
+        for m2, c2 in b.terms.items():
+            if c2 == 0:
+                continue
+            if not m1 or not m2:
+                m = m1 or m2
+            else:
+                exps = dict(m1)
+                for i, e in m2:
+                    exps[i] = exps.get(i, 0) + e
+                m = tuple(sorted(exps.items()))
+            terms[m] = terms.get(m, 0) + c1 * c2
+    return Polynomial(terms, a.variables)
+
+
+def _lpi_sum(terms):
+    # pairwise, so no partial sum grows by a single term at a time
+    while len(terms) > 1:
+        pairs = [terms[i] + terms[i + 1] for i in range(0, len(terms) - 1, 2)]
+        if len(terms) % 2:
+            pairs.append(terms[-1])
+        terms = pairs
+    return terms[0]
+
+
+def _lpi_power(base, n):
+    result = None
+    while n:
+        if n & 1:
+            result = base if result is None else result * base
+        n >>= 1
+        if n:
+            base = base * base
+    return result
+
+
+_POLYNOMIAL = (LinearExpression, Polynomial)
+
+
+def to_lpi(obj):
+    """Returns ``obj`` as an ``lpi`` object (it may be one already).
+    """
+    if isinstance(obj, (LinearExpression, LinearConstraint, Polynomial)):
+        return obj.to_lpi()
+    return obj
+
+
+_FLIP = {">=": "<=", ">": "<"}
+
+_COMPARISON = re.compile(r"(.+?) (<=|>=|==|<|>) (.+)")
+
+
+def _lpi_op(c):
+    # operator of an lpi.Constraint, from its public interface: the one
+    # between the two sides, written with explicit symbols
+    if c.is_equality():
+        return "=="
+    found = _COMPARISON.fullmatch(c.toString(str, int, eq_symb="==", leq_symb="<="))
+    if found is None:
+        raise ValueError("Unknown operator of the constraint {}.".format(c))
+    return _OPS[found.group(2)]
+
+
+def linear_terms(c):
+    """Returns the variables, their coefficients, the independent term and
+    the operator (``<=``, ``<`` or ``==``) of the linear constraint ``c``
+    (a :class:`LinearConstraint` or an ``lpi.Constraint``) written as
+    ``sum(coeff * variable) + term op 0``.
+    """
+    if isinstance(c, LinearConstraint):
+        names = c.variables.names
+        variables, coeffs, const, op = [names[i] for i in c.coeffs], list(c.coeffs.values()), c.const, c.op
+    else:
+        variables = c.get_variables()
+        coeffs, const, op = [c.get_coeff(v) for v in variables], c.get_independent_term(), _lpi_op(c)
+    if op in _FLIP:
+        return variables, [-a for a in coeffs], -const, _FLIP[op]
+    return variables, coeffs, const, op
+
+
+def leaf(value, variables):
+    """Returns the expression of a variable name or an integer (as str or
+    int), or None if ``value`` is not one of them.
+    """
+    if isinstance(value, int):
+        return LinearExpression({}, value, variables)
+    if value[:1].isdigit():
+        if not value.isdigit():
+            return None
+        return LinearExpression({}, int(value), variables)
+    return LinearExpression({variables.index(value): 1}, 0, variables)
+
+
+def negate(a):
+    """Returns ``0 - a``.
+    """
+    if isinstance(a, LinearExpression):
+        return LinearExpression({i: -c for i, c in a.coeffs.items()}, -a.const, a.variables)
+    if isinstance(a, Polynomial):
+        return Polynomial({m: -c for m, c in a.terms.items()}, a.variables)
+    return Expression(0) - a
+
+
+def operate(a, op, b):
+    """Returns ``a op b`` for ``op`` in ``+``, ``-``, ``*`` and ``/``.
+    """
+    if op != "/" and isinstance(a, _POLYNOMIAL) and isinstance(b, _POLYNOMIAL):
+        if op == "*":
+            return _times(a, b)
+        return _add_to(_copy(a), b, 1 if op == "+" else -1)
+    a = to_lpi(a)
+    b = to_lpi(b)
+    if op == "+":
+        return a + b
+    elif op == "-":
+        return a - b
+    elif op == "*":
+        return a * b
+    else:
+        return a / b
+
+
+def fold(exp, operations, owned=False):
+    """Returns ``exp`` operated from left to right with the (op, operand)
+    pairs of ``operations``. Sums are accumulated in a single expression,
+    instead of building a new one per operator.
+
+    :param owned: True if ``exp`` is not shared and can be updated in place.
+    """
+    for op, e2 in operations:
+        if (op == "+" or op == "-") and isinstance(exp, _POLYNOMIAL) and isinstance(e2, _POLYNOMIAL):
+            if not owned:
+                exp = _copy(exp)
+                owned = True
+            exp = _add_to(exp, e2, 1 if op == "+" else -1)
+        else:
+            exp = operate(exp, op, e2)
+            owned = isinstance(exp, _POLYNOMIAL)
+    return exp
+
+
+def power(base, n):
+    """Returns ``base ^ n`` (``n > 0``) by repeated squaring.
+    """
+    if not isinstance(base, _POLYNOMIAL):
+        return _lpi_power(base, n)
+    if n == 1:
+        return base
+    p = _polynomial(base)
+    terms = [(m, c) for m, c in p.terms.items() if c != 0]
+    if len(terms) == 1:
+        m, c = terms[0]
+        return Polynomial({tuple((i, e * n) for i, e in m): c ** n}, p.variables)
+    result = None
+    while n:
+        if n & 1:
+            result = p if result is None else _multiply(result, p)
+        n >>= 1
+        if n:
+            p = _multiply(p, p)
+    return result
+
+
+def _copy(a):
+    if isinstance(a, LinearExpression):
+        return LinearExpression(dict(a.coeffs), a.const, a.variables)
+    return Polynomial(dict(a.terms), a.variables)
+
+
+def _add_to(a, b, sign):
+    # a is not shared: it is updated in place
+    if isinstance(a, LinearExpression) and isinstance(b, LinearExpression):
+        coeffs = a.coeffs
+        for i, c in b.coeffs.items():
+            coeffs[i] = coeffs.get(i, 0) + sign * c
+        a.const += sign * b.const
+        return a
+    if isinstance(a, LinearExpression):
+        a = _polynomial(a)
+    terms = a.terms
+    for m, c in _polynomial(b).terms.items():
+        terms[m] = terms.get(m, 0) + sign * c
+    return a
+
+
+def _times(a, b):
+    if isinstance(a, LinearExpression) and isinstance(b, LinearExpression):
+        if not a.coeffs:
+            a, b = b, a
+        if not b.coeffs:
+            k = b.const
+            return LinearExpression({i: c * k for i, c in a.coeffs.items()}, a.const * k, a.variables)
+    return _multiply(_polynomial(a), _polynomial(b))
+
+
+_OPS = {"<": "<", ">": ">", "<=": "<=", "=<": "<=", ">=": ">=", "=>": ">=", "=": "==", "==": "=="}
+
+
+def compare(a, comp, b):
+    """Returns the constraint ``a comp b``: a :class:`LinearConstraint` if
+    it is linear, otherwise an ``lpi.Constraint``.
+    """
+    op = _OPS.get(comp)
+    if op is None:
+        raise ValueError("Expecting compare op getting {}".format(comp))
+    if isinstance(a, _POLYNOMIAL) and isinstance(b, _POLYNOMIAL):
+        diff = _add_to(_copy(a), b, -1)
+        if isinstance(diff, Polynomial):
+            linear = _linear(diff)
+            if linear is None:
+                # normalized once, in lpi
+                return _lpi_compare(diff.to_lpi(), op, Expression(0))
+            diff = linear
+        coeffs = {i: c for i, c in diff.coeffs.items() if c != 0}
+        return LinearConstraint(coeffs, diff.const, op, diff.variables)
+    return _lpi_compare(to_lpi(a), op, to_lpi(b))
+
+
+def _lpi_compare(e1, op, e2):
+    if op == "<":
+        return (e1 < (e2))
+    elif op == ">":
+        return (e1 > (e2))
+    elif op == "<=":
+        return (e1 <= e2)
+    elif op == ">=":
+        return (e1 >= e2)
+    else:
+        return (e1 == e2)
@@ -0,0 +1,156 @@
+"""NumPy view of the linear constraints of the transitions.
+
+Each transition gets a :class:`ConstraintMatrices` with its linear
+constraints written as ``A x op b``, one row per constraint, where
+``op`` is ``<=``, ``<`` or ``==`` and the columns of ``A`` are the
+``global_vars`` followed by the ``local_vars`` of the transition (the
+variables of its polyhedron in ``Cfg.build_polyhedrons``).
+
+Example::
+
+    matrices = cfg.constraint_matrices()
+    m = matrices["t1"]
+    m.A, m.b, m.ops
+    lower, upper = m.bounds()
+
+Requires ``numpy``.
+"""
+import numpy as np
+from genericparser import constants
+from genericparser.linear import linear_terms
+
+_OP_CODES = {"<=": 0, "<": 1, "==": 2}
+
+
+class ConstraintMatrices:
+    """Linear constraints ``A x op b`` of a transition.
+
+    :param A: Coefficients, one row per constraint.
+    :type A: :obj:`numpy.ndarray`
+    :param b: Right hand sides.
+    :type b: :obj:`numpy.ndarray`
+    :param ops: Operators (``<=``, ``<`` or ``==``) of each row.
+    :type ops: :obj:`numpy.ndarray`
+    :param variables: Names of the columns.
+    :type variables: list
+    :param nonlinear: Positions in the transition constraints of the
+        constraints that are not in the matrices.
+    :type nonlinear: list
+    """
+
+    def __init__(self, A, b, ops, variables, nonlinear=()):
+        self.A = A
+        self.b = b
+        self.ops = ops
+        self.variables = variables
+        self.nonlinear = list(nonlinear)
+
+    def __len__(self):
+        return len(self.b)
+
+    def __repr__(self):
+        return "ConstraintMatrices({} rows, {} columns)".format(*self.A.shape)
+
+    def trivial(self):
+        """Returns two boolean arrays: the rows without variables that always
+        hold and the ones that never hold.
+        """
+        empty = ~self.A.any(axis=1)
+        holds = np.where(self.ops == "==", self.b == 0,
+                         np.where(self.ops == "<", self.b > 0, self.b >= 0))
+        return empty & holds, empty & ~holds
+
+    def duplicates(self):
+        """Returns a boolean array with the rows equal to a previous row.
+        """
+        dup = np.zeros(len(self.b), dtype=bool)
+        if len(self.b) == 0:
+            return dup
+        codes = np.array([_OP_CODES[op] for op in self.ops], dtype=self.A.dtype)
+        rows = np.column_stack((self.A, self.b, codes))
+        __, first = np.unique(rows, axis=0, return_index=True)
+        dup[:] = True
+        dup[first] = False
+        return dup
+
+    def bounds(self):
+        """Returns the lower and upper bound of each column given by the
+        rows with only one variable (``-inf`` and ``inf`` if there are not).
+        Strict rows are taken as non strict.
+        """
+        n = self.A.shape[1]
+        lower = np.full(n, -np.inf)
+        upper = np.full(n, np.inf)
+        nonzero = self.A != 0
+        single = nonzero.sum(axis=1) == 1
+        if not single.any():
+            return lower, upper
+        rows = np.flatnonzero(single)
+        cols = nonzero[rows].argmax(axis=1)
+        coeffs = self.A[rows, cols]
+        values = self.b[rows] / coeffs + 0.0
+        eq = self.ops[rows] == "=="
+        up = eq | (coeffs > 0)
+        low = eq | (coeffs < 0)
+        np.minimum.at(upper, cols[up], values[up])
+        np.maximum.at(lower, cols[low], values[low])
+        return lower, upper
+
+
+def build_matrices(cfg, update=False):
+    """Computes the :class:`ConstraintMatrices` of every transition of
+    ``cfg`` and stores them in the transition (``constraint_matrices``).
+    The transitions that already have them are kept unless ``update``.
+
+    :returns: :obj:`dict` from transition name to :class:`ConstraintMatrices`.
+    """
+    gvars = cfg.graph[constants.variables]
+    key = constants.transition.matrices
+    edges = [e for e in cfg.get_edges() if update or key not in e]
+    # coordinates of every coefficient of every pending transition
+    rows, cols, values = [], [], []
+    b, ops = [], []
+    pending = []
+    row = 0
+    for e in edges:
+        first = len(values)
+        columns = {v: i for i, v in enumerate(gvars)}
+        for v in e[constants.transition.localvariables]:
+            columns.setdefault(v, len(columns))
+        start = row
+        nonlinear = []
+        for pos, c in enumerate(e[constants.transition.constraints]):
+            if not c.is_linear():
+                nonlinear.append(pos)
+                continue
+            names, coeffs, const, op = linear_terms(c)
+            for name, coeff in zip(names, coeffs):
+                if name not in columns:
+                    raise ValueError("Variable {} of transition {} is not global nor local."
+                                     .format(name, e["name"]))
+                rows.append(row)
+                cols.append(columns[name])
+                values.append(coeff)
+            b.append(-const)
+            ops.append(op)
+            row += 1
+        integral = all(isinstance(v, int) for v in values[first:]) and \
+            all(isinstance(v, int) for v in b[start:row])
+        pending.append((e, start, row, list(columns), nonlinear, integral))
+    dtype = np.int64 if all(p[5] for p in pending) else np.float64
+    rows = np.array(rows, dtype=np.intp)
+    cols = np.array(cols, dtype=np.intp)
+    values = np.array(values, dtype=dtype)
+    b = np.array(b, dtype=dtype)
+    ops = np.array(ops, dtype="<U2")
+    # coefficients are grouped by row, so each transition is a slice
+    bounds = np.searchsorted(rows, [p[1] for p in pending] + [row])
+    for k, (e, start, end, variables, nonlinear, integral) in enumerate(pending):
+        lo, hi = bounds[k], bounds[k + 1]
+        A = np.zeros((end - start, len(variables)), dtype=dtype)
+        A[rows[lo:hi] - start, cols[lo:hi]] = values[lo:hi]
+        eb = b[start:end]
+        if integral and dtype != np.int64:
+            A, eb = A.astype(np.int64), eb.astype(np.int64)
+        e[key] = ConstraintMatrices(A, eb, ops[start:end], variables, nonlinear)
+    return {e["name"]: e[key] for e in cfg.get_edges()}
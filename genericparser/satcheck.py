@@ -0,0 +1,328 @@
+"""Satisfiability checks of the transitions.
+
+:class:`SatChecker` decides each set of linear constraints in two stages:
+
+1. :func:`prefilter`, without solver: constraints with a variable that
+   appears in no other constraint are dropped (they can always be
+   satisfied), bounds are propagated over the rest, and an integer point
+   inside the bounds is tried as witness. It answers SAT, UNSAT or
+   unknown.
+2. The unknown sets go to one ``lpi.Solver`` reused with push/pop scopes.
+
+The results can be remembered in a :class:`SatCache`, keyed by a
+canonical form of the constraint set that does not depend on the order
+of the constraints or on their scaling.
+
+Example::
+
+    checker = SatChecker(cache=SatCache())
+    checker.is_sat(constraints)
+    checker.stats
+"""
+import math
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+from genericparser.linear import linear_terms
+
+DEFAULT_CACHE_SIZE = 65536
+
+# rounds of bound propagation (it may not converge on rationals)
+PROPAGATION_ROUNDS = 10
+
+_HOLDS = {"<=": lambda v: v <= 0, "<": lambda v: v < 0, "==": lambda v: v == 0}
+
+
+def _rows(constraints):
+    # [(coeffs, const, op)] of "sum(coeffs[v] * v) + const op 0", without
+    # zeros, or None if a constraint is not linear
+    rows = []
+    for c in constraints:
+        if not c.is_linear():
+            return None
+        variables, coeffs, const, op = linear_terms(c)
+        rows.append(({v: a for v, a in zip(variables, coeffs) if a != 0}, const, op))
+    return rows
+
+
+def _drop_free(rows):
+    # removes the rows with a variable that is in no other row, while any
+    occurrences = {}
+    for i, (coeffs, __, __) in enumerate(rows):
+        for v in coeffs:
+            occurrences.setdefault(v, set()).add(i)
+    alive = [True] * len(rows)
+    queue = [v for v, rs in occurrences.items() if len(rs) == 1]
+    while queue:
+        v = queue.pop()
+        if len(occurrences[v]) != 1:
+            continue
+        i = next(iter(occurrences[v]))
+        coeffs, __, op = rows[i]
+        # integer solutions need a unit coefficient in equalities
+        if op == "==" and abs(coeffs[v]) != 1:
+            continue
+        alive[i] = False
+        for w in coeffs:
+            occurrences[w].discard(i)
+            if len(occurrences[w]) == 1:
+                queue.append(w)
+    return [r for r, a in zip(rows, alive) if a]
+
+
+def _propagate(rows):
+    # bounds {v: (value, strict)}, or None if some row can not hold
+    lower, upper = {}, {}
+    inequalities = []
+    for coeffs, const, op in rows:
+        inequalities.append((coeffs, const, op == "<"))
+        if op == "==":
+            inequalities.append(({v: -a for v, a in coeffs.items()}, -const, False))
+    for __ in range(PROPAGATION_ROUNDS):
+        changed = False
+        for coeffs, const, strict in inequalities:
+            # minimum of each term a * v, as (value, strict) or None if unbounded
+            mins = {}
+            for v, a in coeffs.items():
+                bound = lower.get(v) if a > 0 else upper.get(v)
+                mins[v] = None if bound is None else (a * bound[0], bound[1])
+            unbounded = [v for v, m in mins.items() if m is None]
+            if len(unbounded) > 1:
+                continue
+            total = sum(m[0] for m in mins.values() if m is not None)
+            if not unbounded:
+                any_strict = strict or any(m[1] for m in mins.values())
+                if total + const > 0 or (total + const == 0 and any_strict):
+                    return None
+            for v, a in coeffs.items():
+                if unbounded and unbounded[0] != v:
+                    continue
+                rest = total - (mins[v][0] if mins[v] is not None else 0)
+                value = Fraction(-const - rest) / a
+                if a > 0:
+                    old = upper.get(v)
+                    if old is None or value < old[0] or (value == old[0] and strict and not old[1]):
+                        upper[v] = (value, strict)
+                        changed = True
+                else:
+                    old = lower.get(v)
+                    if old is None or value > old[0] or (value == old[0] and strict and not old[1]):
+                        lower[v] = (value, strict)
+                        changed = True
+        for v in lower.keys() & upper.keys():
+            (lo, lo_strict), (hi, hi_strict) = lower[v], upper[v]
+            if lo > hi or (lo == hi and (lo_strict or hi_strict)):
+                return None
+        if not changed:
+            break
+    return lower, upper
+
+
+def _witness(rows, lower, upper):
+    # integer point inside the bounds (if they allow it), near 0
+    point = {}
+    for coeffs, __, __ in rows:
+        for v in coeffs:
+            if v in point:
+                continue
+            x = 0
+            if v in lower:
+                lo, strict = lower[v]
+                if x < lo or (x == lo and strict):
+                    x = math.floor(lo) + 1 if strict or lo != math.floor(lo) else int(lo)
+            if v in upper:
+                hi, strict = upper[v]
+                if x > hi or (x == hi and strict):
+                    x = math.ceil(hi) - 1 if strict or hi != math.ceil(hi) else int(hi)
+            point[v] = x
+    return point
+
+
+def _canonical(row):
+    # row scaled to coprime integers (positive first coefficient in equalities)
+    coeffs, const, op = row
+    values = [Fraction(a) for a in coeffs.values()] + [Fraction(const)]
+    scale = 1
+    for v in values:
+        scale = scale * v.denominator // math.gcd(scale, v.denominator)
+    g = 0
+    for v in values:
+        g = math.gcd(g, int(v * scale))
+    g = g or 1
+    terms = sorted((x, int(a * scale) // g) for x, a in coeffs.items())
+    const = int(Fraction(const) * scale) // g
+    if op == "==" and terms and terms[0][1] < 0:
+        terms = [(x, -a) for x, a in terms]
+        const = -const
+    return tuple(terms), const, op
+
+
+def canonical_key(constraints):
+    """Returns a hashable key of the set of linear ``constraints``, equal
+    for the same constraints in any order, repeated or scaled, or None
+    if some constraint is not linear.
+    """
+    rows = _rows(constraints)
+    if rows is None:
+        return None
+    return frozenset(_canonical(r) for r in rows)
+
+
+def _decide(linear):
+    rows = []
+    for coeffs, const, op in linear:
+        if coeffs:
+            rows.append((coeffs, const, op))
+        elif not _HOLDS[op](const):
+            return False
+    rows = _drop_free(rows)
+    if not rows:
+        return True
+    bounds = _propagate(rows)
+    if bounds is None:
+        return False
+    point = _witness(rows, *bounds)
+    for coeffs, const, op in rows:
+        if not _HOLDS[op](sum(a * point[v] for v, a in coeffs.items()) + const):
+            return None
+    return True
+
+
+def prefilter(constraints):
+    """Decides the satisfiability of the linear ``constraints`` without
+    solver, when it is cheap.
+
+    :returns: True (SAT), False (UNSAT) or None if it is not decided.
+    """
+    linear = _rows(constraints)
+    if linear is None:
+        return None
+    return _decide(linear)
+
+
+class SatCache:
+    """Bounded map from :func:`canonical_key` to satisfiability, which
+    forgets the least recently used entries.
+
+    :param maxsize: Maximum number of entries. None for no limit.
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"maxsize": self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the satisfiability stored with ``key`` or None.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+
+    def stats(self):
+        """Returns the hits, misses and evictions, and the number of
+        ``entries`` and the ``maxsize``.
+        """
+        with self._lock:
+            info = dict(self._stats)
+        info.update(entries=len(self._entries), maxsize=self.maxsize)
+        return info
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Returns the cache shared by every ``Cfg.remove_unsat_edges(cache=True)``
+    of the process.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SatCache()
+    return _default_cache
+
+
+class SatChecker:
+    """Satisfiability of sets of linear constraints: :func:`prefilter`
+    first and then one solver reused for every set.
+
+    ``stats`` counts the sets decided by each stage: ``cache_sat``,
+    ``cache_unsat``, ``prefilter_sat``, ``prefilter_unsat``,
+    ``solver_sat`` and ``solver_unsat``.
+
+    :param cache: Cache of the results. None for no cache.
+    :type cache: :class:`SatCache`
+    """
+
+    def __init__(self, cache=None):
+        self._solver = None
+        self.cache = cache
+        self.stats = {"cache_sat": 0, "cache_unsat": 0, "prefilter_sat": 0, "prefilter_unsat": 0,
+                      "solver_sat": 0, "solver_unsat": 0}
+
+    def _solve(self, constraints):
+        from lpi import Solver
+        if self._solver is None:
+            self._solver = Solver()
+        s = self._solver
+        if not hasattr(s, "push"):
+            s = Solver()
+            s.add(constraints)
+            return s.is_sat()
+        s.push()
+        try:
+            s.add(constraints)
+            return s.is_sat()
+        finally:
+            s.pop()
+
+    def is_sat(self, constraints):
+        """Returns whether the linear ``constraints`` are satisfiable.
+        """
+        constraints = list(constraints)
+        linear = _rows(constraints)
+        key = None
+        if linear is not None and self.cache is not None:
+            key = frozenset(_canonical(r) for r in linear)
+            result = self.cache.get(key)
+            if result is not None:
+                self.stats["cache" + ("_sat" if result else "_unsat")] += 1
+                return result
+        result = None if linear is None else _decide(linear)
+        stage = "prefilter"
+        if result is None:
+            result = bool(self._solve(constraints))
+            stage = "solver"
+        if key is not None:
+            self.cache.put(key, result)
+        self.stats[stage + ("_sat" if result else "_unsat")] += 1
+        return result
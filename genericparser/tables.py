@@ -0,0 +1,131 @@
+"""Pre-generated LALR tables of the grammars.
+
+The tables are generated at build time (``python -m genericparser.tables``)
+under ``genericparser/tables/`` with the serialize tooling of lark, so a
+new process can load a parser instead of analysing its grammar.
+
+Each table is stored together with a digest of the grammar string, the
+lark options and the lark version. A table whose digest does not match
+the current grammar is never loaded, and ``build_tables`` regenerates it.
+"""
+import hashlib
+import os
+import pickle
+
+TABLES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "tables")
+
+
+def _lark_version():
+    import lark
+    return getattr(lark, "__version__", "unknown")
+
+
+def table_digest(parser, options):
+    """Returns the digest of the grammar of ``parser`` compiled with ``options``.
+    """
+    h = hashlib.sha256()
+    h.update(parser.get_grammar().encode("utf-8"))
+    h.update(repr(sorted(options.items())).encode("utf-8"))
+    h.update(_lark_version().encode("utf-8"))
+    return h.hexdigest()
+
+
+def table_path(parser, tables_dir=None):
+    """Returns the path of the table of ``parser``.
+    """
+    if tables_dir is None:
+        tables_dir = TABLES_DIR
+    return os.path.join(tables_dir, type(parser).__name__ + ".lark")
+
+
+def load_table(parser, options, tables_dir=None):
+    """Load the pre-generated parser of ``parser`` if it is up to date.
+
+    :returns: :obj:`lark.Lark` parser or None if there is no valid table.
+    """
+    if options.get("parser") != "lalr":
+        return None
+    path = table_path(parser, tables_dir)
+    try:
+        with open(path, "rb") as f:
+            if pickle.load(f) != table_digest(parser, options):
+                return None
+            from lark.lark import Lark
+            return Lark.load(f)
+    except Exception:
+        return None
+
+
+def is_stale(parser, tables_dir=None):
+    """Returns True if the table of ``parser`` is missing or outdated.
+    """
+    options = dict(parser.lark_options)
+    path = table_path(parser, tables_dir)
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f) != table_digest(parser, options)
+    except Exception:
+        return True
+
+
+def write_table(parser, tables_dir=None):
+    """Compile the grammar of ``parser`` and serialize it.
+    """
+    from lark.lark import Lark
+    options = dict(parser.lark_options)
+    path = table_path(parser, tables_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lark = Lark(parser.get_grammar(), **options)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(table_digest(parser, options), f, protocol=pickle.HIGHEST_PROTOCOL)
+        lark.save(f)
+    os.replace(tmp, path)
+    return path
+
+
+def check_tables(parsers=None, tables_dir=None):
+    """Returns the names of the parsers whose table is missing or outdated.
+    """
+    from genericparser import _grammar_parsers
+    if parsers is None:
+        parsers = _grammar_parsers()
+    return [p.__name__ for p in parsers if is_stale(p(), tables_dir)]
+
+
+def build_tables(parsers=None, tables_dir=None, force=False):
+    """(Re)generate the tables whose grammar changed.
+
+    :param force: Regenerate every table even if it is up to date.
+    :returns: :obj:`list` of the names of the regenerated tables.
+    """
+    from genericparser import _grammar_parsers
+    if parsers is None:
+        parsers = _grammar_parsers()
+    built = []
+    for p in parsers:
+        parser = p()
+        if force or is_stale(parser, tables_dir):
+            write_table(parser, tables_dir)
+            built.append(p.__name__)
+    return built
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    argParser = argparse.ArgumentParser(description="Generate the LALR tables of the grammars.")
+    argParser.add_argument("tables_dir", nargs="?", default=None,
+                           help="Output directory. Defaults to genericparser/tables.")
+    argParser.add_argument("--check", action="store_true",
+                           help="Only report outdated tables (exit 1 if any).")
+    argParser.add_argument("--force", action="store_true",
+                           help="Regenerate every table.")
+    args = argParser.parse_args()
+    if args.check:
+        stale = check_tables(tables_dir=args.tables_dir)
+        for name in stale:
+            print("outdated: {}".format(name))
+        sys.exit(1 if stale else 0)
+    for name in build_tables(tables_dir=args.tables_dir, force=args.force):
+        print("generated: {}".format(name))
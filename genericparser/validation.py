@@ -0,0 +1,117 @@
+"""Validation and metadata of the parsed programs.
+
+Shared by every parser: duplicated keys, variables and transition names,
+and the local variables and linearity of each transition. The checks use
+sets and dicts, so they are linear in the size of the program.
+"""
+from genericparser import constants
+
+
+def unique_keys(pairs):
+    """Returns the dict of the (key, value) ``pairs``.
+
+    :raises ValueError: if a key is repeated.
+    """
+    d = {}
+    for k, v in pairs:
+        if k in d:
+            raise ValueError("Duplicate key: {}".format(k))
+        d[k] = v
+    return d
+
+
+def check_variables(variables):
+    """Checks that no variable is defined twice.
+
+    :raises ValueError: with the first variable that is defined again later.
+    """
+    if len(set(variables)) == len(variables):
+        return
+    last = {v: i for i, v in enumerate(variables)}
+    for i, v in enumerate(variables):
+        if last[v] != i:
+            raise ValueError("Multiple definition of variable: {}".format(v))
+
+
+class TransitionNames:
+    """Names of the transitions of a program.
+
+    :param names: Names already used.
+    """
+
+    def __init__(self, names=()):
+        self.names = set(names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def add(self, name):
+        """Adds ``name``.
+
+        :raises ValueError: if it is already used.
+        """
+        if name in self.names:
+            raise ValueError("Multiple transitions with the same name: {}.".format(name))
+        self.names.add(name)
+
+    def reserve(self, name):
+        """Marks ``name`` as used (it may be used already).
+        """
+        self.names.add(name)
+
+    def fresh(self, prefix, start=0):
+        """Returns the first ``prefix + str(i)`` not used (from ``i = start``).
+        """
+        i = start
+        while prefix + str(i) in self.names:
+            i += 1
+        return prefix + str(i)
+
+
+class TransitionMetadata:
+    """Computes the local variables and the linearity of the transitions
+    of a program, and the maximum number of local variables.
+
+    :param gvars: Global variables of the program.
+    """
+
+    def __init__(self, gvars):
+        self.gvars = set(gvars)
+        self.max_local_vars = 0
+
+    def local_variables(self, objects, lvars=None):
+        """Returns the variables of ``objects`` (constraints or
+        expressions) that are not global, in order of appearance after
+        the ones in ``lvars``, and whether every object is linear.
+        """
+        from genericparser.linear import LinearConstraint, LinearExpression
+        lvars = [] if lvars is None else list(lvars)
+        seen = set(lvars)
+        gvars = self.gvars
+        linear = True
+        for c in objects:
+            if not c.is_linear():
+                linear = False
+            # the linear objects skip the lpi conversion if all are global
+            if isinstance(c, (LinearConstraint, LinearExpression)) and gvars.issuperset(c.variable_names()):
+                continue
+            for x in c.get_variables():
+                if x not in gvars and x not in seen:
+                    seen.add(x)
+                    lvars.append(x)
+        return lvars, linear
+
+    def set(self, tr, lvars, linear):
+        """Sets the local variables and the linearity of ``tr``.
+        """
+        if len(lvars) > self.max_local_vars:
+            self.max_local_vars = len(lvars)
+        tr[constants.transition.islinear] = linear
+        tr[constants.transition.localvariables] = lvars
+        return tr
+
+    def update(self, tr):
+        """Computes and sets the metadata of ``tr`` from its constraints.
+        """
+        lvars, linear = self.local_variables(tr[constants.transition.constraints])
+        return self.set(tr, lvars, linear)
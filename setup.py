@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import os
 from setuptools import setup
+from setuptools.command.build_py import build_py
 
 base = os.path.dirname(os.path.abspath(__file__))
 
@@ -9,7 +10,20 @@ VERSION = open(os.path.join(base, 'version.txt')).read()[:-1]
 pkg_dir = os.path.join(base, 'genericparser')
 pkg_name = 'genericparser'
 
-requires = ['networkx==2.4', 'pydotplus', 'pydot', 'lark-parser==0.5.6']
+requires = ['networkx==2.4', 'pydotplus', 'pydot', 'lark-parser>=0.8.0']
+
+
+class build_py_tables(build_py):
+    """Generate the LALR tables of the grammars inside the built package.
+    """
+
+    def run(self):
+        build_py.run(self)
+        import subprocess
+        import sys
+        tables_dir = os.path.join(self.build_lib, pkg_name, "tables")
+        if subprocess.call([sys.executable, "-m", "genericparser.tables", tables_dir], cwd=base) != 0:
+            print("WARNING: grammar tables not generated, grammars will be compiled at runtime.")
 
 setup(
     name='genericparser',
@@ -24,8 +38,10 @@ setup(
     platforms=['any'],
     packages=[pkg_name],
     package_dir={pkg_name: pkg_dir},
-    package_data={pkg_name: ['*.py', 'bin/*']},
+    package_data={pkg_name: ['*.py', 'bin/*', 'tables/*.lark']},
+    cmdclass={'build_py': build_py_tables},
     install_requires=requires,
+    extras_require={'numpy': ['numpy']},
     dependency_links=[],
     classifiers=[
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
@@ -34,9 +50,9 @@ setup(
         "Operating System :: Unix",
         "Intended Audience :: Science/Research",
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6'
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8'
     ],
+    python_requires='>=3.7',
     keywords=['parser', 'generic parsing', 'control flow graph'],
 )
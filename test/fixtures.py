@@ -0,0 +1,125 @@
+"""Programs and helpers shared by the tests."""
+import os as _os
+import tempfile
+
+KOAT_PROGRAM = """
+(GOAL COMPLEXITY)
+(STARTTERM (FUNCTIONSYMBOLS f0))
+(VAR x y)
+(RULES
+  f0(x, y) -> Com_1(f1(x, y)) :|: x >= 0
+  f1(x, y) -> Com_2(f1(x - 1, y + z), f2(x, y)) :|: x > 0 && y^2 <= 3*x
+  f1(x, y) -> f2(-x, 2*y) [ x <= 0 /\\ y = 1 ]
+  f2(x, y) -> f3(x, y)
+)
+"""
+
+MLC_PROGRAM = """
+!vars
+x y
+!pvars
+x1 y1
+!path
+x >= 0
+x1 = x - 1
+y1 = y
+!path
+// comment
+x <= 0
+x1 = x
+y1 = y + 1
+"""
+
+KITTLE_PROGRAM = """
+f0(x, y) -> Com_1(f1(x, y)) :|: x >= 0
+f1(x, y) -> Com_1(f1(x - 1, y)) :|: x > 0 && y^2 <= 3
+f1(x, y) -> f2(x, y) :|: x <= 0
+"""
+
+FC_PROGRAM = """
+{
+  vars: [x, y],
+  pvars: [x', y'],
+  initnode: n0,
+  transitions: [
+   {source: n0, target: n1, name: t0, constraints: [x >= 0, x' = x, y' = y]},
+   {source: n1, target: n1, name: t1, constraints: [x > 0, x' = x - 1, y' = y + 2*x]},
+  ]
+}
+"""
+
+FC_UNSORTED_PROGRAM = """
+// keys after the transitions {[
+{
+  /* block, comment: } */ vars: [x, y], # hash comment ]
+  transitions: [
+   {source: n0, target: n1, name: t0, constraints: [x >= 0, x' = x, y' = y]},
+   // {source: n9}
+   {source: n1, target: n1, name: t1, constraints: [x > 0, x' = x - 1, y' = y + 2*x]},
+   {source: n1, target: n2, name: t2, ignore: true, constraints: []},
+   {source: n1, target: n0, name: t3, constraints: [x <= 0, x' = x / 2, y' = (y - 1) * 3]},
+  ],
+  nodes: {n0: {asserts: [x >= 0]}},
+  pvars: [x', y'],
+  initnode: n0,
+  note: "a } string, with \\" : stuff",
+}
+"""
+
+
+def cfg_signature(cfg):
+    edges = [(e["source"], e["target"], e["name"], e["linear"], list(e["local_vars"]),
+              [str(c) for c in e["constraints"]])
+             for e in cfg.get_edges()]
+    info = {k: str(v) for k, v in cfg.get_info().items()}
+    nodes = [(n, {k: str(v) for k, v in data.items()}) for n, data in cfg.get_nodes(data=True)]
+    return info, edges, nodes
+
+
+def fc_program(transitions, variables=("x",)):
+    """Returns a fc program starting at n0 with the ``transitions`` (fc
+    dicts) and the primed copy of each variable.
+    """
+    return "{{vars: [{}], pvars: [{}], initnode: n0, transitions: [{}]}}".format(
+        ", ".join(variables), ", ".join(v + "'" for v in variables), ", ".join(transitions))
+
+
+def parse_constraints(*texts):
+    from genericparser.Constraint_parser import Parser_Constraint
+    return [Parser_Constraint().parse_string(t) for t in texts]
+
+
+def interned_constraints(*texts):
+    """The constraints shared over one variable table, as the parsers
+    build them."""
+    from genericparser.Constraint_parser import ConstraintTreeTransformer
+    transformer = ConstraintTreeTransformer()
+    return [transformer.plain_constraint(t) for t in texts]
+
+
+def random_constraints(count, atoms, seed=0):
+    import random
+    rnd = random.Random(seed)
+
+    def expression():
+        text = rnd.choice(["", "-", "+"]) + rnd.choice(atoms)
+        for __ in range(rnd.randint(0, 3)):
+            text += rnd.choice([" + ", "-", "*", " / ", " - -"]) + rnd.choice(atoms)
+        return text
+    cmps = ["<", "<=", "=<", "=>", ">=", "==", "=", ">"]
+    return [expression() + " " + rnd.choice(cmps) + " " + expression() for __ in range(count)]
+
+
+def temp_dir(test):
+    """Returns a temporary directory removed at the end of ``test``."""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return tmp.name
+
+
+def write(directory, name, text):
+    """Writes ``text`` in the file ``name`` of ``directory`` and returns its path."""
+    path = _os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(text)
+    return path
@@ -0,0 +1,144 @@
+"""Previous implementations kept as references for the tests and the
+benchmarks.
+
+The benchmarks import this module with the ``test`` directory added to
+``sys.path``.
+"""
+from lark import Transformer
+from lpi import Expression
+
+
+class LpiTreeTransformer(Transformer):
+    """The previous constraint builder: one lpi operation per operator
+    (``x ^ n`` as n - 1 products).
+
+    It does not share any code with :mod:`genericparser.linear`, so it is
+    an independent reference of the builders of the constraint parsers.
+    """
+
+    def start(self, node):
+        return node[0]
+
+    def constraint(self, node):
+        e1, comp, e2 = node
+        if comp == "<":
+            return e1 < e2
+        elif comp == ">":
+            return e1 > e2
+        elif comp == "<=" or comp == "=<":
+            return e1 <= e2
+        elif comp == ">=" or comp == "=>":
+            return e1 >= e2
+        return e1 == e2
+
+    def expression(self, node):
+        exp = node[0]
+        for i in range(2, len(node), 2):
+            exp = exp + node[i] if node[i - 1] == "+" else exp - node[i]
+        return exp
+
+    def factor(self, node):
+        exp = node[0]
+        for i in range(2, len(node), 2):
+            exp = exp * node[i] if node[i - 1] == "*" else exp / node[i]
+        return exp
+
+    def term(self, node):
+        if len(node) > 2:
+            base = self.term(node[:-2])
+            pw = int(str(node[-1]))
+            if pw == 0:
+                return Expression(1)
+            exp = base
+            for __ in range(1, pw):
+                exp = exp * base
+            return exp
+        val = node[-1]
+        if isinstance(val, str):
+            val = Expression(str(val))
+        if len(node) == 2 and str(node[0]) == "-":
+            return Expression(0) - val
+        return val
+
+
+def lpi_constraint(text, parser=None):
+    """Returns the string of the constraint ``text`` built by
+    :class:`LpiTreeTransformer`, or None if it is not accepted.
+
+    :param text: The constraint.
+    :type text: str
+    :param parser: The constraint parser. Defaults to
+        :class:`genericparser.Constraint_parser.Parser_Constraint`.
+    """
+    from genericparser.Constraint_parser import Parser_Constraint
+    if parser is None:
+        parser = Parser_Constraint()
+    try:
+        return str(LpiTreeTransformer().transform(parser.get_lark().parse(text)))
+    except Exception:
+        return None
+
+
+def legacy_isolate(cons, pvars):
+    """The previous ``KoatUpdates.isolate`` of the koat exporter, which
+    visits every constraint for each primed variable."""
+    result = cons[:]
+    pvar_exps = []
+    lvars = []
+    lvars_count = 0
+    for v in pvars:
+        v_exp = None
+        try:
+            toremove = []
+            for c in result[:]:
+                if str(c) == "0 == 0":
+                    toremove.append(c)
+                    continue
+                if not(v in c.get_variables()):
+                    continue
+                v_exp_isolate = c.isolate(v)
+                if v_exp is not None:
+                    if str(v_exp) == str(v_exp_isolate):
+                        continue
+                    raise ValueError("Transition is false.")
+                v_exp = v_exp_isolate
+                for v2 in pvars:
+                    if v2 in v_exp.get_variables():
+                        raise ValueError("Multiple pvars on the same constraint.")
+                toremove.append(c)
+            for c in toremove:
+                result.remove(c)
+        except ValueError:
+            v_exp = Expression(v)
+        if not v_exp:
+            lvars.append("NoDet{}".format(lvars_count))
+            v_exp = Expression(lvars[lvars_count])
+            lvars_count += 1
+        pvar_exps.append(v_exp)
+    return result, ", ".join([str(e) for e in pvar_exps]), lvars
+
+
+def legacy_close_walks(cfg, max_length=5, max_appears=2, linear=False):
+    """The previous recursive ``Cfg.get_close_walks``, which looked up the
+    transitions of each node twice per step (without its shared default
+    arguments)."""
+    def bt_cw(src, m_len, init, trs_cw, trs_count):
+        trg = init if m_len == 1 else None
+        for t in cfg.get_edges(source=src, target=trg):
+            if linear and not t["linear"]:
+                continue
+            if trs_count.get(t["name"], 0) >= max_appears:
+                continue
+            if m_len == 1 or t["target"] == init:
+                yield trs_cw + [t]
+        if m_len > 1:
+            for t in cfg.get_edges(source=src):
+                if linear and not t["linear"]:
+                    continue
+                if trs_count.get(t["name"], 0) >= max_appears:
+                    continue
+                trs_count[t["name"]] = trs_count.get(t["name"], 0) + 1
+                yield from bt_cw(t["target"], m_len - 1, init, trs_cw + [t], trs_count)
+                trs_count[t["name"]] -= 1
+    for init in cfg.get_info("entry_nodes"):
+        yield from bt_cw(init, max_length, init, [], {})
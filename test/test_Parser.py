@@ -3,6 +3,8 @@ import os as _os
 import networkx as nx
 import networkx.drawing.nx_pydot as nx_pydot
 import genericparser
+from fixtures import (KOAT_PROGRAM, MLC_PROGRAM, KITTLE_PROGRAM, FC_PROGRAM,
+                      FC_UNSORTED_PROGRAM, cfg_signature, temp_dir, write)
 
 
 class TestKey(unittest.TestCase):
@@ -63,3 +65,190 @@ class TestKey(unittest.TestCase):
         b = nx.difference(ogc, rgc)
         self.assertTrue(nx.is_empty(a))
         self.assertTrue(nx.is_empty(b))
+
+
+class TestParserModes(unittest.TestCase):
+
+    def check_modes(self, parser, program):
+        lalr = parser().parse_string(program)
+        earley = parser("earley").parse_string(program)
+        self.assertEqual(cfg_signature(lalr), cfg_signature(earley))
+        return lalr
+
+    def test_fc(self):
+        from genericparser.Parser_fc import Parser_fc
+        cfg = Parser_fc().parse_string(FC_PROGRAM)
+        self.assertEqual(len(cfg.get_edges()), 2)
+        self.assertRaises(ValueError, Parser_fc, "earley")
+
+    def test_koat(self):
+        from genericparser.Parser_koat import Parser_koat
+        cfg = self.check_modes(Parser_koat, KOAT_PROGRAM)
+        self.assertEqual(len(cfg.get_edges()), 5)
+
+    def test_mlc(self):
+        from genericparser.Parser_mlc import Parser_mlc
+        cfg = self.check_modes(Parser_mlc, MLC_PROGRAM)
+        self.assertEqual(len(cfg.get_edges()), 3)
+
+    def test_kittle(self):
+        from genericparser.Parser_kittle import Parser_kittle
+        cfg = self.check_modes(Parser_kittle, KITTLE_PROGRAM)
+        self.assertEqual(len(cfg.get_edges()), 3)
+
+    def test_constraint(self):
+        for cons in ["x' - -3*(y+1)*y^2 <= x^3 * -2", "x = - y - -1", "-x^2 >= 3"]:
+            self.assertEqual(str(genericparser.parse_constraint(cons)),
+                             str(genericparser.parse_constraint(cons, mode="earley")))
+
+    def test_invalid_mode(self):
+        from genericparser.Parser_fc import Parser_fc
+        self.assertRaises(ValueError, Parser_fc, "cyk")
+
+
+class TestFcStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = temp_dir(self)
+
+    def write(self, program):
+        return write(self.tmp, "program.fc", program)
+
+    def test_same_cfg(self):
+        from genericparser.Parser_fc import Parser_fc
+        for program in [FC_PROGRAM, FC_UNSORTED_PROGRAM]:
+            path = self.write(program)
+            self.assertEqual(cfg_signature(Parser_fc().parse_stream(path)),
+                             cfg_signature(Parser_fc().parse(path)))
+
+    def test_iter_transitions(self):
+        from genericparser.Parser_fc import Parser_fc
+        path = self.write(FC_UNSORTED_PROGRAM)
+        header = Parser_fc().read_header(path)
+        self.assertEqual(header["global_vars"], ["x", "y", "x'", "y'"])
+        self.assertNotIn("transitions", header)
+        names = [tr["name"] for tr in Parser_fc().iter_transitions(path)]
+        self.assertEqual(names, ["t0", "t1", "t3"])
+
+    def test_unnamed_transitions(self):
+        try:
+            import termination.output  # noqa: F401
+        except ImportError:
+            self.skipTest("termination is not installed")
+        from genericparser.Parser_fc import Parser_fc
+        path = self.write("{vars: [x], transitions: [{source: n0, target: n1, constraints: [x' = x]},"
+                          " {source: n1, target: n1, name: /* c */ tr0, constraints: [x' = x]},"
+                          " {source: n1, target: n0, name: tr1, ignore: true, constraints: []},"
+                          " {source: n1, target: n0, constraints: [x' = 0]}]}")
+        cfg = Parser_fc().parse_stream(path)
+        self.assertEqual(cfg_signature(cfg), cfg_signature(Parser_fc().parse(path)))
+        self.assertEqual([e["name"] for e in cfg.get_edges()], ["t0", "tr0", "tr1", "tr2"])
+
+    def test_chunk_boundaries(self):
+        from genericparser.Parser_fc import _fc_items
+        path = self.write(FC_UNSORTED_PROGRAM)
+        with open(path, "rb") as f:
+            expected = list(_fc_items(f))
+            for size in range(1, 9):
+                self.assertEqual(list(_fc_items(f, chunk_size=size)), expected)
+
+    def test_errors(self):
+        from genericparser.Parser_fc import Parser_fc
+        path = self.write("{vars: [x], vars: [y], transitions: []}")
+        self.assertRaises(ValueError, Parser_fc().parse_stream, path)
+        path = self.write("{vars: [x], transitions: [")
+        self.assertRaises(ValueError, Parser_fc().parse_stream, path)
+
+
+class TestInterning(unittest.TestCase):
+
+    def test_shared_objects(self):
+        from genericparser.Parser_koat import Parser_koat
+        cfg = Parser_koat().parse_string(KOAT_PROGRAM)
+        stats = cfg.get_interning_stats()
+        for kind in ["names", "expressions", "constraints"]:
+            self.assertLess(stats[kind]["unique"], stats[kind]["total"])
+        self.assertGreater(stats["bytes_saved"], 0)
+        t1, t2 = cfg.get_edges(source="f1", target="f1")[0], cfg.get_edges(source="f1", target="f2")[0]
+        self.assertIs(t1["constraints"][0], t2["constraints"][0])
+
+    def test_stats_not_in_graph(self):
+        import pickle
+        from genericparser.Parser_fc import Parser_fc
+        from genericparser.Parser_mlc import Parser_mlc
+        from genericparser.Parser_koat import Parser_koat
+        for parser, program in [(Parser_fc, FC_PROGRAM), (Parser_mlc, MLC_PROGRAM), (Parser_koat, KOAT_PROGRAM)]:
+            cfg = parser().parse_string(program)
+            self.assertIsNotNone(cfg.get_interning_stats())
+            self.assertNotIn("interning", cfg.get_info())
+            self.assertNotIn("bytes_saved", repr(cfg))
+            self.assertIsNone(pickle.loads(pickle.dumps(cfg)).get_interning_stats())
+
+    def test_stream_shares_between_transitions(self):
+        from genericparser.Parser_fc import Parser_fc
+        path = write(temp_dir(self), "a.fc", FC_PROGRAM)
+        stats = Parser_fc().parse_stream(path).get_interning_stats()
+        self.assertEqual(stats, Parser_fc().parse(path).get_interning_stats())
+
+
+class TestValidation(unittest.TestCase):
+
+    def test_scaling(self):
+        from genericparser.validation import TransitionMetadata, check_variables, unique_keys
+
+        class Name(str):
+            comparisons = 0
+
+            def __eq__(self, other):
+                Name.comparisons += 1
+                return str.__eq__(self, other)
+            __hash__ = str.__hash__
+
+        class Cons:
+            def __init__(self, variables):
+                self.variables = variables
+
+            def is_linear(self):
+                return True
+
+            def get_variables(self):
+                return self.variables
+
+        def local_variables(names):
+            g = Name("g")
+            cons = [Cons([g, names[i], names[i // 2]]) for i in range(len(names))]
+            lvars, __ = TransitionMetadata([g]).local_variables(cons)
+            self.assertEqual(len(lvars), len(names))
+
+        for function in [check_variables, lambda names: unique_keys((k, i) for i, k in enumerate(names)),
+                         local_variables]:
+            names = [Name("v{}".format(i)) for i in range(2000)]
+            Name.comparisons = 0
+            function(names)
+            # looking the names up in a list would compare each one with the previous ones
+            self.assertLess(Name.comparisons, len(names))
+
+    def test_messages(self):
+        from genericparser.validation import TransitionNames, check_variables, unique_keys
+        with self.assertRaisesRegex(ValueError, "^Multiple definition of variable: a$"):
+            check_variables(["a", "b", "b", "a"])
+        with self.assertRaisesRegex(ValueError, "^Duplicate key: b$"):
+            unique_keys([("a", 1), ("b", 2), ("b", 3)])
+        names = TransitionNames(["t0", "t1"])
+        self.assertEqual(names.fresh("t"), "t2")
+        with self.assertRaisesRegex(ValueError, r"^Multiple transitions with the same name: t1\.$"):
+            names.add("t1")
+
+    def test_parser_messages(self):
+        from genericparser.Parser_fc import Parser_fc
+        from genericparser.Parser_mlc import Parser_mlc
+        for parse, text, message in [
+                (Parser_fc().parse_string, FC_PROGRAM.replace("pvars: [x', y']", "pvars: [x', x]"),
+                 "Multiple definition of variable: x"),
+                (Parser_fc().parse_string, FC_PROGRAM.replace("t1", "t0"),
+                 "Multiple transitions with the same name: t0."),
+                (Parser_mlc().parse_string, MLC_PROGRAM.replace("x1 y1", "x1 x"),
+                 "Multiple definition of variable: x")]:
+            with self.assertRaises(Exception) as context:
+                parse(text)
+            self.assertIn(message, str(context.exception))
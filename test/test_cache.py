@@ -0,0 +1,120 @@
+import unittest
+import os as _os
+import genericparser
+from fixtures import KOAT_PROGRAM, cfg_signature, temp_dir, write
+
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        from genericparser.cache import ParseCache
+        tmp = temp_dir(self)
+        self.cache = ParseCache(_os.path.join(tmp, "cache"))
+        self.path = write(tmp, "a.koat", KOAT_PROGRAM)
+
+    def test_hit(self):
+        first = genericparser.parse(self.path, cache=self.cache)
+        second = genericparser.parse(self.path, cache=self.cache)
+        self.assertEqual(cfg_signature(first), cfg_signature(second))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_keyed_by_content(self):
+        genericparser.parse(self.path, cache=self.cache)
+        with open(self.path, "a") as f:
+            f.write("\n")
+        genericparser.parse(self.path, cache=self.cache)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_converted_text(self):
+        from genericparser.Parser_c import Parser_c
+        calls = []
+
+        def convert():
+            calls.append(1)
+            return KOAT_PROGRAM
+        parser = Parser_c(cache=self.cache)
+        for __ in range(2):
+            self.assertEqual(parser.converted_text(self.path, parser.c2koatpath, convert), KOAT_PROGRAM)
+        self.assertEqual(len(calls), 1)
+
+    def test_timeout_during_store(self):
+        import time
+        from unittest import mock
+        import genericparser.cache as cache_module
+        mkstemp = cache_module.tempfile.mkstemp
+
+        def slow_mkstemp(*args, **kwargs):
+            result = mkstemp(*args, **kwargs)
+            time.sleep(0.5)
+            return result
+        with mock.patch.object(cache_module.tempfile, "mkstemp", slow_mkstemp):
+            results = list(genericparser.parse_many([self.path], workers=1, timeout=0.2, cache=self.cache))
+        # the store is finished before the timeout fires
+        self.assertIsInstance(results[0][1], TimeoutError)
+        files = [f for __, __, fs in _os.walk(self.cache.directory) for f in fs]
+        self.assertEqual([_os.path.splitext(f)[1] for f in files], [".pkl"])
+        self.assertEqual(cfg_signature(genericparser.parse(self.path, cache=self.cache)),
+                         cfg_signature(genericparser.parse(self.path)))
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_lru_eviction(self):
+        import time
+        for i in range(3):
+            self.cache.put(str(i) * 64, "x" * 1000)
+            time.sleep(0.01)
+        self.cache.get("0" * 64)
+        self.cache.max_size = 2500
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.get("0" * 64))
+        self.assertIsNone(self.cache.get("1" * 64))
+        self.assertEqual(self.cache.stats()["entries"], 2)
+        self.cache.purge()
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_keyed_by_version(self):
+        from unittest import mock
+        import genericparser.cache as cache_module
+        key = self.cache.key(b"content", "Parser_koat")
+        with mock.patch.object(cache_module, "package_version", return_value="0.0.0"):
+            self.assertNotEqual(self.cache.key(b"content", "Parser_koat"), key)
+
+    def test_size_tracked_in_memory(self):
+        from unittest import mock
+        with mock.patch.object(self.cache, "_entries", wraps=self.cache._entries) as entries:
+            for i in range(50):
+                self.cache.put("{:064x}".format(i), "x" * 100)
+            # only the first store scans the directory
+            self.assertEqual(entries.call_count, 1)
+            self.cache.max_size = self.cache.stats()["size"]
+            entries.reset_mock()
+            for i in range(50, 55):
+                self.cache.put("{:064x}".format(i), "x" * 100)
+            # evicting to EVICT_TARGET leaves room for the next stores
+            self.assertEqual(entries.call_count, 1)
+        self.assertLessEqual(self.cache.stats()["size"], self.cache.max_size)
+        self.assertLess(self.cache.stats()["entries"], 50)
+
+
+class TestConstraintMemo(unittest.TestCase):
+
+    def setUp(self):
+        genericparser.set_constraint_cache_size(16)
+
+    def tearDown(self):
+        genericparser.set_constraint_cache_size(1024)
+
+    def test_memoized_copies(self):
+        first = genericparser.parse_constraint("x' = x + 1")
+        second = genericparser.parse_constraint("x' = x + 1")
+        self.assertIsNot(first, second)
+        self.assertEqual(str(first), str(second))
+        info = genericparser.constraint_cache_info()
+        self.assertEqual((info["hits"], info["misses"], info["maxsize"]), (1, 1, 16))
+
+    def test_batch(self):
+        strings = ["x >= 0", "y' = y - x", "x >= 0", "x^2 <= y"]
+        batch = genericparser.parse_constraints(strings)
+        self.assertEqual([str(c) for c in batch],
+                         [str(genericparser.parse_constraint(s)) for s in strings])
+        self.assertIsNot(batch[0], batch[2])
@@ -0,0 +1,289 @@
+import unittest
+from fixtures import FC_PROGRAM, fc_program
+from legacy import legacy_close_walks
+
+
+class TestEdgeIndex(unittest.TestCase):
+
+    def cfg(self, size=5):
+        from genericparser.Cfg import Cfg
+        G = Cfg()
+        for i in range(size):
+            G.add_edge("n{}".format(i % 3), "n{}".format((i * 7) % 3), "t{}".format(size - i), constraints=[])
+        return G
+
+    def assertSameEdges(self, G):
+        nodes = list(G.nodes()) + ["missing"]
+        names = [e["name"] for e in G._scan_edges()] + ["missing"]
+        for source in [None] + nodes:
+            for target in [None] + nodes:
+                for name in [None] + names:
+                    expected = sorted(G._scan_edges(source, target, name), key=lambda tr: tr["name"])
+                    got = G.get_edges(source=source, target=target, name=name)
+                    self.assertEqual([id(e) for e in got], [id(e) for e in expected], (source, target, name))
+
+    def test_lookups(self):
+        G = self.cfg()
+        self.assertSameEdges(G)
+        self.assertEqual([e["name"] for e in G.get_edges()], ["t1", "t2", "t3", "t4", "t5"])
+
+    def test_updates(self):
+        G = self.cfg()
+        G.get_edges(name="t1")
+        G.add_edge("n0", "n4", "t0")
+        G.remove_edge("n1", "n1", "t4")
+        self.assertSameEdges(G)
+        G.remove_edges_from([("n2", "n2", "t3")])
+        G.remove_node("n4")
+        self.assertSameEdges(G)
+        self.assertSameEdges(G.copy())
+        self.assertSameEdges(G.subgraph(["n0", "n1"]))
+        G.clear_edges()
+        self.assertEqual(G.get_edges(), [])
+        self.assertEqual(G.get_edges(name="t1"), [])
+
+    def test_set_edges_info(self):
+        G = self.cfg()
+        G.set_edges_info({"t1": {"cost": 3, "name": "t1"}, "t2": {"cost": 4}, "t9": {"cost": 5}})
+        self.assertEqual([e.get("cost") for e in G.get_edges()], [3, 4, None, None, None])
+        G.set_edge_info("cost", 0, source="n0")
+        self.assertEqual([e.get("cost") for e in G.get_edges(source="n0")], [0, 0])
+
+    def test_rename(self):
+        G = self.cfg()
+        self.assertEqual([e["name"] for e in G.get_edges()], ["t1", "t2", "t3", "t4", "t5"])
+        t1 = G.get_edges(name="t1")[0]
+        G.set_edges_info({"t1": {"name": "t9", "cost": 1}})
+        G.set_edge_info("name", "t0", name="t2")
+        self.assertEqual([e["name"] for e in G.get_edges()], ["t0", "t3", "t4", "t5", "t9"])
+        self.assertEqual(G.get_edges(name="t1"), [])
+        self.assertIs(G.get_edges(name="t9")[0], t1)
+        self.assertEqual(t1["cost"], 1)
+        self.assertTrue(G.has_edge(t1["source"], t1["target"], "t9"))
+        self.assertIn(("n1", "n1", "t9"), list(G.in_edges("n1", keys=True)))
+        self.assertSameEdges(G)
+        G.add_edge("n1", "n1", "t8")
+        with self.assertRaises(ValueError):
+            G.set_edge_info("name", "t8", name="t9")
+        # the names are unique in the whole cfg, with or without the index
+        with self.assertRaises(ValueError):
+            G.set_edge_info("name", "t3", name="t9")
+        G._reset_edge_index()
+        with self.assertRaises(ValueError):
+            G._rename_edge(t1, "t3")
+        self.assertIsNone(G._edge_index)
+        self.assertEqual([e["name"] for e in G.get_edges()], ["t0", "t3", "t4", "t5", "t8", "t9"])
+        with self.assertRaises(ValueError):
+            G.subgraph(["n0", "n1"]).set_edge_info("name", "t7", name="t0")
+
+    def test_lookup_cost(self):
+        from unittest import mock
+        G = self.cfg(4000)
+        with mock.patch.object(G, "_scan_edges", wraps=G._scan_edges) as scan:
+            G.get_edges(name="t1")
+            index = G._edge_index
+            for i in range(1, 2001):
+                self.assertEqual(len(G.get_edges(name="t{}".format(i))), 1)
+                G.get_edges(source="n1", target="n0", name="t{}".format(i))
+            G.get_edges()
+            sorted_edges = G._sorted_edges
+            G.get_edges()
+        # the lookups use the index built once, not a scan of every edge
+        scan.assert_not_called()
+        self.assertIs(G._edge_index, index)
+        self.assertIs(G._sorted_edges, sorted_edges)
+
+
+class TestFrozenCfg(unittest.TestCase):
+
+    def cfg(self):
+        import random
+        from genericparser.Cfg import Cfg
+        rnd = random.Random(7)
+        G = Cfg()
+        for i in range(60):
+            G.add_edge("n{}".format(rnd.randrange(25)), "n{}".format(rnd.randrange(25)), "t{}".format(i),
+                       constraints=["c{}".format(i)], local_vars=[], linear=True)
+        G.add_node("alone")
+        G.set_edge_info("cost", 3, name="t5")
+        G.set_info("init_node", "n0")
+        return G
+
+    def test_edges(self):
+        G = self.cfg()
+        F = G.freeze()
+        self.assertEqual(F.number_of_nodes(), G.number_of_nodes())
+        self.assertEqual(F.number_of_edges(), G.number_of_edges())
+        self.assertEqual(F.get_info("init_node"), "n0")
+        nodes = G.get_nodes() + ["missing"]
+        for source in [None] + nodes:
+            for target in [None] + nodes:
+                for name in [None, "t5", "missing"]:
+                    expected = G.get_edges(source=source, target=target, name=name)
+                    got = F.get_edges(source=source, target=target, name=name)
+                    self.assertEqual([dict(e, constraints=list(e["constraints"]), local_vars=list(e["local_vars"]))
+                                      for e in got],
+                                     expected, (source, target, name))
+        e = F.get_edges(name="t5")[0]
+        self.assertEqual(e["cost"], 3)
+        with self.assertRaises(TypeError):
+            e["cost"] = 4
+        G.remove_edge(e["source"], e["target"], "t5")
+        self.assertEqual(len(F.get_edges(name="t5")), 1)
+
+    def test_traversals(self):
+        import networkx as nx
+        G = self.cfg()
+        F = G.freeze()
+        D = nx.MultiDiGraph(G)
+        expected = sorted(sorted(c) for c in nx.strongly_connected_components(D))
+        self.assertEqual(sorted(sorted(c) for c in F.strongly_connected_components()), expected)
+        for n in G.nodes():
+            self.assertEqual(sorted(F.neighbors(n)), sorted(G.neighbors(n)))
+            self.assertEqual(F.reachable(n), nx.descendants(D, n) | {n})
+            self.assertEqual(F.reachable(n, reverse=True), nx.ancestors(D, n) | {n})
+        self.assertEqual(F.reachable(["n1", "n2"]), F.reachable("n1") | F.reachable("n2"))
+        # reverse topological order
+        component = F.scc_ids()
+        for e in F.get_edges():
+            self.assertGreaterEqual(component[F.node_id(e["source"])], component[F.node_id(e["target"])])
+
+    def test_deep_graph(self):
+        from genericparser.Cfg import Cfg
+        G = Cfg()
+        for i in range(5000):
+            G.add_edge(i, i + 1, "t{}".format(i), constraints=[])
+        G.add_edge(5000, 0, "back", constraints=[])
+        F = G.freeze()
+        self.assertEqual(len(F.strongly_connected_components()), 1)
+        self.assertEqual(len(F.reachable(0)), 5001)
+
+
+class TestConstraintMatrices(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+    def test_rows(self):
+        from genericparser.Parser_fc import Parser_fc
+        cfg = Parser_fc().parse_string(FC_PROGRAM.replace("y' = y + 2*x]", "y' = y + 2*x, x*y <= 3, 1 <= 2]"))
+        matrices = cfg.constraint_matrices()
+        m = matrices["t1"]
+        self.assertEqual(m.variables, ["x", "y", "x'", "y'"])
+        self.assertEqual(m.A.tolist(), [[-1, 0, 0, 0], [-1, 0, 1, 0], [-2, -1, 0, 1], [0, 0, 0, 0]])
+        self.assertEqual(m.b.tolist(), [0, -1, 0, 1])
+        self.assertEqual(m.ops.tolist(), ["<", "==", "==", "<="])
+        self.assertEqual(m.nonlinear, [3])
+        self.assertEqual(matrices["t0"].A.shape, (3, 4))
+        # stored in the transitions
+        self.assertIs(cfg.constraint_matrices()["t1"], m)
+        self.assertIs(cfg.get_edges(name="t1")[0]["constraint_matrices"], m)
+        self.assertIsNot(cfg.constraint_matrices(update=True)["t1"], m)
+
+    def test_removed_variables(self):
+        from genericparser.Parser_fc import Parser_fc
+        cfg = Parser_fc().parse_string(FC_PROGRAM.replace("vars: [x, y]", "vars: [x, y, z]").replace(
+            "pvars: [x', y']", "pvars: [x', y', z']").replace("x' = x - 1,", "x' = x - 1, z' = z,"))
+        cfg.constraint_matrices()
+        count, removed = cfg.remove_no_important_variables()
+        self.assertEqual((count, removed), (1, ["z"]))
+        m = cfg.constraint_matrices()["t1"]
+        self.assertEqual(m.variables, ["x", "y", "x'", "y'"])
+        self.assertEqual(m.A.tolist(), [[-1, 0, 0, 0], [-1, 0, 1, 0], [-2, -1, 0, 1]])
+
+    def test_bulk_checks(self):
+        import numpy as np
+        from genericparser.matrices import ConstraintMatrices
+        A = np.array([[1, 0], [0, 0], [0, 0], [-2, 0], [1, 0], [1, 1], [0, 3]])
+        b = np.array([5, 1, -1, 4, 5, 0, 6])
+        ops = np.array(["<=", "<", "==", "<=", "<=", "<=", "=="])
+        m = ConstraintMatrices(A, b, ops, ["x", "y"])
+        holds, fails = m.trivial()
+        self.assertEqual(holds.tolist(), [False, True, False, False, False, False, False])
+        self.assertEqual(fails.tolist(), [False, False, True, False, False, False, False])
+        self.assertEqual(m.duplicates().tolist(), [False, False, False, False, True, False, False])
+        lower, upper = m.bounds()
+        self.assertEqual(lower.tolist(), [-2, 2])
+        self.assertEqual(upper.tolist(), [5, 2])
+
+
+class TestParallelPolyhedrons(unittest.TestCase):
+
+    def polyhedrons(self, cfg):
+        return [(e["name"], [str(c) for c in e["polyhedron"].get_constraints()]) for e in cfg.get_edges()]
+
+    def test_same_as_sequential(self):
+        from genericparser.Parser_fc import Parser_fc
+        transitions = ["{{source: n{0}, target: n{1}, name: t{0}, constraints: [x >= {0}, x' = x - y]}}"
+                       .format(i, i + 1) for i in range(40)]
+        program = fc_program(transitions, ("x", "y"))
+        sequential = Parser_fc().parse_string(program)
+        sequential.build_polyhedrons()
+        parallel = Parser_fc().parse_string(program)
+        parallel.build_polyhedrons(workers=3, chunksize=4, min_parallel=8)
+        self.assertEqual(self.polyhedrons(parallel), self.polyhedrons(sequential))
+        # existing polyhedrons are kept
+        poly = parallel.get_edges(name="t3")[0]["polyhedron"]
+        parallel.build_polyhedrons(workers=3, min_parallel=8)
+        self.assertIs(parallel.get_edges(name="t3")[0]["polyhedron"], poly)
+
+    def test_unpicklable_polyhedrons(self):
+        import multiprocessing
+        from unittest import mock
+        import genericparser.Cfg as cfg_module
+        from genericparser.Parser_fc import Parser_fc
+        program = fc_program(["{{source: n{0}, target: n{1}, name: t{0}, constraints: [x >= {0}]}}"
+                              .format(i, i + 1) for i in range(20)])
+        sequential = Parser_fc().parse_string(program)
+        sequential.build_polyhedrons()
+        cfg = Parser_fc().parse_string(program)
+        # built in this process, without a pool
+        with mock.patch.object(cfg_module, "_pickles_polyhedrons", return_value=False), \
+                mock.patch.object(multiprocessing, "Pool") as pool:
+            cfg.build_polyhedrons(workers=3, min_parallel=4)
+        pool.assert_not_called()
+        self.assertEqual(self.polyhedrons(cfg), self.polyhedrons(sequential))
+
+
+class TestCloseWalks(unittest.TestCase):
+
+    def random_cfg(self, seed):
+        import random
+        from genericparser.Parser_fc import Parser_fc
+        rnd = random.Random(seed)
+        trs = []
+        for k in range(rnd.randrange(3, 18)):
+            cons = "x*x >= 0" if rnd.random() < 0.2 else "x' = x + 1"
+            trs.append("{{source: n{}, target: n{}, name: t{}, constraints: [{}]}}".format(
+                rnd.randrange(6), rnd.randrange(6), k, cons))
+        cfg = Parser_fc().parse_string(fc_program(trs))
+        cfg.set_info("entry_nodes", sorted(rnd.sample(cfg.get_nodes(), 2)))
+        return cfg
+
+    def test_same_as_reference(self):
+        for seed in range(40):
+            cfg = self.random_cfg(seed)
+            for max_length in (0, 1, 3, 5):
+                for max_appears in (1, 2):
+                    for linear in (False, True):
+                        expected = [[t["name"] for t in w]
+                                    for w in legacy_close_walks(cfg, max_length, max_appears, linear)]
+                        result = [[t["name"] for t in w]
+                                  for w in cfg.get_close_walks(max_length, max_appears, linear)]
+                        self.assertEqual(result, expected, (seed, max_length, max_appears, linear))
+
+    def test_abandoned_generator(self):
+        from genericparser.Parser_fc import Parser_fc
+        cfg = Parser_fc().parse_string(fc_program(["{source: n0, target: n0, name: t0, constraints: []}",
+                                                   "{source: n0, target: n0, name: t1, constraints: []}"]))
+        cfg.set_info("entry_nodes", ["n0"])
+        walks = cfg.get_close_walks(max_length=3, max_appears=1)
+        next(walks)
+        next(walks)
+        next(walks)
+        # the counts of the unfinished walks are not kept
+        self.assertEqual([[t["name"] for t in w] for w in cfg.get_close_walks(3, 1)],
+                         [["t0"], ["t1"], ["t0", "t1"], ["t1", "t0"]])
@@ -0,0 +1,250 @@
+import unittest
+import os as _os
+from fixtures import FC_PROGRAM, parse_constraints, interned_constraints, temp_dir
+from legacy import legacy_isolate
+
+
+class TestExporters(unittest.TestCase):
+
+    def cfg(self):
+        from genericparser.Parser_fc import Parser_fc
+        program = FC_PROGRAM.replace("transitions: [", "transitions: [{source: n1, target: n0, name: t2, "
+                                     "constraints: [x = 0, x' = 5, y' = y]}, {source: n1, target: n0, name: a2, "
+                                     "constraints: [x = 1, x' = 3, y' = y]},")
+        return Parser_fc().parse_string(program)
+
+    def test_edges_by_source(self):
+        from genericparser.exporters import edges_by_source
+        cfg = self.cfg()
+        expected = [(s, [e for t in cfg.get_nodes() for e in cfg.get_edges(source=s, target=t)])
+                    for s in cfg.get_nodes()]
+        self.assertEqual(edges_by_source(cfg), expected)
+
+    def test_buffered_writer(self):
+        import io
+        from genericparser.exporters import BufferedWriter
+        out = io.StringIO()
+        with BufferedWriter(out, size=4) as w:
+            w.write("ab")
+            self.assertEqual(out.getvalue(), "")
+            w.write("cd")
+            self.assertEqual(out.getvalue(), "abcd")
+            w.write("e")
+        self.assertEqual(out.getvalue(), "abcde")
+
+    def test_koat(self):
+        import io
+        cfg = self.cfg()
+        out = io.StringIO()
+        cfg.toKoat(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "(GOAL TERMINATION)")
+        self.assertEqual(lines[2], "(VAR x y x' y')")
+        self.assertEqual(lines[3], "(RULES ")
+        self.assertEqual(lines[-1], ")")
+        self.assertEqual([line.split("(")[0].strip() for line in lines[4:-1]], ["_init", "n0", "n1", "n1", "n1"])
+        self.assertIn("n1(x,y) -> Com_1(n0(3, y))", lines[6])
+        rules, str_vars = cfg._toKoat_rules("none")
+        self.assertEqual(rules.splitlines(), lines[4:-1])
+        # the initial node with incoming transitions gets a new one
+        cfg.set_info("init_node", "n0")
+        out = io.StringIO()
+        cfg.toKoat(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1:5], ["(STARTTERM (FUNCTIONSYMBOLS pyRinit))", "(VAR x,y)", "(RULES ",
+                                      "  pyRinit(x,y) -> Com_1(n0(x,y))"])
+
+    def test_invariants_not_added_to_transitions(self):
+        import io
+
+        class Invariant:
+            def get_constraints(self):
+                return parse_constraints("x >= 0")
+        cfg = self.cfg()
+        for n in cfg.get_nodes():
+            cfg.nodes[n]["invariant_polyhedra"] = Invariant()
+        sizes = [len(e["constraints"]) for e in cfg.get_edges()]
+        for method in (cfg.toFc, cfg.toKoat, cfg.toProlog, cfg.toEspecialProlog):
+            method(io.StringIO(), invariant_type="polyhedra")
+        self.assertEqual([len(e["constraints"]) for e in cfg.get_edges()], sizes)
+
+
+class TestKoatUpdates(unittest.TestCase):
+
+    def test_same_as_reference(self):
+        import random
+        from genericparser.exporters import KoatUpdates
+        rnd = random.Random(5)
+        pool = ["x' = x + 1", "x' = x + 1", "2*x' = 2*x + 2", "x' = y", "y' = y", "y' = x' + 1", "x >= 0",
+                "y' <= x", "0 = 0", "0 = 0", "x' = x + 2", "z' = z", "x' + y' = 3", "y = y"]
+        updates = KoatUpdates()
+        for __ in range(300):
+            cons = interned_constraints(*rnd.sample(pool, rnd.randint(0, 7)))
+            pvars = ["x'", "y'", "z'"]
+            result, pvalues, lvars = updates.isolate(cons, pvars)
+            expected = legacy_isolate(cons, pvars)
+            self.assertEqual(([id(c) for c in result], pvalues, lvars),
+                             ([id(c) for c in expected[0]], expected[1], expected[2]), [str(c) for c in cons])
+
+    def test_linear_work(self):
+        import collections
+        from unittest import mock
+        from genericparser.exporters import KoatUpdates
+        from genericparser.linear import LinearConstraint
+        size = 200
+        cons = interned_constraints(*["x{0}' = x{0} + {0}".format(i) for i in range(size)] +
+                                    ["x{} >= 0".format(i) for i in range(size)])
+        pvars = ["x{}'".format(i) for i in range(size)]
+        names = collections.Counter()
+        isolated = collections.Counter()
+        variable_names = LinearConstraint.variable_names
+
+        def count_names(c):
+            names[id(c)] += 1
+            return variable_names(c)
+
+        def count_isolate(c, v):
+            isolated[id(c)] += 1
+            return c.to_lpi().isolate(v)
+        with mock.patch.object(LinearConstraint, "variable_names", count_names), \
+                mock.patch.object(LinearConstraint, "isolate", count_isolate, create=True):
+            KoatUpdates().isolate(cons, pvars)
+        # the variables of each constraint are read once, and only the
+        # constraint of each primed variable is isolated, once
+        self.assertEqual(names, collections.Counter({id(c): 1 for c in cons}))
+        self.assertEqual(isolated, collections.Counter({id(c): 1 for c in cons[:size]}))
+
+
+class TestSMT2(unittest.TestCase):
+
+    def test_flat_and(self):
+        import io
+        from genericparser.Parser_fc import Parser_fc
+        program = FC_PROGRAM.replace("transitions: [", "transitions: [{source: n1, target: n0, name: t2, "
+                                     "constraints: []}, {source: n0, target: n0, name: t3, constraints: [z = 1]},")
+        cfg = Parser_fc().parse_string(program)
+        out = io.StringIO()
+        cfg.toSMT2(out)
+        lines = [line.strip() for line in out.getvalue().splitlines() if "(cfg_trans2 pc " in line]
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            self.assertEqual(line.count("("), line.count(")"))
+            self.assertLessEqual(line.count("(and"), 1)
+        by_target = {(line.split()[2], line.split()[4]): line for line in lines}
+        self.assertTrue(by_target[("n1", "n0")].endswith(" true)"))
+        self.assertIn("(exists ((z Int)) ", by_target[("n0", "n0")])
+        self.assertNotIn("(and", by_target[("n0", "n0")])
+        self.assertIn(" (and ", by_target[("n1", "n1")])
+        # no polyhedrons as side effect
+        self.assertTrue(all("polyhedron" not in e for e in cfg.get_edges()))
+
+
+class TestDot(unittest.TestCase):
+
+    def setUp(self):
+        from genericparser.Parser_fc import Parser_fc
+        program = FC_PROGRAM.replace("transitions: [", "transitions: [{source: n1, target: n2, name: t2, "
+                                     "constraints: [x*x >= 0]}, {source: n2, target: n1, name: t3, "
+                                     "constraints: [x >= 1, x >= 2, x >= 3, x >= 4]},")
+        self.cfg = Parser_fc().parse_string(program)
+
+    def dot(self, **kwargs):
+        import io
+        out = io.StringIO()
+        self.cfg.toDot(out, **kwargs)
+        return out.getvalue()
+
+    def test_well_formed(self):
+        import pydot
+        before = [dict(e) for e in self.cfg.get_edges()]
+        nodes_before = self.cfg.get_nodes(data=True)
+        text = self.dot()
+        self.assertEqual(before, [dict(e) for e in self.cfg.get_edges()])
+        self.assertEqual(nodes_before, self.cfg.get_nodes(data=True))
+        graph, = pydot.graph_from_dot_data(text)
+        edges = {e.get("key").strip('"'): e for e in graph.get_edges()}
+        self.assertEqual(set(edges), {"t0", "t1", "t2", "t3"})
+        self.assertEqual(edges["t2"].get("label"), '"t2 no linear"')
+        self.assertEqual(edges["t0"].get("color"), edges["t0"].get("fontcolor"))
+        self.assertTrue(edges["t0"].get("tooltip").startswith('"t0 {&#13;&#10;&#09;'))
+        filled = [n.get_name().strip('"') for n in graph.get_nodes() if n.get("style") == '"filled"']
+        self.assertEqual(filled, self.cfg.get_info("entry_nodes"))
+
+    def test_sccs_and_tooltips(self):
+        import pydot
+        graph, = pydot.graph_from_dot_data(self.dot(sccs=True, max_tooltip=2))
+        clusters = graph.get_subgraphs()
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(sorted(n.get_name().strip('"') for n in clusters[0].get_nodes()), ["n1", "n2"])
+        t3, = [e for e in graph.get_edges() if e.get("key") == '"t3"']
+        self.assertIn("... 2 more", t3.get("tooltip"))
+        self.assertNotIn("x >= 3", t3.get("tooltip"))
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        from genericparser.Parser_fc import Parser_fc
+        self.cfg = Parser_fc().parse_string(FC_PROGRAM)
+
+    def test_same_as_methods(self):
+        import io
+        expected = {}
+        for fmt, method in (("fc", self.cfg.toFc), ("koat", self.cfg.toKoat),
+                            ("smt2", self.cfg.toSMT2), ("dot", self.cfg.toDot)):
+            out = io.StringIO()
+            method(out)
+            expected[fmt] = out.getvalue()
+        out = io.StringIO()
+        cost_vars = self.cfg.toProlog(out, with_cost=True)
+        expected["prolog"] = out.getvalue()
+        for threads in (1, 3):
+            outputs = {fmt: io.StringIO() for fmt in expected}
+            results = self.cfg.export(outputs, threads=threads, options={"prolog": {"with_cost": True}})
+            self.assertEqual(results["prolog"], cost_vars)
+            self.assertEqual({fmt: out.getvalue() for fmt, out in outputs.items()}, expected)
+
+    def test_threads(self):
+        import io
+        from concurrent.futures import ThreadPoolExecutor
+        from threading import Barrier
+        from genericparser.Parser_fc import Parser_fc
+        from genericparser.exporters import SYNTAXES, ExportContext
+        trs = ["{{source: n{}, target: n{}, name: t{}, constraints: [x' = x + {}, y >= {}*x - z, z' = z]}}".format(
+            i % 7, (i * 3 + 1) % 7, i, i % 4, i % 5) for i in range(200)]
+        cfg = Parser_fc().parse_string("{{vars: [x, y, z], initnode: n0, transitions: [{}]}}".format(", ".join(trs)))
+        formats = ("fc", "koat", "prolog", "smt2")
+
+        def export(threads):
+            outputs = {fmt: io.StringIO() for fmt in formats}
+            cfg.export(outputs, threads=threads)
+            return {fmt: out.getvalue() for fmt, out in outputs.items()}
+        expected = export(1)
+        for __ in range(5):
+            self.assertEqual(export(4), expected)
+        # every syntax formatted by several threads at once on one context
+        context = ExportContext(cfg)
+        cons = [c for e in context.edges for c in e["constraints"]]
+        barrier = Barrier(8)
+
+        def format_all(i):
+            barrier.wait()
+            syntaxes = list(SYNTAXES)[i % 2::2] + list(SYNTAXES)
+            return [[context.format(c, s) for c in cons] for s in syntaxes][-len(SYNTAXES):]
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(format_all, range(8)))
+        reference = ExportContext(cfg)
+        expected = [[reference.format(c, s) for c in cons] for s in SYNTAXES]
+        for result in results:
+            self.assertEqual(result, expected)
+
+    def test_paths_and_errors(self):
+        import io
+        path = _os.path.join(temp_dir(self), "out.fc")
+        self.cfg.export({"fc": path})
+        out = io.StringIO()
+        self.cfg.toFc(out)
+        with open(path) as f:
+            self.assertEqual(f.read(), out.getvalue())
+        with self.assertRaises(ValueError):
+            self.cfg.export({"json": io.StringIO()})
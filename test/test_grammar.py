@@ -0,0 +1,90 @@
+import unittest
+import os as _os
+import genericparser
+from fixtures import KOAT_PROGRAM, temp_dir
+
+
+class TestGrammarCache(unittest.TestCase):
+
+    def setUp(self):
+        genericparser.clear_grammar_cache()
+
+    def test_compiled_once(self):
+        from genericparser.Parser_fc import Parser_fc
+        first = Parser_fc().get_lark()
+        self.assertIs(first, Parser_fc().get_lark())
+        info = genericparser.grammar_cache_info()
+        self.assertEqual(info["misses"], 1)
+        self.assertEqual(info["hits"], 1)
+
+    def test_keyed_by_class_and_options(self):
+        from genericparser.Parser_fc import Parser_fc
+        from genericparser.Properties_parser import Parser_Properties
+        self.assertIsNot(Parser_fc().get_lark(), Parser_Properties().get_lark())
+        self.assertIsNot(Parser_fc().get_lark(), Parser_fc().get_lark(debug=True))
+
+    def test_warm_threads(self):
+        from threading import Thread
+        ths = [Thread(target=genericparser.warm_grammar_cache) for __ in range(4)]
+        for t in ths:
+            t.start()
+        for t in ths:
+            t.join()
+        info = genericparser.grammar_cache_info()
+        self.assertEqual(info["misses"], len(info["entries"]))
+        self.assertEqual(len(info["entries"]), 7)
+        # every request is counted once, as a hit or as a miss
+        self.assertEqual(info["hits"] + info["misses"], 4 * 7)
+
+
+class TestTables(unittest.TestCase):
+
+    def test_regenerated_when_grammar_changes(self):
+        from genericparser import tables
+        from genericparser.Constraint_parser import Parser_Constraint
+
+        class Parser_Changed(Parser_Constraint):
+            def get_grammar(self):
+                return Parser_Constraint.get_grammar(self) + "\n// changed\n"
+
+        tmp = temp_dir(self)
+        parsers = [Parser_Constraint, Parser_Changed]
+        self.assertEqual(tables.build_tables(parsers, tmp), ["Parser_Constraint", "Parser_Changed"])
+        self.assertEqual(tables.check_tables(parsers, tmp), [])
+        self.assertEqual(tables.build_tables(parsers, tmp), [])
+        self.assertIsNotNone(tables.load_table(Parser_Constraint(), {"parser": "lalr"}, tmp))
+        # a table generated for another grammar is never loaded
+        _os.replace(tables.table_path(Parser_Constraint(), tmp), tables.table_path(Parser_Changed(), tmp))
+        self.assertEqual(tables.check_tables(parsers, tmp), ["Parser_Constraint", "Parser_Changed"])
+        self.assertIsNone(tables.load_table(Parser_Changed(), {"parser": "lalr"}, tmp))
+        self.assertEqual(tables.build_tables(parsers, tmp), ["Parser_Constraint", "Parser_Changed"])
+
+    def test_loaded_parser_is_equivalent(self):
+        from genericparser import tables
+        from genericparser.Parser_koat import Parser_koat
+        tmp = temp_dir(self)
+        tables.build_tables([Parser_koat], tmp)
+        loaded = tables.load_table(Parser_koat(), {"parser": "lalr"}, tmp)
+        compiled = Parser_koat().get_lark()
+        self.assertEqual(loaded.parse(KOAT_PROGRAM), compiled.parse(KOAT_PROGRAM))
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_light_import(self):
+        import subprocess
+        import sys
+        code = "import sys, genericparser; print(' '.join(sys.modules))"
+        out = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True,
+                             cwd=_os.path.join(_os.path.dirname(_os.path.abspath(__file__)), ".."))
+        self.assertEqual(out.returncode, 0, out.stderr)
+        imported = set(out.stdout.split())
+        self.assertIn("genericparser", imported)
+        for heavy in ["networkx", "pydot", "pyparsing", "lark", "lpi"]:
+            self.assertNotIn(heavy, imported)
+
+    def test_lazy_modules(self):
+        self.assertTrue(hasattr(genericparser.Cfg, "Cfg"))
+        from genericparser import Parser_koat
+        self.assertTrue(hasattr(Parser_koat, "Parser_koat"))
@@ -0,0 +1,194 @@
+import unittest
+import genericparser
+from fixtures import (KOAT_PROGRAM, MLC_PROGRAM, FC_PROGRAM, FC_UNSORTED_PROGRAM,
+                      cfg_signature, random_constraints, temp_dir, write)
+from legacy import lpi_constraint
+
+
+class TestFastConstraintReader(unittest.TestCase):
+
+    CONSTRAINTS = ["x' = x + 1", "y >= 0", "x' =< 2*x - y + -3", "x => -y", "a.b!' == 0",
+                   "x*y*z < 3 - x - y", "(x + 1) * (y - 2) > x^3", "-x^2 + x^0 <= +y",
+                   "x / 2 = y", "x - -1 = 7 * (y)", "((x)) >= 0"]
+    REJECTED = ["x = 1.5", "x = 1e3", "x = 2x", "-(x) = 1", "x ^ 2.0 = 0",
+                "x = y = z", "x +", "x = (y", "", "2^2 = x", "x # comment = 0"]
+
+    def test_same_as_lark(self):
+        from genericparser.Constraint_parser import FastConstraintReader
+        atoms = ["x", "y'", "z.1", "_a", "3", "0", "12", "x^2", "y^0", "(x + 1)", "(2*y - x)"]
+        for text in self.CONSTRAINTS:
+            self.assertEqual(str(FastConstraintReader().read(text)), lpi_constraint(text), text)
+        # both readers accept (and reject) the same integer constraints
+        for text in random_constraints(300, atoms):
+            c = FastConstraintReader().read(text)
+            self.assertEqual(None if c is None else str(c), lpi_constraint(text), text)
+
+    def test_rejected(self):
+        from genericparser.Constraint_parser import FastConstraintReader
+        for text in self.REJECTED:
+            self.assertIsNone(FastConstraintReader().read(text), text)
+        self.assertEqual(str(genericparser.parse_constraint("x = 1.5")),
+                         lpi_constraint("x = 1.5"))
+        with self.assertRaises(Exception):
+            genericparser.parse_constraint("x = (y")
+
+    def test_names_with_power(self):
+        from genericparser.Constraint_parser import FastConstraintReader
+        c = FastConstraintReader(power=False).read("x^1 = x + 1")
+        self.assertEqual(sorted(c.get_variables()), ["x", "x^1"])
+        self.assertIsNone(FastConstraintReader(power=True).read("x^y = 0"))
+
+    def rules_only(self, parser_class):
+        # the same parser without the CONSTRAINT token
+        class RulesOnly(parser_class):
+            def get_grammar(self):
+                grammar = parser_class.get_grammar(self)
+                return grammar.replace("| CONSTRAINT", "").split("CONSTRAINT.2:")[0]
+        return RulesOnly()
+
+    def assertPlainConstraints(self, parser, text, count):
+        from unittest import mock
+        from genericparser.Constraint_parser import ConstraintTreeTransformer
+        with mock.patch.object(ConstraintTreeTransformer, "plain_constraint", autospec=True,
+                               side_effect=ConstraintTreeTransformer.plain_constraint) as plain:
+            parser.parse_string(text)
+        self.assertEqual(plain.call_count, count)
+
+    def test_mlc_constraint_tokens(self):
+        from genericparser.Parser_mlc import Parser_mlc
+        parser = Parser_mlc()
+        program = MLC_PROGRAM + "!path\n x >= 0 // comment\n ((x + 1) * 2) =< y/2\n\n"
+        for text in [MLC_PROGRAM, program, program.replace("x >= 0", "x >= 0.5")]:
+            self.assertEqual(cfg_signature(parser.parse_string(text)),
+                             cfg_signature(self.rules_only(Parser_mlc).parse_string(text)))
+        self.assertPlainConstraints(parser, program, 8)
+        for text in [MLC_PROGRAM.rstrip("\n"), program.replace("x >= 0", "x >= = 0")]:
+            with self.assertRaises(Exception):
+                parser.parse_string(text)
+
+    def test_fc_constraint_tokens(self):
+        from genericparser.Parser_fc import Parser_fc
+        parser = Parser_fc()
+        deep = FC_UNSORTED_PROGRAM.replace("x' = x / 2", "x' = (((x))) / 2 /* c */")
+        decimal = FC_UNSORTED_PROGRAM.replace("x' = x, y' = y", "x' = x + 0.5, y' = y")
+        keywords = FC_PROGRAM.replace("x >= 0,", "x.true >= null, false1 >= x,")
+        for text in [FC_PROGRAM, FC_UNSORTED_PROGRAM, deep, decimal, keywords]:
+            self.assertEqual(cfg_signature(parser.parse_string(text)),
+                             cfg_signature(self.rules_only(Parser_fc).parse_string(text)))
+        # the asserts of n0, and every constraint but the one in a comment
+        self.assertPlainConstraints(parser, FC_UNSORTED_PROGRAM, 10)
+        self.assertPlainConstraints(parser, deep, 9)
+        for text in [FC_PROGRAM.replace("x >= 0,", "x >= ,"), FC_PROGRAM.replace("x >= 0,", "x = = 0,"),
+                     FC_PROGRAM.replace("x >= 0,", "true = x,"), FC_PROGRAM.replace("x >= 0,", "null >= x,")]:
+            with self.assertRaises(Exception):
+                parser.parse_string(text)
+        path = write(temp_dir(self), "a.fc", decimal)
+        self.assertEqual(cfg_signature(parser.parse_stream(path)), cfg_signature(parser.parse(path)))
+
+    def test_evaluate_errors(self):
+        from unittest import mock
+        from genericparser.Constraint_parser import FastConstraintReader
+        reader = FastConstraintReader()
+        program = reader.compile("x + 1 = 0")
+        with mock.patch("genericparser.Constraint_parser.fold", side_effect=ZeroDivisionError):
+            self.assertIsNone(reader.evaluate(program))
+        with mock.patch("genericparser.Constraint_parser.fold", side_effect=TypeError):
+            with self.assertRaises(TypeError):
+                reader.evaluate(program)
+
+
+class TestLinearConstraint(unittest.TestCase):
+
+    def test_linear_constraints(self):
+        from genericparser.linear import LinearConstraint
+        for text, variables, equality in [("x' = x + 1", ["x", "x'"], True),
+                                          ("2*(x - y) >= -3 * z", ["x", "y", "z"], False),
+                                          ("x - x < 1", [], False), ("y => 0", ["y"], False)]:
+            c = genericparser.parse_constraint(text)
+            self.assertIsInstance(c, LinearConstraint)
+            self.assertTrue(c.is_linear())
+            self.assertEqual(sorted(c.variable_names()), variables)
+            self.assertEqual(c.is_equality(), equality)
+            self.assertIsNone(c._lpi)
+            self.assertEqual(str(c), lpi_constraint(text))
+            # in the order of lpi
+            self.assertEqual(c.get_variables(), c.to_lpi().get_variables())
+
+    def test_lpi_interface(self):
+        from lpi import Constraint, Expression
+        from genericparser.linear import to_lpi
+        c = genericparser.parse_constraint("x + 2*y <= 3")
+        self.assertNotIsInstance(c, Constraint)
+        # type checks go through to_lpi
+        self.assertIsInstance(to_lpi(c), Constraint)
+        self.assertIs(to_lpi(to_lpi(c)), to_lpi(c))
+        lpi_c = to_lpi(c)
+        self.assertEqual(c == lpi_c, lpi_c == lpi_c)
+        self.assertEqual(c != lpi_c, lpi_c != lpi_c)
+        self.assertEqual(hash(c), hash(lpi_c))
+        self.assertIn(c, {lpi_c: 1})
+        other = Expression("x") <= Expression(3)
+        self.assertEqual(c == other, lpi_c == other)
+        if hasattr(type(lpi_c), "__neg__"):
+            self.assertEqual(str(-c), str(-lpi_c))
+        else:
+            self.assertRaises(TypeError, lambda: -c)
+
+    def test_local_vars_order(self):
+        from genericparser.Parser_fc import Parser_fc
+        cfg = Parser_fc().parse_string(FC_PROGRAM.replace("y' = y]", "y' = y + b + a, a >= 0]"))
+        t0, = cfg.get_edges(name="t0")
+        order = [v for c in t0["constraints"] for v in c.to_lpi().get_variables() if v in ("a", "b")]
+        self.assertEqual(t0["local_vars"], list(dict.fromkeys(order)))
+
+    def test_nonlinear_constraints(self):
+        from lpi import Constraint
+        for text in ["x * y = 1", "x^2 <= 4", "x / 2 = 1", "x = 1.5"]:
+            c = genericparser.parse_constraint(text)
+            self.assertIsInstance(c, Constraint, text)
+
+    def test_lazy_lpi_constraint(self):
+        import pickle
+        from lpi import Constraint
+        from genericparser.linear import to_lpi
+        c = genericparser.parse_constraint("x + 2*y <= z")
+        self.assertEqual(c.toString(str, int), to_lpi(c).toString(str, int))
+        self.assertIsInstance(to_lpi(c), Constraint)
+        copy = pickle.loads(pickle.dumps(c))
+        self.assertIsNone(copy._lpi)
+        self.assertEqual((str(copy), copy.get_variables()), (str(c), c.get_variables()))
+
+    def test_shared_variable_table(self):
+        from genericparser.Parser_koat import Parser_koat
+        cfg = Parser_koat().parse_string(KOAT_PROGRAM)
+        tables = {id(c.variables) for e in cfg.get_edges() for c in e["constraints"]
+                  if hasattr(c, "coeffs")}
+        self.assertEqual(len(tables), 1)
+
+
+class TestPolynomialBuilder(unittest.TestCase):
+
+    def test_same_as_lpi(self):
+        atoms = ["x", "y", "z'", "2", "x^3", "-y^2", "z'^0", "(x - y)", "(x*y + 3)", "(1 - z'*x^2)"]
+        texts = random_constraints(600, atoms)
+        texts += ["x^40 - y^13*x^2 >= 0", "(x + y) * (x + y) * (x - y) = x^3", "x*y - y*x <= z"]
+        for text in texts:
+            expected = lpi_constraint(text)
+            if expected is not None:
+                self.assertEqual(str(genericparser.parse_constraint(text)), expected, text)
+
+    def test_power_by_squaring(self):
+        from genericparser.linear import Polynomial, VariableTable, leaf, operate, power
+        table = VariableTable()
+        p = power(operate(leaf("x", table), "+", leaf("1", table)), 10)
+        self.assertIsInstance(p, Polynomial)
+        self.assertEqual(p.degree(), 10)
+        self.assertEqual([p.terms[((0, e),) if e else ()] for e in range(11)],
+                         [1, 10, 45, 120, 210, 252, 210, 120, 45, 10, 1])
+        self.assertEqual(power(leaf("y", table), 7).terms, {((1, 7),): 1})
+
+    def test_linear_result(self):
+        from genericparser.linear import LinearConstraint
+        c = genericparser.parse_constraint("x*y + z = y*x")
+        self.assertIsInstance(c, LinearConstraint)
+        self.assertEqual(c.get_variables(), ["z"])
@@ -0,0 +1,73 @@
+import unittest
+import genericparser
+from fixtures import KOAT_PROGRAM, MLC_PROGRAM, FC_PROGRAM, cfg_signature, temp_dir, write
+
+
+class TestParseMany(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = temp_dir(self)
+        self.files = [write(self.tmp, name, program)
+                      for name, program in [("a.koat", KOAT_PROGRAM), ("b.mlc", MLC_PROGRAM),
+                                            ("c.fc", "garbage"), ("d.fc", FC_PROGRAM)]]
+
+    def check_results(self, results):
+        self.assertEqual(sorted(p for p, __ in results), sorted(self.files))
+        for path, result in results:
+            if path.endswith("c.fc"):
+                self.assertIsInstance(result, Exception)
+            else:
+                self.assertEqual(cfg_signature(result), cfg_signature(genericparser.parse(path)))
+
+    def test_in_process(self):
+        results = list(genericparser.parse_many(self.files, workers=1))
+        self.assertEqual([p for p, __ in results], self.files)
+        self.check_results(results)
+
+    def test_pool(self):
+        results = list(genericparser.parse_many(self.files, workers=2))
+        self.assertEqual([p for p, __ in results], self.files)
+        self.check_results(results)
+        self.check_results(list(genericparser.parse_many(self.files, workers=2, ordered=False)))
+
+    def test_timeout(self):
+        for __, result in genericparser.parse_many(self.files[:1], workers=1, timeout=1e-6):
+            self.assertIsInstance(result, TimeoutError)
+
+    def test_pool_timeout(self):
+        import multiprocessing
+        import time
+        from unittest import mock
+        from genericparser.Parser_fc import Parser_fc
+        if multiprocessing.get_start_method() != "fork":
+            self.skipTest("the workers do not inherit the patched parser")
+        slow = write(self.tmp, "slow.fc", FC_PROGRAM)
+        parse_cached = Parser_fc.parse_cached
+
+        def slow_parse(parser, filepath):
+            if filepath == slow:
+                time.sleep(10)
+            return parse_cached(parser, filepath)
+        files = self.files[:1] + [slow] + self.files[1:]
+        with mock.patch.object(Parser_fc, "parse_cached", slow_parse):
+            for ordered in (True, False):
+                results = list(genericparser.parse_many(files, workers=2, ordered=ordered, timeout=1))
+                if ordered:
+                    self.assertEqual([p for p, __ in results], files)
+                self.assertIsInstance(dict(results)[slow], TimeoutError)
+                self.check_results([(p, r) for p, r in results if p != slow])
+
+    def test_tool_timeout(self):
+        import subprocess
+        import sys
+        import time
+        from genericparser import _communicate, _time_limit
+        start = time.monotonic()
+        pipe = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(10)"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with self.assertRaises(TimeoutError):
+            with _time_limit(0.5):
+                _communicate(pipe)
+        # the tool is killed, not left running
+        self.assertIsNotNone(pipe.returncode)
+        self.assertLess(time.monotonic() - start, 5)
@@ -0,0 +1,127 @@
+import unittest
+from fixtures import fc_program, parse_constraints
+
+
+class TestSatPrefilter(unittest.TestCase):
+
+    def test_cases(self):
+        from genericparser.satcheck import prefilter
+        self.assertTrue(prefilter(parse_constraints("x > 0", "x' = x - 1", "y' = y + 2*x")))
+        self.assertTrue(prefilter(parse_constraints("1 <= 2")))
+        self.assertFalse(prefilter(parse_constraints("2 <= 1", "x >= 0")))
+        self.assertFalse(prefilter(parse_constraints("x >= 5", "x = y", "y <= 3")))
+        self.assertFalse(prefilter(parse_constraints("x >= 0", "x < 0")))
+        self.assertTrue(prefilter(parse_constraints("x >= 0", "x <= 0")))
+        self.assertIsNone(prefilter(parse_constraints("x = 2*y", "x + 2*y = 3", "x >= 0")))
+        # the only solutions of 2*x' = y are not integer when y is odd
+        self.assertIsNone(prefilter(parse_constraints("2*x' = y", "y = 1")))
+
+    def test_lpi_constraints(self):
+        from unittest import mock
+        from lpi import Expression
+        from genericparser.linear import LinearConstraint, _lpi_compare, linear_terms
+        from genericparser.satcheck import canonical_key, prefilter
+        x, y = Expression("x"), Expression("y")
+        nonlinear = _lpi_compare(x * y, "==", Expression(1))
+        self.assertNotIsInstance(nonlinear, LinearConstraint)
+        self.assertIsNone(prefilter([nonlinear]))
+        self.assertIsNone(canonical_key([nonlinear]))
+        for op, expected in (("<=", "<="), ("<", "<"), ("==", "=="), (">=", "<="), (">", "<")):
+            c = _lpi_compare(2 * x + y, op, Expression(3))
+            self.assertNotIsInstance(c, LinearConstraint)
+            self.assertEqual(linear_terms(c)[3], expected, op)
+            # the operator does not depend on the default string of lpi
+            with mock.patch.object(type(c), "__str__", lambda c: "x =< 0 ... < 1"):
+                self.assertEqual(linear_terms(c)[3], expected, op)
+        lpi_cons = [_lpi_compare(x, ">=", Expression(5)), _lpi_compare(x, "==", y),
+                    _lpi_compare(y, "<=", Expression(3))]
+        self.assertFalse(prefilter(lpi_cons))
+        self.assertTrue(prefilter(lpi_cons[:2]))
+        # the same key as the constraints built by the parser
+        self.assertEqual(canonical_key(lpi_cons), canonical_key(parse_constraints("x >= 5", "x = y", "y <= 3")))
+
+    def test_sound(self):
+        import itertools
+        import random
+        from genericparser.satcheck import prefilter
+        rnd = random.Random(3)
+        points = list(itertools.product(range(-25, 26), repeat=2))
+        decided = 0
+        for __ in range(300):
+            texts = ["{}*x + {}*y {} {}".format(rnd.randint(-3, 3), rnd.randint(-3, 3),
+                                              rnd.choice(["<=", "<", "=", ">=", ">"]), rnd.randint(-5, 5))
+                     for __ in range(rnd.randint(1, 4))]
+            result = prefilter(parse_constraints(*texts))
+            if result is None:
+                continue
+            decided += 1
+            ops = {"<=": int.__le__, "<": int.__lt__, "=": int.__eq__, ">=": int.__ge__, ">": int.__gt__}
+            parsed = [t.split() for t in texts]
+
+            def holds(x, y):
+                for p in parsed:
+                    left = int(p[0].split("*")[0]) * x + int(p[2].split("*")[0]) * y
+                    if not ops[p[3]](left, int(p[4])):
+                        return False
+                return True
+            self.assertEqual(any(holds(x, y) for x, y in points), result, texts)
+        self.assertGreater(decided, 150)
+
+    def test_stats(self):
+        from genericparser.satcheck import SatChecker
+        checker = SatChecker()
+        self.assertTrue(checker.is_sat(parse_constraints("x > 0", "x' = x - 1")))
+        self.assertFalse(checker.is_sat(parse_constraints("x >= 5", "x = y", "y <= 3")))
+        self.assertFalse(checker.is_sat(parse_constraints("x = 2*y", "x + 2*y = 3", "x >= 0")) is None)
+        self.assertEqual(checker.stats["prefilter_sat"], 1)
+        self.assertEqual(checker.stats["prefilter_unsat"], 1)
+        self.assertEqual(checker.stats["solver_sat"] + checker.stats["solver_unsat"], 1)
+
+
+class TestSatCache(unittest.TestCase):
+
+    def test_canonical_key(self):
+        from genericparser.satcheck import canonical_key
+        key = canonical_key(parse_constraints("x >= 0", "2*x' = 2*x - 2"))
+        self.assertEqual(canonical_key(parse_constraints("x' - x + 1 = 0", "-x <= 0", "0 <= x")), key)
+        self.assertNotEqual(canonical_key(parse_constraints("x > 0", "x' = x - 1")), key)
+        self.assertNotEqual(canonical_key(parse_constraints("y >= 0", "y' = y - 1")), key)
+        self.assertIsNone(canonical_key(parse_constraints("x*x >= 0")))
+
+    def test_lru(self):
+        from genericparser.satcheck import SatCache
+        cache = SatCache(maxsize=2)
+        cache.put("a", True)
+        cache.put("b", False)
+        self.assertIs(cache.get("a"), True)
+        cache.put("c", True)
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("c"), True)
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "evictions": 1, "entries": 2, "maxsize": 2})
+
+    def cfg(self):
+        from genericparser.Parser_fc import Parser_fc
+        transitions = ["{{source: n{0}, target: n{1}, name: t{0}, constraints: [{2}]}}"
+                       .format(i, i + 1, "x >= 0, x' = x - 1" if i % 2 else "x' = x - 1, 0 <= x")
+                       for i in range(10)]
+        return Parser_fc().parse_string(fc_program(transitions))
+
+    def test_remove_unsat_edges(self):
+        from genericparser.satcheck import SatCache
+        cfg = self.cfg()
+        cfg.build_polyhedrons()
+        stats = cfg.get_satcheck_stats()
+        self.assertEqual((stats["prefilter_sat"], stats["cache_sat"]), (1, 9))
+        cfg.remove_unsat_edges()
+        self.assertEqual(cfg.get_satcheck_stats()["cache_sat"], 10)
+        cfg.remove_unsat_edges(cache=False)
+        self.assertEqual(cfg.get_satcheck_stats()["prefilter_sat"], 10)
+        # shared between cfgs
+        shared = SatCache()
+        cfg.remove_unsat_edges(cache=shared)
+        other = self.cfg()
+        other.build_polyhedrons()
+        other.remove_unsat_edges(cache=shared)
+        self.assertEqual(other.get_satcheck_stats()["cache_sat"], 10)
+        self.assertEqual(shared.stats()["entries"], 1)
+        self.assertNotIn("satcheck", other.get_info())